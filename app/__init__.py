@@ -12,27 +12,47 @@ from .api.track_routes import tracks_routes
 from .api.user_playlist_routes import playlist_routes
 from .api.comment_routes import comments_routes
 from .api.like_routes import likes_routes
+from .api.upload_routes import uploads_routes
 from app.utils.errors import register_error_handlers
+from app.utils.instrumentation import init_query_counter
+from app.utils.deletion_queue import init_deletion_worker
+from app.utils.metadata_extraction import init_metadata_extractor
+from app.utils.response_cache import init_response_cache
+from app.utils.json_encoding import init_json
+from app.utils.static_assets import init_static_assets, is_lean_request
+from app.utils.replicas import init_read_replicas
+from app.utils.principal import init_principal_cache, load_principal
 from .seeds import seed_commands
+from .commands import maintenance_commands
 from .config import Config
 
 app = Flask(__name__, static_folder='../react-vite/dist', static_url_path='/')
+# Loaded first so the init_* hooks below see it
+app.config.from_object(Config)
+init_json(app)
 
 # Setup login manager
 login = LoginManager(app)
 login.login_view = 'auth.unauthorized'
 
 register_error_handlers(app)
+init_query_counter(app)
+init_deletion_worker(app)
+init_metadata_extractor(app)
+init_response_cache(app)
+init_static_assets(app)
+init_principal_cache(app)
 
 @login.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    # A cached Principal rather than a users query per request
+    return load_principal(int(id))
 
 
 # Tell flask about our seed commands
 app.cli.add_command(seed_commands)
+app.cli.add_command(maintenance_commands)
 
-app.config.from_object(Config)
 app.register_blueprint(user_routes, url_prefix='/api/users')
 app.register_blueprint(auth_routes, url_prefix='/api/auth')
 app.register_blueprint(main_routes, url_prefix='/api/playlist')
@@ -40,7 +60,9 @@ app.register_blueprint(tracks_routes, url_prefix='/api/tracks')
 app.register_blueprint(playlist_routes, url_prefix='/api/myplaylist')
 app.register_blueprint(comments_routes, url_prefix='/api/comments')
 app.register_blueprint(likes_routes, url_prefix='/api/likes')
+app.register_blueprint(uploads_routes, url_prefix='/api/uploads')
 db.init_app(app)
+init_read_replicas(app, db)
 Migrate(app, db)
 
 # Application Security
@@ -63,6 +85,10 @@ def https_redirect():
 
 @app.after_request
 def inject_csrf_token(response):
+    # Static files and media streams don't need a token (or the session
+    # write generating one costs)
+    if is_lean_request():
+        return response
     response.set_cookie(
         'csrf_token',
         generate_csrf(),
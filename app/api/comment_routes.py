@@ -1,7 +1,14 @@
 from flask import Blueprint, request
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager
 from flask_login import current_user, login_required
-from app.models import db, Comment, Track
-from app.utils.errors import api_success, ValidationError, ResourceNotFoundError
+from app.models import db, Comment, Track, User
+from app.utils.errors import (
+    api_success, ValidationError, ResourceNotFoundError, check_not_modified, compute_etag
+)
+from app.utils.serializers import serialize_comments
+from app.utils.response_cache import cached_response, invalidate_cache
+from app.utils.pagination import keyset_paginate
 
 comments_routes = Blueprint('comments', __name__)
 
@@ -20,11 +27,14 @@ def create_comment(track_id):
     
     comment = Comment(text=text, user_id=current_user.id, track_id=track_id)
     db.session.add(comment)
+    Track.adjust_comment_count(track_id, 1)
+    invalidate_cache(f"comments:{track_id}")
     db.session.commit()
     return api_success(data=comment.to_dict(), message="Comment created", status_code=201)
 
 # List all comments for a track
 @comments_routes.route('/tracks/<int:track_id>/comments', methods=['GET'])
+@cached_response(lambda track_id: (f"comments:{track_id}", f"track:{track_id}"))
 def list_comments(track_id):
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
@@ -32,9 +42,21 @@ def list_comments(track_id):
     track = Track.query.get(track_id)
     if not track:
         raise ResourceNotFoundError("Track")
+
+    # The stored counter stands in for COUNT(*): deletions still change the ETag
+    count = track.comment_count
+    last_modified = Comment.query.filter_by(track_id=track_id)\
+                                 .with_entities(func.max(Comment.updated_at)).scalar()
+    not_modified = check_not_modified(compute_etag('comments', track_id, last_modified, count), last_modified)
+    if not_modified:
+        return not_modified
     
-    paginated_comments = Comment.query.filter_by(track_id=track_id).paginate(page=page, per_page=per_page, error_out=False)
-    comments = [comment.to_dict() for comment in paginated_comments.items]
+    # Posting order, with the id as a tie-break so pages don't shift
+    paginated_comments = Comment.query.filter_by(track_id=track_id)\
+                                      .order_by(Comment.created_at, Comment.id)\
+                                      .paginate(page=page, per_page=per_page, error_out=False, count=False)
+    paginated_comments.total = count
+    comments = serialize_comments(paginated_comments.items)
     
     return api_success(data={
         'comments': comments,
@@ -46,6 +68,48 @@ def list_comments(track_id):
         }
     })
 
+# A track's comments newest first, for infinite scroll
+@comments_routes.route('/tracks/<int:track_id>/comments/feed', methods=['GET'])
+@cached_response(lambda track_id: (f"comments:{track_id}", f"track:{track_id}"))
+def comment_feed(track_id):
+    """
+    Pages of comments newest first. Pass the previous page's `next_cursor`
+    as `cursor` for the next one. Authors come from the same query, and
+    the total is the track's stored comment_count, so no page counts rows.
+    """
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    cursor = request.args.get('cursor')
+
+    track = Track.query.get(track_id)
+    if not track:
+        raise ResourceNotFoundError("Track")
+
+    # Seeks along ix_comments_track_id_created_at_id
+    query = Comment.query.filter(Comment.track_id == track_id)\
+                         .outerjoin(Comment.user)\
+                         .options(contains_eager(Comment.user).load_only(User.id, User.username))
+    comments, next_cursor = keyset_paginate(query, (Comment.created_at, Comment.id), 'newest', cursor, per_page)
+
+    # Validators from the page itself: bounded by per_page however long
+    # the thread, and any edit or deletion on it changes them
+    not_modified = check_not_modified(
+        compute_etag('comment-feed', track_id, track.comment_count, cursor,
+                     *[f"{comment.id}@{comment.updated_at}" for comment in comments]),
+        max((comment.updated_at for comment in comments if comment.updated_at), default=None)
+    )
+    if not_modified:
+        return not_modified
+
+    return api_success(data={
+        'comments': comments,
+        'pagination': {
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'total_items': track.comment_count
+        }
+    })
+
 # Update a comment (only by the comment owner)
 @comments_routes.route('/<int:comment_id>', methods=['PUT', 'PATCH'])
 @login_required
@@ -57,6 +121,7 @@ def update_comment(comment_id):
     data = request.get_json() or {}
     if 'text' in data:
         comment.text = data['text']
+    invalidate_cache(f"comments:{comment.track_id}")
     db.session.commit()
     return api_success(data=comment.to_dict(), message="Comment updated", status_code=200)
 
@@ -69,5 +134,7 @@ def delete_comment(comment_id):
         raise ResourceNotFoundError("Comment")
     
     db.session.delete(comment)
+    Track.adjust_comment_count(comment.track_id, -1)
+    invalidate_cache(f"comments:{comment.track_id}")
     db.session.commit()
     return api_success(message="Comment deleted successfully")
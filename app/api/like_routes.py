@@ -1,8 +1,10 @@
 from flask import Blueprint
 from flask_login import current_user, login_required
-from sqlalchemy import func
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
 from app.models import db, Like, Track
-from app.utils.errors import api_success, ValidationError, ResourceNotFoundError
+from app.utils.errors import api_success, api_success_stream, ValidationError, ResourceNotFoundError
+from app.utils.response_cache import invalidate_cache, track_tags
 
 likes_routes = Blueprint('likes', __name__)
 
@@ -20,15 +22,19 @@ def like_track(track_id):
     
     like = Like(user_id=current_user.id, track_id=track_id)
     db.session.add(like)
-    db.session.commit()
-    
-    # Compute like count dynamically
-    like_count = db.session.query(func.count(Like.track_id))\
-                           .filter(Like.track_id == track_id).scalar()
+    try:
+        # Bump the stored counter in the same transaction as the insert
+        Track.adjust_like_count(track_id, 1)
+        invalidate_cache(*track_tags(track_id))
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request inserted the same like first
+        db.session.rollback()
+        raise ValidationError("Track already liked")
     
     return api_success(
         message="Track liked successfully",
-        data={'like_id': like.to_dict()['id'], 'like_count': like_count},
+        data={'like_id': like.to_dict()['id'], 'like_count': track.like_count},
         status_code=201
     )
 
@@ -40,20 +46,22 @@ def unlike_track(track_id):
     if not track:
         raise ResourceNotFoundError("Track")
     
-    like = Like.query.filter_by(user_id=current_user.id, track_id=track_id).first()
-    if not like:
+    # Only the request whose DELETE removed the row decrements the counter:
+    # of two concurrent unlikes, the second deletes nothing
+    deleted = db.session.execute(
+        delete(Like).where(Like.user_id == current_user.id, Like.track_id == track_id)
+    ).rowcount
+    if not deleted:
+        db.session.rollback()
         raise ResourceNotFoundError("Like")
     
-    db.session.delete(like)
+    Track.adjust_like_count(track_id, -1)
+    invalidate_cache(*track_tags(track_id))
     db.session.commit()
     
-    # Compute like count dynamically
-    like_count = db.session.query(func.count(Like.track_id))\
-                           .filter(Like.track_id == track_id).scalar()
-    
     return api_success(
         message="Track unliked successfully",
-        data={'like_count': like_count},
+        data={'like_count': track.like_count},
         status_code=200
     )
 
@@ -62,7 +70,7 @@ def unlike_track(track_id):
 @likes_routes.route('/current', methods=['GET'])
 @login_required
 def get_user_likes():
-    likes = Like.query.filter_by(user_id=current_user.id).all()
-    return api_success(data={'likes': [like.to_dict() for like in likes]})
+    likes = Like.query.filter_by(user_id=current_user.id).yield_per(500)
+    return api_success_stream('likes', likes)
 
 
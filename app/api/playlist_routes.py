@@ -1,33 +1,85 @@
 from flask import Blueprint, request
-from sqlalchemy import desc, func
-from app.models import Track, Like
-from app.utils.errors import api_success
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager
+from app.models import db, Track, TrackRanking, Counter
+from app.utils.errors import api_success, check_not_modified, compute_etag
+from app.utils.pagination import keyset_paginate
+from app.utils.serializers import serialize_tracks
+from app.utils.response_cache import cached_response
 
 main_routes = Blueprint('main', __name__)
 
 @main_routes.route('/ultimate_playlist')
+@cached_response(lambda: ('tracks',))
 def ultimate_playlist():
+    """
+    Returns all tracks, newest or most liked first. Pass `cursor` (empty for
+    the first page) to use keyset pagination instead of `page` numbers.
+    `genre` keeps one genre's tracks, in either order; it matches the
+    whole genre name, ignoring case and surrounding spaces.
+    """
     # Retrieve query parameters for pagination, sorting, and filtering
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 100, type=int)
     sort_by = request.args.get('sort_by', 'created_at')
-    genre_filter = request.args.get('genre')
-    
-    query = Track.query
-    if genre_filter:
-        query = query.filter(Track.genre.ilike(f"%{genre_filter}%"))
+    genre_filter = TrackRanking.normalize_genre(request.args.get('genre'))
+    cursor = request.args.get('cursor')
     
+    # Sort keys end with the track id so the order is total, which keyset
+    # pagination needs; each is covered by an index.
     if sort_by == 'likes':
-        query = (
-            query.outerjoin(Like)
-                 .group_by(Track.id)
-                 .order_by(desc(func.count(Like.user_id)))
-        )
+        # Read the precomputed ranking instead of aggregating likes
+        query = TrackRanking.query.join(TrackRanking.track)
+        columns = (TrackRanking.like_count, TrackRanking.track_id)
     else:
-        query = query.order_by(Track.created_at.desc())
+        sort_by = 'created_at'
+        query = Track.query
+        if genre_filter:
+            query = query.join(Track.ranking)
+        columns = (Track.created_at, Track.id)
+    if genre_filter:
+        # Both orders select the genre by its indexed key in the ranking
+        query = query.filter(TrackRanking.genre_key == genre_filter)
+
+    # Any change to a track (likes included) moves its updated_at, and
+    # additions or removals move the count. Both are cheap for the whole
+    # catalog: the newest updated_at is one index seek, and the count is
+    # stored. They validate a genre slice too, since nothing changes in the
+    # slice without changing them; a change elsewhere only costs a rebuild.
+    last_modified = db.session.query(func.max(Track.updated_at)).scalar()
+    catalog_count = Counter.get('tracks')
+    not_modified = check_not_modified(compute_etag('tracks', last_modified, catalog_count), last_modified)
+    if not_modified:
+        return not_modified
+    if sort_by == 'likes':
+        query = query.options(contains_eager(TrackRanking.track))
+
+    def to_tracks(items):
+        return [item.track for item in items] if sort_by == 'likes' else items
+
+    if cursor is not None:
+        # Cursor mode: seek past the previous page, no COUNT(*) or OFFSET
+        items, next_cursor = keyset_paginate(query, columns, sort_by, cursor, max(per_page, 1))
+        return api_success(data={
+            'tracks': serialize_tracks(to_tracks(items)),
+            'pagination': {
+                'per_page': max(per_page, 1),
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }
+        })
     
-    paginated_tracks = query.paginate(page=page, per_page=per_page, error_out=False)
-    tracks = [track.to_dict() for track in paginated_tracks.items]
+    query = query.order_by(*[column.desc() for column in columns])
+    # The stored count is the catalog's total; a genre's is counted on the
+    # ranking's genre index, without reading the tracks
+    if genre_filter:
+        count = db.session.query(func.count(TrackRanking.track_id))\
+                          .filter(TrackRanking.genre_key == genre_filter).scalar()
+    else:
+        count = catalog_count
+    paginated_tracks = query.paginate(page=page, per_page=per_page, error_out=False, count=False)
+    paginated_tracks.total = count
+    tracks = serialize_tracks(to_tracks(paginated_tracks.items))
     
     return api_success(data={
         'tracks': tracks,
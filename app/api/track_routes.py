@@ -1,16 +1,25 @@
 import os
 import uuid
-import boto3
 from datetime import datetime
 from sqlalchemy import func
-from flask import Blueprint, request, jsonify, abort, current_app, render_template, redirect, url_for, flash
+from flask import Blueprint, request, jsonify, abort, current_app, render_template, redirect, url_for, flash, send_file
 from flask_login import current_user, login_required
 from werkzeug.utils import secure_filename
-from app.models import db, Track, Like 
+from app.models import db, Track, TrackRanking
 from app.utils.errors import (
     api_success, api_error, ValidationError, AuthorizationError, 
-    FileUploadError, validate_file_size, validate_file_extension
+    ResourceNotFoundError, FileUploadError, validate_file_size,
+    check_not_modified, compute_etag, api_success_stream
 )
+from app.utils.serializers import serialize_tracks
+from app.utils import search
+from app.utils.uploads import ingest_upload
+from app.utils.storage import get_storage
+from app.utils.deletion_queue import queue_deletion
+from app.utils.metadata_extraction import schedule_metadata_extraction
+from app.utils.response_cache import cached_response, invalidate_cache, track_tags
+from app.utils.static_assets import lean_response
+from app.utils.waveform import HEADER as PEAKS_HEADER, read_peaks_header, peaks_level_range, encode_single_level
 
 # Import the upload form
 from app.forms.upload_form import UploadForm
@@ -36,6 +45,23 @@ ALLOWED_EXTENSIONS = {
 # Maximum file size (100MB)
 MAX_CONTENT_LENGTH = 100 * 1024 * 1024
 
+# Content types for streamed audio, by extension
+AUDIO_MIMETYPES = {
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+    'ogg': 'audio/ogg',
+    'flac': 'audio/flac',
+    'm4a': 'audio/mp4',
+    'aac': 'audio/aac',
+    '3gp': 'audio/3gpp',
+    'wma': 'audio/x-ms-wma',
+    'aiff': 'audio/aiff',
+    'alac': 'audio/mp4',
+    'mp4': 'audio/mp4',
+    'webm': 'audio/webm',
+    'caf': 'audio/x-caf'
+}
+
 def generate_unique_filename(original_filename):
     """Generate a unique filename with UUID and timestamp to prevent collisions"""
     ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else ''
@@ -44,116 +70,58 @@ def generate_unique_filename(original_filename):
         unique_filename = f"{unique_filename}.{ext}"
     return unique_filename
 
-def upload_file_to_s3(file, filename):
-    """Upload a file to AWS S3 bucket"""
-    try:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=current_app.config.get('S3_KEY'),
-            aws_secret_access_key=current_app.config.get('S3_SECRET')
-        )
-        
-        bucket_name = current_app.config.get('S3_BUCKET')
-        s3_client.upload_fileobj(
-            file,
-            bucket_name,
-            filename,
-            ExtraArgs={
-                'ACL': 'public-read',
-                'ContentType': file.content_type
-            }
-        )
-        
-        # Generate the URL for the uploaded file
-        return f"https://{bucket_name}.s3.amazonaws.com/{filename}"
-    except Exception as e:
-        current_app.logger.error(f"S3 upload error: {str(e)}")
-        raise FileUploadError(f"Failed to upload file to S3: {str(e)}")
-
-def delete_file_from_s3(file_url):
-    """Delete a file from AWS S3 bucket"""
-    try:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=current_app.config.get('S3_KEY'),
-            aws_secret_access_key=current_app.config.get('S3_SECRET')
-        )
-        
-        bucket_name = current_app.config.get('S3_BUCKET')
-        # Extract key from URL
-        file_key = file_url.split(f"https://{bucket_name}.s3.amazonaws.com/")[1]
-        
-        s3_client.delete_object(
-            Bucket=bucket_name,
-            Key=file_key
-        )
-        return True
-    except Exception as e:
-        current_app.logger.error(f"S3 delete error: {str(e)}")
-        return False
+def save_new_track(fields, audio_url):
+    """Add a track with its ranking and search rows; the caller commits"""
+    new_track = Track(
+        title=fields.get('title'),
+        audio_url=audio_url,
+        genre=fields.get('genre'),
+        duration=fields.get('duration'),
+        artist_name=fields.get('artist_name'),
+        user_id=current_user.id
+    )
+    TrackRanking.sync_track(new_track)
+    db.session.add(new_track)
+    db.session.flush()
+    search.index_track(new_track)
+    invalidate_cache(*track_tags(new_track.id))
+    return new_track
 
 # Existing API endpoint for programmatic uploads
 @tracks_routes.route('/', methods=['POST'])
 @login_required
 def create_track():
+    upload = None
     try:
-        title = request.form.get('title')
-        genre = request.form.get('genre')
-        duration = request.form.get('duration')
-        audio_file = request.files.get('audio_file')
-        artist_name = request.form.get('artist_name')
+        # Stream the audio part straight to storage while reading the body;
+        # size, extension and content are checked as the bytes arrive
+        upload = ingest_upload('audio_file', ALLOWED_EXTENSIONS, MAX_CONTENT_LENGTH,
+                               generate_unique_filename)
 
         # Validate required fields
-        if not title:
+        if not upload.fields.get('title'):
             raise ValidationError("Title is required", errors={"title": "Required field"})
-        if not audio_file:
+        if not upload.file_url:
             raise ValidationError("Audio file is required", errors={"audio_file": "Required field"})
-        if not artist_name:
+        if not upload.fields.get('artist_name'):
             raise ValidationError("Artist name is required", errors={"artist_name": "Required field"})
-        
-        # Validate file type and size
-        validate_file_extension(audio_file.filename, ALLOWED_EXTENSIONS)
-        validate_file_size(audio_file, max_size_mb=MAX_CONTENT_LENGTH//(1024*1024))
-        
-        # Generate a secure, unique filename using the original filename for extension extraction
-        unique_filename = generate_unique_filename(secure_filename(audio_file.filename))
-        
-        # Store file (S3 or local)
-        if current_app.config.get('USE_S3', False):
-            file_url = upload_file_to_s3(audio_file, unique_filename)
-        else:
-            # Fall back to local storage
-            upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-            os.makedirs(upload_folder, exist_ok=True)
-            file_path = os.path.join(upload_folder, unique_filename)
-            audio_file.save(file_path)
-            file_url = file_path
 
         # Create new track record without original_filename
-        new_track = Track(
-            title=title,
-            audio_url=file_url,
-            genre=genre,
-            duration=duration,
-            artist_name=artist_name,
-            user_id=current_user.id
-        )
-        
-        db.session.add(new_track)
+        new_track = save_new_track(upload.fields, upload.file_url)
         db.session.commit()
+        schedule_metadata_extraction(new_track)
         return api_success(new_track.to_dict(), "Track uploaded successfully", 201)
         
     except ValidationError as e:
+        if upload:
+            upload.discard()
         raise
     except FileUploadError as e:
         raise
     except Exception as e:
         db.session.rollback()
-        if 'file_url' in locals():
-            if current_app.config.get('USE_S3', False):
-                delete_file_from_s3(file_url)
-            elif 'file_path' in locals() and os.path.exists(file_path):
-                os.remove(file_path)
+        if upload:
+            upload.discard()
         current_app.logger.error(f"Unexpected error creating track: {str(e)}")
         raise
 
@@ -175,26 +143,16 @@ def upload_track_form():
             validate_file_size(audio_file, max_size_mb=MAX_CONTENT_LENGTH//(1024*1024))
 
             unique_filename = generate_unique_filename(secure_filename(audio_file.filename))
-            
-            if current_app.config.get('USE_S3', False):
-                file_url = upload_file_to_s3(audio_file, unique_filename)
-            else:
-                upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-                os.makedirs(upload_folder, exist_ok=True)
-                file_path = os.path.join(upload_folder, unique_filename)
-                audio_file.save(file_path)
-                file_url = file_path
-
-            new_track = Track(
-                title=title,
-                audio_url=file_url,
-                genre=genre,
-                duration=duration,
-                artist_name=artist_name,
-                user_id=current_user.id
-            )
-            db.session.add(new_track)
+            file_url = get_storage().save_fileobj(audio_file.stream, unique_filename, audio_file.content_type)
+
+            new_track = save_new_track({
+                'title': title,
+                'genre': genre,
+                'duration': duration,
+                'artist_name': artist_name
+            }, file_url)
             db.session.commit()
+            schedule_metadata_extraction(new_track)
             flash("Track uploaded successfully", "success")
             return redirect(url_for('tracks.get_track', track_id=new_track.id))
         except Exception as e:
@@ -205,90 +163,203 @@ def upload_track_form():
 
 # Route to "listen" to a track (i.e. get its details)
 @tracks_routes.route('/<int:track_id>', methods=['GET'])
+@cached_response(lambda track_id: track_tags(track_id))
 def get_track(track_id):
     track = Track.query.get_or_404(track_id)
-    # Dynamically compute the like count
-    like_count = db.session.query(func.count(Like.track_id))\
-                           .filter(Like.track_id == track_id).scalar()
-    track_data = track.to_dict()
-    track_data['like_count'] = like_count
-    return api_success(track_data)
+    not_modified = check_not_modified(compute_etag('track', track.id, track.updated_at), track.updated_at)
+    if not_modified:
+        return not_modified
+    return api_success(track)
+
+# Stream a track's audio, with Range requests so players can seek
+@tracks_routes.route('/<int:track_id>/stream', methods=['GET'])
+@lean_response
+def stream_track(track_id):
+    """
+    Streams a track's audio. Local files honour Range, If-Range, ETag and
+    Last-Modified; remote (S3) files redirect to the object URL. With
+    ?rendition=preview the compact preview is served when there is one.
+    """
+    track = Track.query.get(track_id)
+    if not track:
+        raise ResourceNotFoundError("Track")
+
+    audio_url = track.audio_url
+    if request.args.get('rendition') == 'preview' and track.preview_url:
+        audio_url = track.preview_url
+
+    if audio_url.startswith(('http://', 'https://')):
+        # S3 serves ranges itself, so don't proxy the bytes
+        return redirect(audio_url)
+
+    storage = get_storage()
+    ext = audio_url.rsplit('.', 1)[-1].lower()
+    mimetype = AUDIO_MIMETYPES.get(ext, 'application/octet-stream')
+    path = storage.local_path(audio_url)
+    if path is None:
+        if not storage.owns(audio_url):
+            raise ResourceNotFoundError("Audio file")
+        # Non-disk backends (the in-memory one) go through send_file too,
+        # which still answers ranges on a BytesIO
+        response = send_file(storage.open(audio_url), mimetype=mimetype, conditional=True, max_age=0)
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
+
+    accel_prefix = current_app.config.get('MEDIA_ACCEL_REDIRECT')
+    if accel_prefix:
+        # Behind nginx, hand the file to an internal location: nginx then
+        # answers ranges and conditionals with sendfile, off the worker
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{os.path.basename(path)}"
+        return response
+
+    # send_file answers Range/If-Range with 206 and If-None-Match /
+    # If-Modified-Since with 304, and hands whole files to the server's
+    # wsgi.file_wrapper (sendfile under gunicorn). Audio files are replaced
+    # under the same track id, so clients revalidate rather than cache.
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=True, max_age=0)
+    # Werkzeug only advertises ranges on 206 responses; players look for it
+    # on the first full response to decide whether they can seek
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+# Waveform peaks for the player
+@tracks_routes.route('/<int:track_id>/peaks', methods=['GET'])
+@lean_response
+def get_track_peaks(track_id):
+    """
+    Returns a track's waveform as a binary peaks file holding the stored
+    resolution closest to ?resolution= (bins, default 1024) from above.
+    Requests carrying the track's waveform_url version (?v=) are immutable.
+    """
+    resolution = request.args.get('resolution', 1024, type=int)
+    track = Track.query.get(track_id)
+    if not track:
+        raise ResourceNotFoundError("Track")
+    if not track.peaks_url:
+        raise ResourceNotFoundError("Waveform")
+
+    # Only the header and the chosen level are read from storage
+    storage = get_storage()
+    try:
+        sample_rate, duration_ms, bins = read_peaks_header(
+            storage.read_range(track.peaks_url, 0, PEAKS_HEADER.size + 4 * 16)
+        )
+    except (OSError, ValueError, ResourceNotFoundError):
+        current_app.logger.exception(f"Unreadable peaks for track {track_id}")
+        raise ResourceNotFoundError("Waveform")
+    candidates = [level for level, count in enumerate(bins) if count >= resolution]
+    level = candidates[-1] if candidates else 0
+    offset, length = peaks_level_range(bins, level)
+    pairs = storage.read_range(track.peaks_url, offset, length)
+
+    response = current_app.response_class(
+        encode_single_level(sample_rate, duration_ms, pairs), mimetype='application/octet-stream'
+    )
+    response.set_etag(f"{track.peaks_version}-{bins[level]}")
+    if request.args.get('v') == track.peaks_version:
+        # The versioned URL changes whenever the audio does
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# Full-text search over title, artist and genre
+@tracks_routes.route('/search', methods=['GET'])
+def search_tracks():
+    """
+    Ranked search over track title, artist name and genre. Supports the
+    same genre filter as the ultimate playlist and sort_by=relevance,
+    created_at or likes.
+    """
+    q = request.args.get('q', '')
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    sort_by = request.args.get('sort_by', 'relevance')
+    genre_filter = request.args.get('genre')
+
+    query = search.search_tracks(q, genre=genre_filter, sort_by=sort_by)
+    paginated_tracks = query.paginate(page=page, per_page=per_page, error_out=False)
+
+    return api_success(data={
+        'tracks': serialize_tracks(paginated_tracks.items),
+        'pagination': {
+            'page': paginated_tracks.page,
+            'per_page': paginated_tracks.per_page,
+            'total_pages': paginated_tracks.pages,
+            'total_items': paginated_tracks.total
+        }
+    })
+
 @tracks_routes.route('/user', methods=['GET'])
 @login_required
 def get_user_tracks():
-    user_tracks = Track.query.filter_by(user_id=current_user.id)\
-                     .order_by(Track.created_at.desc()).all()
-    tracks_data = [track.to_dict() for track in user_tracks]
-    return api_success(data={'tracks': tracks_data})
+    query = Track.query.filter_by(user_id=current_user.id)
+    last_modified, count = query.with_entities(func.max(Track.updated_at), func.count(Track.id)).one()
+    not_modified = check_not_modified(
+        compute_etag('user-tracks', current_user.id, last_modified, count), last_modified, private=True
+    )
+    if not_modified:
+        return not_modified
+    # Unpaginated, so stream it rather than hold every row and its JSON
+    return api_success_stream('tracks', query.order_by(Track.created_at.desc()).yield_per(200))
 
 
 # Route to update track information
 @tracks_routes.route('/<int:track_id>', methods=['PUT', 'PATCH'])
 @login_required
 def update_track(track_id):
+    upload = None
     try:
         track = Track.query.filter_by(id=track_id, user_id=current_user.id).first_or_404()
-        old_file_url = None
-        file_url = None
+        old_files = []
         
         if request.content_type and 'multipart/form-data' in request.content_type:
-            if 'title' in request.form:
-                track.title = request.form.get('title')
-            if 'genre' in request.form:
-                track.genre = request.form.get('genre')
-            if 'duration' in request.form:
-                track.duration = request.form.get('duration')
-            if 'artist_name' in request.form:
-                    track.artist_name = request.form.get('artist_name')
-            
-            if 'audio_file' in request.files:
-                audio_file = request.files['audio_file']
-                validate_file_extension(audio_file.filename, ALLOWED_EXTENSIONS)
-                validate_file_size(audio_file, max_size_mb=MAX_CONTENT_LENGTH//(1024*1024))
-                unique_filename = generate_unique_filename(secure_filename(audio_file.filename))
-                old_file_url = track.audio_url
-                if current_app.config.get('USE_S3', False):
-                    file_url = upload_file_to_s3(audio_file, unique_filename)
-                else:
-                    upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-                    os.makedirs(upload_folder, exist_ok=True)
-                    file_path = os.path.join(upload_folder, unique_filename)
-                    audio_file.save(file_path)
-                    file_url = file_path
-                    track.audio_url = file_url
+            # A replacement file, if any, is streamed to storage as it's read
+            upload = ingest_upload('audio_file', ALLOWED_EXTENSIONS, MAX_CONTENT_LENGTH,
+                                   generate_unique_filename)
+            data = upload.fields
+            if upload.file_url:
+                old_files = track.stored_files()
+                track.audio_url = upload.file_url
+                # Until the new file is processed it has no peaks or preview
+                track.peaks_url = track.preview_url = None
         else:
             data = request.get_json() or {}
-            if 'title' in data:
-                track.title = data['title']
-            if 'genre' in data:
-                track.genre = data['genre']
-            if 'duration' in data:
-                track.duration = data['duration']
-            if 'artist_name' in data:
-                track.artist_name = data['artist_name']
+
+        if 'title' in data:
+            track.title = data['title']
+        if 'genre' in data:
+            track.genre = data['genre']
+        if 'duration' in data:
+            track.duration = data['duration']
+        if 'artist_name' in data:
+            track.artist_name = data['artist_name']
         
+        # Keep the track in the right genre slice of the ranking
+        TrackRanking.sync_track(track)
+        search.index_track(track)
+        # Replaced files are deleted in the background once this commits
+        for url in old_files:
+            queue_deletion(url)
+        invalidate_cache(*track_tags(track.id))
         db.session.commit()
-        
-        if old_file_url:
-            if current_app.config.get('USE_S3', False):
-                delete_file_from_s3(old_file_url)
-            else:
-                if os.path.exists(old_file_url):
-                    os.remove(old_file_url)
+        if old_files:
+            schedule_metadata_extraction(track)
         
         return api_success(track.to_dict(), "Track updated successfully")
         
     except ValidationError:
         raise
     except FileUploadError:
-        if file_url and current_app.config.get('USE_S3', False):
-            delete_file_from_s3(file_url)
-        elif 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
         db.session.rollback()
         raise
     except Exception as e:
         db.session.rollback()
+        if upload:
+            upload.discard()
         current_app.logger.error(f"Error updating track {track_id}: {str(e)}")
         raise
 
@@ -301,17 +372,15 @@ def delete_track(track_id):
         if track.user_id != current_user.id:
             raise AuthorizationError("You don't have permission to delete this track")
         
-        file_url = track.audio_url
+        stored_files = track.stored_files()
         
         db.session.delete(track)
+        search.remove_track(track_id)
+        for url in stored_files:
+            queue_deletion(url)
+        invalidate_cache(*track_tags(track_id))
         db.session.commit()
-        
-        if current_app.config.get('USE_S3', False):
-            delete_file_from_s3(file_url)
-        else:
-            if os.path.exists(file_url):
-                os.remove(file_url)
-            
+
         return api_success(message="Track deleted successfully")
         
     except AuthorizationError:
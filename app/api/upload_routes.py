@@ -0,0 +1,320 @@
+import os
+import uuid
+import base64
+import shutil
+from datetime import datetime, timedelta
+from flask import Blueprint, request, current_app
+from flask_login import current_user, login_required
+from sqlalchemy import or_
+from werkzeug.utils import secure_filename
+from app.models import db, UploadSession
+from app.utils.errors import (
+    api_success, APIError, ValidationError, ConflictError, ResourceNotFoundError,
+    validate_file_extension
+)
+from app.utils.uploads import store_staged_file, validate_audio_content, SNIFF_SIZE
+from app.utils.storage import get_storage
+from app.utils.metadata_extraction import schedule_metadata_extraction
+from app.api.track_routes import (
+    ALLOWED_EXTENSIONS, MAX_CONTENT_LENGTH, generate_unique_filename, save_new_track
+)
+
+# Resumable, chunked track uploads (modelled on the tus protocol):
+#   POST   /api/uploads/               create a session (Upload-Length)
+#   PATCH  /api/uploads/<id>           append a chunk at Upload-Offset
+#   HEAD   /api/uploads/<id>           current Upload-Offset, to resume
+#   POST   /api/uploads/<id>/finalize  turn the completed upload into a Track
+#   DELETE /api/uploads/<id>           abandon the upload
+# Each request carries at most one chunk, so a worker is only held for as
+# long as that chunk takes, and a dropped connection costs one chunk.
+#
+# A PATCH or finalize first claims the session with a conditional UPDATE
+# and commits, and only then touches the staged file; a request that
+# loses the race gets 409 without having written anything.
+
+uploads_routes = Blueprint('uploads', __name__)
+
+CHUNK_READ_SIZE = 64 * 1024
+TRACK_FIELDS = ('title', 'genre', 'duration', 'artist_name')
+
+
+def staging_folder():
+    folder = os.path.join(current_app.config.get('UPLOAD_FOLDER', 'uploads'), '.resumable')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+def staging_path(upload_session):
+    return os.path.join(staging_folder(), f"{upload_session.id}.part")
+
+def session_expiry():
+    return datetime.utcnow() + timedelta(hours=current_app.config.get('RESUMABLE_SESSION_TTL_HOURS', 24))
+
+def parse_upload_metadata(header):
+    """Decode a tus Upload-Metadata header: 'key base64value,key base64value'"""
+    metadata = {}
+    for pair in filter(None, (item.strip() for item in header.split(','))):
+        key, _, value = pair.partition(' ')
+        try:
+            metadata[key] = base64.b64decode(value).decode('utf-8') if value else ''
+        except ValueError:
+            raise ValidationError("Invalid Upload-Metadata header", errors={key: "Not base64"})
+    return metadata
+
+def get_own_session(upload_id):
+    upload_session = UploadSession.query.get(upload_id)
+    if not upload_session or upload_session.user_id != current_user.id:
+        raise ResourceNotFoundError("Upload")
+    return upload_session
+
+def upload_headers(upload_session):
+    return {
+        'Upload-Offset': str(upload_session.upload_offset),
+        'Upload-Length': str(upload_session.upload_length),
+        'Upload-Expires': upload_session.expires_at.strftime('%a, %d %b %Y %H:%M:%S GMT'),
+        'Cache-Control': 'no-store'
+    }
+
+def claimable():
+    """Sessions no request holds, or whose holder is presumed dead"""
+    stale = datetime.utcnow() - timedelta(seconds=current_app.config.get('RESUMABLE_CLAIM_TIMEOUT', 300))
+    return or_(UploadSession.state == 'open', UploadSession.claimed_at < stale)
+
+def claim_session(upload_id, state, *conditions):
+    """Claim a free session for `state` if conditions hold; returns the claim token, or None"""
+    token = uuid.uuid4().hex
+    claimed = UploadSession.query.filter(UploadSession.id == upload_id, claimable(), *conditions)\
+                                 .update({'state': state, 'claim_token': token, 'claimed_at': datetime.utcnow()},
+                                         synchronize_session=False)
+    db.session.commit()
+    return token if claimed else None
+
+def release_session(upload_id, token, **values):
+    """Release a claim, applying values; False if it had been lost"""
+    released = UploadSession.query.filter_by(id=upload_id, claim_token=token)\
+                                  .update({'state': 'open', 'claim_token': None, 'claimed_at': None, **values},
+                                          synchronize_session=False)
+    db.session.commit()
+    return bool(released)
+
+def restore_staged_file(upload_id, token, stored, path):
+    # Finalizing failed after the staged bytes were moved into storage: put
+    # them back so the upload can be finalized again, or, failing that,
+    # drop the session rather than leave it complete with nothing behind it
+    try:
+        with get_storage().open(stored.file_url) as source, open(path, 'wb') as target:
+            shutil.copyfileobj(source, target, CHUNK_READ_SIZE)
+    except Exception:
+        current_app.logger.exception(f"Could not restore the staged file of upload {upload_id}")
+        UploadSession.query.filter_by(id=upload_id, claim_token=token).delete(synchronize_session=False)
+        db.session.commit()
+    else:
+        release_session(upload_id, token)
+    stored.discard()
+
+def collect_expired_sessions(limit=None):
+    """Delete expired sessions and their staged bytes; returns how many"""
+    query = UploadSession.query.filter(UploadSession.expires_at < datetime.utcnow())\
+                               .order_by(UploadSession.expires_at)
+    if limit:
+        query = query.limit(limit)
+    expired = query.all()
+    for upload_session in expired:
+        path = staging_path(upload_session)
+        if os.path.exists(path):
+            os.remove(path)
+        db.session.delete(upload_session)
+    db.session.commit()
+    return len(expired)
+
+
+# Start a resumable upload
+@uploads_routes.route('/', methods=['POST'])
+@login_required
+def create_upload():
+    """
+    Creates a resumable upload. Send Upload-Length and tus-style
+    Upload-Metadata (filename, title, genre, duration, artist_name), or the
+    same keys as JSON.
+    """
+    data = request.get_json(silent=True) or {}
+    if 'Upload-Metadata' in request.headers:
+        data = {**data, **parse_upload_metadata(request.headers['Upload-Metadata'])}
+    upload_length = request.headers.get('Upload-Length', data.get('upload_length'))
+
+    try:
+        upload_length = int(upload_length)
+    except (TypeError, ValueError):
+        raise ValidationError("Upload-Length is required", errors={"upload_length": "Required field"})
+    if upload_length <= 0 or upload_length > MAX_CONTENT_LENGTH:
+        raise ValidationError(
+            f"File too large. Maximum size: {MAX_CONTENT_LENGTH // (1024 * 1024)}MB",
+            errors={"upload_length": "Maximum file size exceeded"}
+        )
+
+    filename = secure_filename(data.get('filename') or '')
+    if not filename:
+        raise ValidationError("Filename is required", errors={"filename": "Required field"})
+    validate_file_extension(filename, ALLOWED_EXTENSIONS)
+    if not data.get('title'):
+        raise ValidationError("Title is required", errors={"title": "Required field"})
+    if not data.get('artist_name'):
+        raise ValidationError("Artist name is required", errors={"artist_name": "Required field"})
+
+    # Opportunistically reclaim a few abandoned uploads
+    collect_expired_sessions(limit=20)
+
+    upload_session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        filename=filename,
+        content_type=data.get('content_type') or data.get('filetype'),
+        upload_length=upload_length,
+        upload_offset=0,
+        fields={key: data[key] for key in TRACK_FIELDS if data.get(key) is not None},
+        expires_at=session_expiry()
+    )
+    open(staging_path(upload_session), 'wb').close()
+    db.session.add(upload_session)
+    db.session.commit()
+
+    headers = upload_headers(upload_session)
+    headers['Location'] = f"{request.base_url.rstrip('/')}/{upload_session.id}"
+    response, status = api_success(upload_session.to_dict(), "Upload created", 201)
+    response.headers.extend(headers)
+    return response, status
+
+# Report how much of an upload has been received
+@uploads_routes.route('/<upload_id>', methods=['GET', 'HEAD'])
+@login_required
+def get_upload(upload_id):
+    """Returns an upload's progress; HEAD gives just the Upload-Offset header"""
+    upload_session = get_own_session(upload_id)
+    response, status = api_success(upload_session.to_dict())
+    response.headers.extend(upload_headers(upload_session))
+    return response, status
+
+# Append one chunk
+@uploads_routes.route('/<upload_id>', methods=['PATCH'])
+@login_required
+def append_chunk(upload_id):
+    """
+    Appends the request body at Upload-Offset, which must equal the bytes
+    received so far (409 otherwise). Responds 204 with the new Upload-Offset.
+    """
+    upload_session = get_own_session(upload_id)
+    if request.mimetype != 'application/offset+octet-stream':
+        raise APIError("Content-Type must be application/offset+octet-stream", 415)
+    try:
+        offset = int(request.headers['Upload-Offset'])
+    except (KeyError, ValueError):
+        raise ValidationError("Upload-Offset is required", errors={"Upload-Offset": "Required header"})
+    if offset != upload_session.upload_offset:
+        raise ConflictError("Upload-Offset does not match", errors={"upload_offset": upload_session.upload_offset})
+
+    max_chunk = current_app.config.get('RESUMABLE_CHUNK_MAX_SIZE', 8 * 1024 * 1024)
+    remaining = upload_session.upload_length - offset
+    length = request.content_length
+    if length is None:
+        raise APIError("Content-Length is required", 411)
+    if length > max_chunk:
+        raise APIError(f"Chunk too large. Maximum chunk size: {max_chunk} bytes", 413)
+    if length > remaining:
+        raise ValidationError("Chunk exceeds Upload-Length", errors={"upload_length": upload_session.upload_length})
+
+    token = claim_session(upload_id, 'writing', UploadSession.upload_offset == offset)
+    if token is None:
+        db.session.refresh(upload_session)
+        raise ConflictError("Upload-Offset does not match, or another request is writing this upload",
+                            errors={"upload_offset": upload_session.upload_offset})
+
+    path = staging_path(upload_session)
+    received = 0
+    head = b''
+    try:
+        if not os.path.exists(path):
+            raise ResourceNotFoundError("Upload")
+        with open(path, 'r+b') as f:
+            f.seek(offset)
+            stream = request.stream
+            while received < length:
+                chunk = stream.read(min(CHUNK_READ_SIZE, length - received))
+                if not chunk:
+                    break
+                if offset + received < SNIFF_SIZE:
+                    head += chunk[:SNIFF_SIZE - offset - received]
+                f.write(chunk)
+                received += len(chunk)
+
+        # Fail fast on content that isn't the claimed audio format
+        if offset == 0 and (len(head) >= SNIFF_SIZE or received == upload_session.upload_length):
+            validate_audio_content(head, upload_session.filename)
+    except Exception:
+        db.session.rollback()
+        release_session(upload_id, token)
+        raise
+
+    if not release_session(upload_id, token, upload_offset=offset + received, expires_at=session_expiry()):
+        raise ConflictError("Upload was modified concurrently")
+
+    db.session.refresh(upload_session)
+    return '', 204, upload_headers(upload_session)
+
+# Turn a completed upload into a track
+@uploads_routes.route('/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finalize_upload(upload_id):
+    """Creates the track from a fully received upload"""
+    upload_session = get_own_session(upload_id)
+    if not upload_session.is_complete:
+        raise ConflictError(
+            "Upload is incomplete",
+            errors={"upload_offset": upload_session.upload_offset,
+                    "upload_length": upload_session.upload_length}
+        )
+
+    # Track fields may be amended at finalize time
+    data = request.get_json(silent=True) or {}
+    fields = {**upload_session.fields, **{key: data[key] for key in TRACK_FIELDS if key in data}}
+
+    token = claim_session(upload_id, 'finalizing', UploadSession.upload_offset >= UploadSession.upload_length)
+    if token is None:
+        raise ConflictError("Upload is already being finalized or written")
+
+    path = staging_path(upload_session)
+    try:
+        stored = store_staged_file(
+            path, upload_session.filename,
+            generate_unique_filename(upload_session.filename), upload_session.content_type
+        )
+    except Exception:
+        db.session.rollback()
+        release_session(upload_id, token)
+        raise
+    try:
+        new_track = save_new_track(fields, stored.file_url)
+        if not UploadSession.query.filter_by(id=upload_id, claim_token=token).delete(synchronize_session=False):
+            raise ConflictError("Upload was modified concurrently")
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        restore_staged_file(upload_id, token, stored, path)
+        current_app.logger.error(f"Error finalizing upload {upload_id}: {str(e)}")
+        raise
+    schedule_metadata_extraction(new_track)
+    return api_success(new_track.to_dict(), "Track uploaded successfully", 201)
+
+# Abandon an upload
+@uploads_routes.route('/<upload_id>', methods=['DELETE'])
+@login_required
+def delete_upload(upload_id):
+    upload_session = get_own_session(upload_id)
+    path = staging_path(upload_session)
+    # Not while a chunk is being written or the file moved into storage
+    deleted = UploadSession.query.filter(UploadSession.id == upload_id, claimable())\
+                                 .delete(synchronize_session=False)
+    db.session.commit()
+    if not deleted:
+        raise ConflictError("Upload is busy; try again")
+    if os.path.exists(path):
+        os.remove(path)
+    return '', 204
@@ -1,16 +1,95 @@
 from flask import Blueprint, request
 from flask_login import current_user, login_required
-from app.models import db, Playlist, Track
+from sqlalchemy import exists, func
+from app.models import db, Playlist, Track, playlist_tracks
 from app.utils.errors import (
     api_success, 
     ValidationError, 
     AuthorizationError, 
-    ResourceNotFoundError
+    ResourceNotFoundError,
+    check_not_modified,
+    compute_etag,
+    api_success_stream
 )
+from app.utils.serializers import iter_playlists, summarize_playlists
+from app.utils.pagination import keyset_paginate
 
 
 playlist_routes = Blueprint('myplaylist', __name__)
 
+# Most operations, and tracks across them, one batch edit may carry
+MAX_BATCH_OPERATIONS = 100
+MAX_BATCH_TRACKS = 500
+
+
+def _wants_delta(default=False):
+    """?response=delta (or full) picks the reply to a track list edit"""
+    mode = request.args.get('response')
+    return default if mode not in ('delta', 'full') else mode == 'delta'
+
+def _edit_response(playlist, changes, message, delta):
+    # A delta describes only what changed, so its size doesn't grow with
+    # the playlist; the full reply serializes every track
+    if not delta:
+        return api_success(data=playlist.to_dict(), message=message)
+    return api_success(data={
+        'playlist_id': playlist.id,
+        'changes': changes,
+        # Other tracks' positions were respaced; re-read them if kept
+        'renumbered': playlist.renumbered,
+        'updated_at': playlist.updated_at.isoformat()
+    }, message=message)
+
+def _track_ids(value, field, room=MAX_BATCH_TRACKS):
+    """The ids of one operation; `room` is what's left of the request's track budget"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        value = [value]
+    # Checked before the ids are looked at, let alone looked up
+    if isinstance(value, list) and len(value) > room:
+        raise ValidationError(f"At most {MAX_BATCH_TRACKS} tracks per request", errors={field: "Too many tracks"})
+    if not isinstance(value, list) or not value or \
+            not all(isinstance(item, int) and not isinstance(item, bool) for item in value):
+        raise ValidationError(f"{field} must be a track id or a list of them", errors={field: "Invalid value"})
+    if len(set(value)) != len(value):
+        raise ValidationError(f"{field} lists a track more than once", errors={field: "Duplicate track ids"})
+    return value
+
+def _check_after(playlist, after, moving=()):
+    if after is None:
+        return
+    if not isinstance(after, int) or isinstance(after, bool) or after in moving:
+        raise ValidationError("after must be another track in the playlist", errors={"after": "Invalid value"})
+    if not playlist.has_track(after):
+        raise ValidationError("Track to insert after is not in the playlist", errors={"after": "Not in playlist"})
+
+def _add_tracks(playlist, track_ids, operation):
+    """Validate and apply one add; `after` absent appends, null prepends"""
+    found = {track_id for track_id, in db.session.query(Track.id).filter(Track.id.in_(track_ids))}
+    if len(found) != len(track_ids):
+        raise ResourceNotFoundError("Track")
+    present = playlist.track_ids_present(track_ids)
+    if present:
+        raise ValidationError("Track already in playlist", errors={"track_ids": sorted(present)})
+    after = operation.get('after')
+    _check_after(playlist, after, track_ids)
+    entries = playlist.add_tracks(track_ids, after=after, at_end='after' not in operation)
+    return [{'op': 'add', 'track_id': entry['track_id'], 'position': entry['position'], 'after': after}
+            for entry in entries]
+
+def _remove_tracks(playlist, track_ids):
+    missing = set(track_ids) - playlist.track_ids_present(track_ids)
+    if missing:
+        raise ValidationError("Track not in playlist", errors={"track_ids": sorted(missing)})
+    playlist.remove_tracks(track_ids)
+    return [{'op': 'remove', 'track_id': track_id} for track_id in track_ids]
+
+def _move_track(playlist, track_id, after):
+    if not playlist.has_track(track_id):
+        raise ValidationError("Track not in playlist", errors={"track_id": track_id})
+    _check_after(playlist, after, (track_id,))
+    position = playlist.move_track(track_id, after)
+    return [{'op': 'move', 'track_id': track_id, 'position': position, 'after': after}]
+
 @playlist_routes.route('/', methods=['POST'])
 @login_required
 def create_playlist():
@@ -26,9 +105,9 @@ def create_playlist():
     
     # Add track if provided
     if track_id:
-        track = Track.query.get(track_id)
-        if track:
-            playlist.tracks.append(track)
+        if db.session.query(exists().where(Track.id == track_id)).scalar():
+            db.session.flush()
+            playlist.add_tracks([track_id])
     
     db.session.commit()
     return api_success(data=playlist.to_dict(), message="Playlist created", status_code=201)
@@ -42,7 +121,19 @@ def get_playlist(playlist_id):
         raise ResourceNotFoundError("Playlist")
     if playlist.user_id != current_user.id:
         raise AuthorizationError("Access denied")
-    return api_success(data=playlist.to_dict())
+
+    # The payload embeds the tracks, so their changes count too
+    tracks_modified, track_count = db.session.query(func.max(Track.updated_at), func.count(Track.id))\
+        .join(playlist_tracks, playlist_tracks.c.track_id == Track.id)\
+        .filter(playlist_tracks.c.playlist_id == playlist_id).one()
+    last_modified = max(filter(None, (playlist.updated_at, tracks_modified)), default=None)
+    not_modified = check_not_modified(
+        compute_etag('playlist', playlist_id, playlist.updated_at, tracks_modified, track_count),
+        last_modified, private=True
+    )
+    if not_modified:
+        return not_modified
+    return api_success(data=playlist)
 
 # Update playlist details (e.g., change the name)
 @playlist_routes.route('/<int:playlist_id>', methods=['PUT', 'PATCH'])
@@ -60,6 +151,52 @@ def update_playlist(playlist_id):
     db.session.commit()
     return api_success(data=playlist.to_dict(), message="Playlist updated")
 
+# A page of a playlist's tracks, in playlist order
+@playlist_routes.route('/<int:playlist_id>/tracks', methods=['GET'])
+@login_required
+def get_playlist_tracks(playlist_id):
+    """
+    Pass the previous page's `next_cursor` as `cursor` for the next page.
+    Each page is an index seek along the playlist's positions, however far
+    into the playlist it is.
+    """
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+    cursor = request.args.get('cursor')
+
+    playlist = Playlist.query.get(playlist_id)
+    if not playlist:
+        raise ResourceNotFoundError("Playlist")
+    if playlist.user_id != current_user.id:
+        raise AuthorizationError("Access denied")
+
+    query = db.session.query(Track, playlist_tracks.c.position, playlist_tracks.c.track_id)\
+        .join(playlist_tracks, playlist_tracks.c.track_id == Track.id)\
+        .filter(playlist_tracks.c.playlist_id == playlist_id)
+    rows, next_cursor = keyset_paginate(query, (playlist_tracks.c.position, playlist_tracks.c.track_id),
+                                        'position', cursor, per_page, descending=False)
+
+    # Edits to the track list touch the playlist; edits to the tracks
+    # themselves show on the page
+    tracks = [row.Track for row in rows]
+    tracks_modified = max((track.updated_at for track in tracks if track.updated_at), default=None)
+    not_modified = check_not_modified(
+        compute_etag('playlist-tracks', playlist_id, playlist.updated_at, cursor, per_page,
+                     *[f"{track.id}@{track.updated_at}" for track in tracks]),
+        max(filter(None, (playlist.updated_at, tracks_modified)), default=None), private=True
+    )
+    if not_modified:
+        return not_modified
+
+    return api_success(data={
+        'tracks': tracks,
+        'positions': [row.position for row in rows],
+        'pagination': {
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        }
+    })
+
 # Add a track to the playlist
 @playlist_routes.route('/<int:playlist_id>/tracks', methods=['POST'])
 @login_required
@@ -75,23 +212,88 @@ def add_track_to_playlist(playlist_id):
     if not track_id:
         raise ValidationError("track_id is required", errors={"track_id": "Required field"})
     
-    track = Track.query.get(track_id)
-    if not track:
-        raise ResourceNotFoundError("Track")
-    
-    if track in playlist.tracks:
-        raise ValidationError("Track already in playlist")
-    
-    playlist.tracks.append(track)
+    changes = _add_tracks(playlist, _track_ids(track_id, 'track_id'), data)
+    db.session.commit()
+    return _edit_response(playlist, changes, "Track added to playlist", _wants_delta())
+
+# Add, remove and reorder tracks in one request. The body's `operations`
+# run in order, in one transaction; any invalid one rejects the batch:
+#   {"op": "add", "track_ids": [...], "after": <track id> | null}
+#       (without "after" the tracks are appended; null puts them first)
+#   {"op": "remove", "track_ids": [...]}
+#   {"op": "move", "track_id": <id>, "after": <track id> | null}
+# Replies with the changes (?response=full for the whole playlist)
+@playlist_routes.route('/<int:playlist_id>/tracks', methods=['PATCH'])
+@login_required
+def edit_playlist_tracks(playlist_id):
+    playlist = Playlist.query.get(playlist_id)
+    if not playlist:
+        raise ResourceNotFoundError("Playlist")
+    if playlist.user_id != current_user.id:
+        raise AuthorizationError("Access denied")
+
+    operations = (request.get_json() or {}).get('operations')
+    if not isinstance(operations, list) or not operations:
+        raise ValidationError("operations is required", errors={"operations": "Required field"})
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise ValidationError(f"At most {MAX_BATCH_OPERATIONS} operations per request",
+                              errors={"operations": "Too many operations"})
+
+    changes = []
+    try:
+        for operation in operations:
+            kind = operation.get('op') if isinstance(operation, dict) else None
+            # Every change is one track, so what's left of the budget
+            room = MAX_BATCH_TRACKS - len(changes)
+            if kind == 'add':
+                changes += _add_tracks(playlist, _track_ids(operation.get('track_ids'), 'track_ids', room), operation)
+            elif kind == 'remove':
+                changes += _remove_tracks(playlist, _track_ids(operation.get('track_ids'), 'track_ids', room))
+            elif kind == 'move':
+                track_id, = _track_ids(operation.get('track_id'), 'track_id', room)
+                if 'after' not in operation:
+                    raise ValidationError("after is required to move a track", errors={"after": "Required field"})
+                changes += _move_track(playlist, track_id, operation['after'])
+            else:
+                raise ValidationError("op must be add, remove or move", errors={"op": "Invalid value"})
+    except Exception:
+        db.session.rollback()
+        raise
+
     db.session.commit()
-    return api_success(data=playlist.to_dict(), message="Track added to playlist", status_code=200)
+    return _edit_response(playlist, changes, "Playlist tracks updated", _wants_delta(default=True))
 
 # get all playlists for the current user
 @playlist_routes.route('/', methods=['GET'])
 @login_required
 def get_all_playlists():
-    playlists = Playlist.query.filter_by(user_id=current_user.id).all()
-    return api_success(data={"playlists": [playlist.to_dict() for playlist in playlists]})
+    """
+    Every playlist of the current user with all of its tracks. With
+    view=summary, one row per playlist instead: track_count,
+    total_duration and cover_track_ids; page through a playlist's tracks
+    with GET /<playlist_id>/tracks.
+    """
+    summary = request.args.get('view') == 'summary'
+    playlists_modified, playlist_count, tracks_modified, entry_count = db.session.query(
+        func.max(Playlist.updated_at), func.count(func.distinct(Playlist.id)),
+        func.max(Track.updated_at), func.count(playlist_tracks.c.track_id)
+    ).select_from(Playlist)\
+     .outerjoin(playlist_tracks, playlist_tracks.c.playlist_id == Playlist.id)\
+     .outerjoin(Track, Track.id == playlist_tracks.c.track_id)\
+     .filter(Playlist.user_id == current_user.id).one()
+    last_modified = max(filter(None, (playlists_modified, tracks_modified)), default=None)
+    not_modified = check_not_modified(
+        compute_etag('playlists', current_user.id, playlists_modified, playlist_count,
+                     tracks_modified, entry_count, summary),
+        last_modified, private=True
+    )
+    if not_modified:
+        return not_modified
+    if summary:
+        return api_success(data={'playlists': summarize_playlists(current_user.id)})
+    # Playlists × tracks can be large: stream it, a batch of playlists at a time
+    playlists = Playlist.query.filter_by(user_id=current_user.id).order_by(Playlist.id)
+    return api_success_stream('playlists', iter_playlists(playlists))
 
 # Remove a track from the playlist
 @playlist_routes.route('/<int:playlist_id>/tracks/<int:track_id>', methods=['DELETE'])
@@ -103,15 +305,11 @@ def remove_track_from_playlist(playlist_id, track_id):
     if playlist.user_id != current_user.id:
         raise AuthorizationError("Access denied")
     
-    track = Track.query.get(track_id)
-    if not track:
+    if not db.session.query(exists().where(Track.id == track_id)).scalar():
         raise ResourceNotFoundError("Track")
-    if track not in playlist.tracks:
-        raise ValidationError("Track not in playlist")
-    
-    playlist.tracks.remove(track)
+    changes = _remove_tracks(playlist, [track_id])
     db.session.commit()
-    return api_success(data=playlist.to_dict(), message="Track removed from playlist", status_code=200)
+    return _edit_response(playlist, changes, "Track removed from playlist", _wants_delta())
 
 # Delete a playlist
 @playlist_routes.route('/<int:playlist_id>', methods=['DELETE'])
@@ -0,0 +1,91 @@
+import click
+from flask.cli import AppGroup
+from .counters import backfill_like_counts, backfill_comment_counts, rebuild_track_rankings
+from .search import reindex_search
+from .uploads import gc_uploads
+from .storage import drain_storage_deletions
+from .metadata import extract_track_metadata
+from .static import compress_static_assets
+from .indexes import audit_query_plans
+
+# Creates a maintenance group to hold our commands
+# So we can type `flask maintenance --help`
+maintenance_commands = AppGroup('maintenance')
+
+
+# Creates the `flask maintenance backfill-like-counts` command
+@maintenance_commands.command('backfill-like-counts')
+def backfill_likes():
+    updated = backfill_like_counts()
+    click.echo(f"Recomputed like_count for {updated} tracks")
+
+
+# Creates the `flask maintenance backfill-comment-counts` command
+@maintenance_commands.command('backfill-comment-counts')
+def backfill_comments():
+    updated = backfill_comment_counts()
+    click.echo(f"Recomputed comment_count for {updated} tracks")
+
+
+# Creates the `flask maintenance rebuild-rankings` command
+@maintenance_commands.command('rebuild-rankings')
+def rebuild_rankings():
+    ranked = rebuild_track_rankings()
+    click.echo(f"Rebuilt the ranking for {ranked} tracks")
+
+
+# Creates the `flask maintenance reindex-search` command
+@maintenance_commands.command('reindex-search')
+def reindex():
+    reindex_search()
+    click.echo("Rebuilt the track search index")
+
+
+# Creates the `flask maintenance gc-uploads` command
+@maintenance_commands.command('gc-uploads')
+def collect_uploads():
+    expired, orphans = gc_uploads()
+    click.echo(f"Removed {expired} expired uploads and {orphans} orphaned staging files")
+
+
+# Creates the `flask maintenance drain-deletions` command
+@maintenance_commands.command('drain-deletions')
+@click.option('--watch', is_flag=True, help='Keep draining as deletions come due')
+@click.option('--interval', default=10, help='Seconds between polls with --watch')
+@click.option('--retry-failed', is_flag=True, help='Re-queue deletions that gave up')
+@click.option('--prune-days', type=int, help='Forget completed deletions older than this')
+def drain_deletions(watch, interval, retry_failed, prune_days):
+    drain_storage_deletions(watch, interval, retry_failed, prune_days)
+
+
+# Creates the `flask maintenance extract-metadata` command
+@maintenance_commands.command('extract-metadata')
+@click.option('--all', 'reprocess', is_flag=True, help='Re-read tracks that already have metadata')
+@click.option('--batch-size', default=200, help='Tracks per bulk update')
+@click.option('--workers', type=int, help='Worker processes (default METADATA_WORKERS)')
+@click.option('--missing-peaks', is_flag=True, help='Only tracks without waveform peaks')
+def extract_metadata(reprocess, batch_size, workers, missing_peaks):
+    processed, with_metadata, with_peaks, with_preview = extract_track_metadata(
+        reprocess, batch_size, workers, missing_peaks
+    )
+    click.echo(f"Processed {processed} tracks: {with_metadata} with metadata, "
+               f"{with_peaks} with peaks, {with_preview} with previews")
+
+
+# Creates the `flask maintenance compress-static` command
+@maintenance_commands.command('compress-static')
+@click.option('--force', is_flag=True, help='Recompress files that are already up to date')
+def compress_static(force):
+    files, written = compress_static_assets(force=force)
+    click.echo(f"Compressed {files} static files: {written} variants written")
+
+
+# Creates the `flask maintenance audit-indexes` command
+@maintenance_commands.command('audit-indexes')
+@click.option('--min-rows', default=10000, help='Also flag full scans of any table this large')
+@click.option('--verbose', is_flag=True, help='Print every query plan')
+def audit_indexes(min_rows, verbose):
+    findings = audit_query_plans(min_rows, verbose, echo=click.echo)
+    if findings:
+        raise click.ClickException(f"{findings} queries scan a large table without an index")
+    click.echo("No unexpected full scans")
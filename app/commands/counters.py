@@ -0,0 +1,31 @@
+from app.models import db, Track, TrackRanking
+from app.utils.response_cache import invalidate_cache
+
+
+def backfill_like_counts():
+    # Recompute every track's stored like_count from the likes table.
+    # Safe to run at any time; the like routes keep the column current
+    # afterwards.
+    updated = Track.refresh_like_counts()
+    TrackRanking.rebuild()
+    invalidate_cache('tracks')
+    db.session.commit()
+    return updated
+
+
+def backfill_comment_counts():
+    # Recompute every track's stored comment_count from the comments table;
+    # the comment routes keep it current afterwards.
+    updated = Track.refresh_comment_counts()
+    db.session.commit()
+    return updated
+
+
+def rebuild_track_rankings():
+    # Regenerate track_rankings from tracks, e.g. after a bulk import that
+    # bypassed the routes which maintain it incrementally. The stored
+    # catalog size is recounted along with it.
+    TrackRanking.rebuild()
+    Track.refresh_track_count()
+    db.session.commit()
+    return TrackRanking.query.count()
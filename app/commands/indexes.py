@@ -0,0 +1,146 @@
+import json
+import re
+from flask import current_app, has_request_context
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+from app.models import db, Track, Playlist, User
+
+# The hot read requests, as the frontend makes them. {track_id} and
+# {playlist_id} are filled in from the database; requests run logged in
+# as the sample playlist's owner.
+AUDIT_REQUESTS = (
+    '/api/auth/',
+    '/api/playlist/ultimate_playlist',
+    '/api/playlist/ultimate_playlist?cursor=',
+    '/api/playlist/ultimate_playlist?genre=rock',
+    '/api/playlist/ultimate_playlist?genre=rock&cursor=',
+    '/api/playlist/ultimate_playlist?sort_by=likes&genre=rock',
+    '/api/tracks/{track_id}',
+    '/api/tracks/{track_id}/stream',
+    '/api/tracks/{track_id}/peaks',
+    '/api/tracks/search?q=track',
+    '/api/tracks/user',
+    '/api/comments/tracks/{track_id}/comments',
+    '/api/comments/tracks/{track_id}/comments/feed',
+    '/api/myplaylist/',
+    '/api/myplaylist/?view=summary',
+    '/api/myplaylist/{playlist_id}',
+    '/api/myplaylist/{playlist_id}/tracks',
+    '/api/likes/current',
+)
+
+# Tables that grow with use: a full scan of one is a finding whatever its
+# size today. Others are flagged once they reach min_rows.
+GROWING_TABLES = ('tracks', 'likes', 'comments', 'playlists', 'playlist_tracks', 'track_rankings', 'users')
+
+# Full scans that are the point of the query: (endpoint, table) -> why
+EXPECTED_SCANS = {}
+
+# SQLite reports a full table scan as "SCAN <table>", with no index named
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+def _sqlite_scans(conn, statement, parameters):
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    details = [row[-1] for row in rows]
+    return details, [match.group(1) for match in map(_SQLITE_SCAN.match, details) if match]
+
+def _postgresql_scans(conn, statement, parameters):
+    # With sequential scans priced out, one left in the plan means no index
+    # could serve it, rather than that the table is small today
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    details, scans = [], []
+
+    def walk(node, depth=0):
+        relation = node.get('Relation Name')
+        details.append(f"{'  ' * depth}{node['Node Type']}{f' on {relation}' if relation else ''}")
+        if node['Node Type'] == 'Seq Scan':
+            scans.append(relation)
+        for child in node.get('Plans', ()):
+            walk(child, depth + 1)
+
+    walk(plan[0]['Plan'])
+    return details, scans
+
+EXPLAINERS = {'sqlite': _sqlite_scans, 'postgresql': _postgresql_scans}
+
+
+def _capture_statements(requests, user_id):
+    """Run each request and return [(path, endpoint, [(statement, parameters)])]"""
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.append((statement, parameters))
+
+    # Cached responses would hide their queries
+    cache = current_app.extensions.pop('response_cache', None)
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        client = current_app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        results = []
+        for path in requests:
+            captured.clear()
+            response = client.get(path)
+            response.get_data()
+            response.close()
+            endpoint = current_app.url_map.bind('').match(path.split('?')[0])[0]
+            results.append((path, endpoint, response.status_code, list(captured)))
+        return results
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+        if cache is not None:
+            current_app.extensions['response_cache'] = cache
+
+
+def audit_query_plans(min_rows=10000, verbose=False, echo=print):
+    # EXPLAIN every query the hot read endpoints run against the current
+    # database and report full scans of large tables. Returns the number
+    # of unexpected scans.
+    explain = EXPLAINERS.get(db.engine.dialect.name)
+    if explain is None:
+        raise RuntimeError(f"No query plan audit for {db.engine.dialect.name}")
+    track = Track.query.order_by(Track.id).first()
+    playlist = Playlist.query.order_by(Playlist.id).first()
+    user_id = playlist.user_id if playlist else db.session.query(func.min(User.id)).scalar()
+    if track is None or user_id is None:
+        raise RuntimeError("Seed the database first (flask seed all)")
+    requests = [path.format(track_id=track.id, playlist_id=playlist.id if playlist else 0)
+                for path in AUDIT_REQUESTS]
+    db.session.remove()
+
+    large = set(GROWING_TABLES)
+    with db.engine.connect() as conn:
+        for table in db.metadata.tables.values():
+            if table.name not in large and conn.execute(table.select().with_only_columns(func.count())).scalar() >= min_rows:
+                large.add(table.name)
+
+    findings = 0
+    for path, endpoint, status, statements in _capture_statements(requests, user_id):
+        echo(f"{path} ({endpoint}): {status}, {len(statements)} queries")
+        seen = set()
+        for statement, parameters in statements:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            with db.engine.connect() as conn, conn.begin() as transaction:
+                details, scans = explain(conn, statement, parameters)
+                transaction.rollback()
+            for table in scans:
+                if table not in large:
+                    continue
+                reason = EXPECTED_SCANS.get((endpoint, table))
+                if reason:
+                    echo(f"  expected full scan of {table}: {reason}")
+                    continue
+                findings += 1
+                echo(f"  FULL SCAN of {table}:\n    {' '.join(statement.split())}")
+            if verbose:
+                for detail in details:
+                    echo(f"    | {detail}")
+    return findings
@@ -0,0 +1,9 @@
+from app.utils.metadata_extraction import extract_backlog
+
+
+def extract_track_metadata(reprocess=False, batch_size=200, workers=None, missing_peaks=False):
+    # Fill duration, bitrate, sample rate, channels, codec, waveform peaks
+    # and preview renditions from the stored files of tracks that haven't
+    # been processed (or all of them)
+    return extract_backlog(batch_size=batch_size, workers=workers, reprocess=reprocess,
+                           missing_peaks=missing_peaks)
@@ -0,0 +1,9 @@
+from app.models import db
+from app.utils.search import rebuild_index
+
+
+def reindex_search():
+    # Regenerate the SQLite FTS table from tracks. Postgres maintains its
+    # generated search_vector column itself, so this is a no-op there.
+    rebuild_index()
+    db.session.commit()
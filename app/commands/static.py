@@ -0,0 +1,57 @@
+import gzip
+import os
+from flask import current_app
+from app.utils.static_assets import ENCODINGS
+
+try:
+    import brotli
+except ImportError:  # gzip only without it
+    brotli = None
+
+# Text formats worth compressing; images and fonts already are
+COMPRESSIBLE_TYPES = ('.js', '.mjs', '.css', '.html', '.svg', '.json', '.map', '.txt', '.xml', '.ico', '.wasm')
+# Smaller files gain nothing over the headers
+MIN_COMPRESS_SIZE = 1024
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11) if brotli else None
+    # mtime=0 keeps the output (and so its ETag's size) stable across builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_static_assets(root=None, force=False):
+    # Write .br / .gz next to each compressible file in the React build, for
+    # the static middleware to send to clients that accept them. Variants
+    # that wouldn't be smaller are removed rather than written. Returns
+    # (files, variants written).
+    root = root or current_app.static_folder
+    files = written = 0
+    suffixes = tuple(suffix for _, suffix in ENCODINGS)
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(suffixes) or not name.endswith(COMPRESSIBLE_TYPES):
+                continue
+            path = os.path.join(directory, name)
+            if os.path.getsize(path) < MIN_COMPRESS_SIZE:
+                continue
+            files += 1
+            with open(path, 'rb') as f:
+                data = f.read()
+            for encoding, suffix in ENCODINGS:
+                target = path + suffix
+                if not force and os.path.exists(target) and \
+                        os.path.getmtime(target) >= os.path.getmtime(path):
+                    continue
+                compressed = _compress(data, encoding)
+                if compressed is None or len(compressed) >= len(data):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                # Written aside and renamed, so a running server never sees half a file
+                with open(target + '.tmp', 'wb') as f:
+                    f.write(compressed)
+                os.replace(target + '.tmp', target)
+                written += 1
+    return files, written
@@ -0,0 +1,21 @@
+import time
+import click
+from app.utils.deletion_queue import drain_deletions, retry_failed_deletions, prune_deletions
+
+
+def drain_storage_deletions(watch=False, interval=10, retry_failed=False, prune_days=None):
+    # Run queued storage deletions now; with watch=True keep polling, as a
+    # dedicated worker when STORAGE_DELETION_WORKER=off
+    if retry_failed:
+        click.echo(f"Re-queued {retry_failed_deletions()} failed deletions")
+    while True:
+        deleted, failed = drain_deletions()
+        if deleted or failed or not watch:
+            click.echo(f"Deleted {deleted} files, {failed} failed")
+        if prune_days is not None:
+            pruned = prune_deletions(prune_days)
+            if pruned:
+                click.echo(f"Pruned {pruned} completed deletions")
+        if not watch:
+            return
+        time.sleep(interval)
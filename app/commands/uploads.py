@@ -0,0 +1,23 @@
+import os
+import time
+from app.models import UploadSession
+from app.api.upload_routes import collect_expired_sessions, staging_folder
+
+# Staging files younger than this may belong to a session being created
+ORPHAN_GRACE_SECONDS = 60 * 60
+
+
+def gc_uploads():
+    # Drop expired resumable upload sessions with their staged bytes, then
+    # any staging file whose session row no longer exists
+    expired = collect_expired_sessions()
+    folder = staging_folder()
+    live = {session_id for (session_id,) in UploadSession.query.with_entities(UploadSession.id)}
+    orphans = 0
+    cutoff = time.time() - ORPHAN_GRACE_SECONDS
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.endswith('.part') and name[:-len('.part')] not in live and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            orphans += 1
+    return expired, orphans
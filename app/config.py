@@ -1,6 +1,28 @@
 import os
 
 
+def engine_options(database_uri):
+    """
+    SQLAlchemy engine options from the DB_* environment variables. Pool
+    sizing is per worker process and only applies to server databases;
+    SQLite keeps SQLAlchemy's defaults.
+    """
+    options = {'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'True') == 'True'}
+    if database_uri.startswith('sqlite'):
+        return options
+    options.update({
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        # Recycle before the server (or a proxy) drops idle connections
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    })
+    statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    if statement_timeout and database_uri.startswith('postgresql'):
+        options['connect_args'] = {'options': f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     FLASK_RUN_PORT = os.environ.get('FLASK_RUN_PORT')
@@ -11,15 +33,81 @@ class Config:
     # so the connection uri must be updated here (for production)
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         'DATABASE_URL').replace('postgres://', 'postgresql://')
-    SQLALCHEMY_ECHO = True
+    # Pool size, overflow, pre-ping, recycle and statement timeout; under
+    # gevent workers size the pool for the connections each worker runs
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Read replicas (comma-separated URLs), bound as replica_0, replica_1, ...
+    # Safe requests read from a healthy one; see app/utils/replicas.py
+    DATABASE_REPLICA_URLS = [url.strip().replace('postgres://', 'postgresql://')
+                             for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    SQLALCHEMY_BINDS = {f"replica_{i}": {'url': url, **engine_options(url)}
+                        for i, url in enumerate(DATABASE_REPLICA_URLS)}
+    # Replicas further behind than this are skipped; probed this often
+    REPLICA_MAX_LAG_SECONDS = int(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+    REPLICA_CHECK_SECONDS = int(os.environ.get('REPLICA_CHECK_SECONDS', 5))
+    # How long a client's reads stay on the primary after it writes
+    REPLICA_READ_YOUR_WRITES_SECONDS = int(os.environ.get('REPLICA_READ_YOUR_WRITES_SECONDS', 10))
+    # Logs every statement; per-request query stats (SQL_* below) are
+    # usually what you want instead
+    SQLALCHEMY_ECHO = os.environ.get('SQLALCHEMY_ECHO', 'False') == 'True'
     
     # File upload settings
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')
+    # nginx internal location aliasing UPLOAD_FOLDER; when set, audio streams
+    # are handed off with X-Accel-Redirect instead of sent by the worker
+    MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT')
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB limit for file uploads
+    # Resumable uploads: largest PATCH body, and how long an idle session lives
+    RESUMABLE_CHUNK_MAX_SIZE = int(os.environ.get('RESUMABLE_CHUNK_MAX_SIZE', 8 * 1024 * 1024))
+    RESUMABLE_SESSION_TTL_HOURS = int(os.environ.get('RESUMABLE_SESSION_TTL_HOURS', 24))
+    # A chunk write or finalize holding a session this long is presumed dead;
+    # keep it above any request's timeout
+    RESUMABLE_CLAIM_TIMEOUT = int(os.environ.get('RESUMABLE_CLAIM_TIMEOUT', 300))
     
     # AWS S3 Configuration
     USE_S3 = os.environ.get('USE_S3', 'False') == 'True'
     S3_KEY = os.environ.get('S3_KEY')
     S3_SECRET = os.environ.get('S3_SECRET')
     S3_REGION = os.environ.get('S3_REGION', 'us-east-2')
-    S3_BUCKET = os.environ.get('S3_BUCKET')
\ No newline at end of file
+    S3_BUCKET = os.environ.get('S3_BUCKET')
+
+    # Storage backend: local, s3 or memory (defaults to s3 when USE_S3 is set)
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND')
+    # Parallelism and part size for S3 multipart transfers; the connection
+    # pool is shared by every request thread
+    S3_MAX_CONCURRENCY = int(os.environ.get('S3_MAX_CONCURRENCY', 8))
+    S3_PART_SIZE = int(os.environ.get('S3_PART_SIZE', 8 * 1024 * 1024))
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 32))
+    # Queued storage deletions drain on a thread in each app process
+    # ('thread') or only via `flask maintenance drain-deletions` ('off')
+    STORAGE_DELETION_WORKER = os.environ.get('STORAGE_DELETION_WORKER', 'thread')
+    STORAGE_DELETION_INTERVAL = int(os.environ.get('STORAGE_DELETION_INTERVAL', 60))
+    # Audio metadata is read from uploaded files by a pool of worker
+    # processes ('pool'), or only by `flask maintenance extract-metadata` ('off')
+    METADATA_EXTRACTION = os.environ.get('METADATA_EXTRACTION', 'pool')
+    METADATA_WORKERS = int(os.environ.get('METADATA_WORKERS', 2))
+
+    # Response cache for public GET endpoints: lru (per process), redis
+    # (shared by all workers), memory (a local stand-in for redis) or off
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'lru')
+    CACHE_REDIS_URL = os.environ.get('REDIS_URL')
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+    # Seconds an entry is fresh, then how long it may be served stale
+    # while it is rebuilt in the background
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', 30))
+    CACHE_STALE_TTL = int(os.environ.get('CACHE_STALE_TTL', 300))
+    # JSON provider: fast (compiled model encoders) or default (stdlib, via to_dict)
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'fast')
+    # React build files are served by a WSGI middleware ahead of Flask
+    # ('middleware'), or by Flask's static route with the request hooks ('flask')
+    STATIC_ASSETS = os.environ.get('STATIC_ASSETS', 'middleware')
+    # Per-request SQL stats: requests over either budget, or running one
+    # statement SQL_REPEAT_THRESHOLD times (a likely N+1), are logged
+    SQL_QUERY_BUDGET = int(os.environ.get('SQL_QUERY_BUDGET', 25))
+    SQL_TIME_BUDGET_MS = int(os.environ.get('SQL_TIME_BUDGET_MS', 250))
+    SQL_REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD', 10))
+    # current_user comes from a cache of users' public fields: lru (per
+    # process), redis (shared, via REDIS_URL), memory or off
+    PRINCIPAL_CACHE_BACKEND = os.environ.get('PRINCIPAL_CACHE_BACKEND', 'lru')
+    PRINCIPAL_CACHE_MAX_ENTRIES = int(os.environ.get('PRINCIPAL_CACHE_MAX_ENTRIES', 4096))
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 60))
\ No newline at end of file
@@ -2,8 +2,10 @@ from .db import db, environment, SCHEMA, add_prefix_for_prod
 from .user import User
 from .associations import playlist_tracks
 from .track import Track
+from .track_ranking import TrackRanking
 from .playlist import Playlist
 from .comment import Comment
 from .like import Like
-
-
+from .upload_session import UploadSession
+from .storage_deletion import StorageDeletion
+from .counter import Counter
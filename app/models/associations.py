@@ -4,5 +4,14 @@ playlist_tracks = db.Table(
     'playlist_tracks',
     db.Column('playlist_id', db.Integer, db.ForeignKey(add_prefix_for_prod('playlists.id')), primary_key=True),
     db.Column('track_id', db.Integer, db.ForeignKey(add_prefix_for_prod('tracks.id')), primary_key=True),
+    # Sort key within the playlist, spaced Playlist.POSITION_GAP apart so a
+    # move or insert takes a free value between its neighbours. Rows are
+    # written by the Playlist methods, not by appending to .tracks
+    db.Column('position', db.Integer, nullable=False),
     schema=SCHEMA if environment == "production" else None
 )
+
+# Which playlists hold a track; the primary key leads with playlist_id
+db.Index('ix_playlist_tracks_track_id', playlist_tracks.c.track_id)
+# A playlist's tracks in order, and its neighbours of a position
+db.Index('ix_playlist_tracks_playlist_id_position', playlist_tracks.c.playlist_id, playlist_tracks.c.position)
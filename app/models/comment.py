@@ -1,3 +1,4 @@
+from datetime import datetime
 from .db import db, environment, SCHEMA, add_prefix_for_prod
 from sqlalchemy.sql import func
 
@@ -12,6 +13,7 @@ class Comment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('users.id')), nullable=False)
     track_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('tracks.id')), nullable=False)
     created_at = db.Column(db.TIMESTAMP, server_default=func.now())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = db.relationship('User', back_populates='comments')
     track = db.relationship('Track', back_populates='comments')
@@ -25,3 +27,7 @@ class Comment(db.Model):
             'user_username': self.user.username if self.user else "Anonymous",
             'created_at': self.created_at.isoformat() if self.created_at else None
      }
+
+
+# A track's comments in posting order
+db.Index('ix_comments_track_id_created_at_id', Comment.track_id, Comment.created_at, Comment.id)
@@ -0,0 +1,31 @@
+from .db import db, environment, SCHEMA
+from sqlalchemy import update
+
+class Counter(db.Model):
+    """
+    Named counts kept current by the writes that change them, for
+    validators that would otherwise COUNT(*) a whole table. 'tracks' is
+    the size of the catalog, maintained by Track's insert/delete events.
+    """
+    __tablename__ = 'counters'
+
+    if environment == "production":
+        __table_args__ = {'schema': SCHEMA}
+
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+
+    @classmethod
+    def get(cls, name):
+        return db.session.query(cls.value).filter(cls.name == name).scalar() or 0
+
+    @classmethod
+    def put(cls, name, value):
+        """Overwrite a count, e.g. after rows were written around the ORM"""
+        db.session.merge(cls(name=name, value=value))
+
+    @classmethod
+    def adjust(cls, connection, name, delta):
+        """Apply a change on the flushing connection, inside its transaction"""
+        connection.execute(update(cls.__table__).where(cls.__table__.c.name == name)
+                           .values(value=cls.__table__.c.value + delta))
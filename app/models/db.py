@@ -1,11 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
+from app.utils.replicas import RoutingSession
 
 import os
 environment = os.getenv("FLASK_ENV")
 SCHEMA = os.environ.get("SCHEMA")
 
 
-db = SQLAlchemy()
+# Reads can be routed to read replicas (see app/utils/replicas.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # helper function for adding prefix to foreign key column references in production
 def add_prefix_for_prod(attr):
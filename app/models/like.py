@@ -23,4 +23,9 @@ class Like(db.Model):
             'user_id': self.user_id,
             'track_id': self.track_id,
             'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+        }
+
+
+# Per-track lookups (like counts, deleting a track's likes); the primary
+# key leads with user_id
+db.Index('ix_likes_track_id', Like.track_id)
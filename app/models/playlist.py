@@ -1,10 +1,18 @@
+from datetime import datetime
 from .db import db, environment, SCHEMA, add_prefix_for_prod
+from sqlalchemy import bindparam, delete, exists, insert, select, update
 from sqlalchemy.sql import func
 from .associations import playlist_tracks
 
 class Playlist(db.Model):
     __tablename__ = 'playlists'
 
+    # Spacing of track positions: a playlist takes about log2(POSITION_GAP)
+    # inserts at one spot before it has to be renumbered
+    POSITION_GAP = 1024
+    # Set once renumber() has respaced the playlist in this session
+    renumbered = False
+
     if environment == "production":
         __table_args__ = {'schema': SCHEMA}
 
@@ -12,19 +20,146 @@ class Playlist(db.Model):
     name = db.Column(db.String(255), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('users.id')), nullable=False)
     created_at = db.Column(db.TIMESTAMP, server_default=func.now())
+    # Also bumped by touch() when tracks are added or removed
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = db.relationship('User', back_populates='playlists')
     tracks = db.relationship(
         'Track',
         secondary=playlist_tracks,
-        back_populates='playlists'
+        back_populates='playlists',
+        order_by=(playlist_tracks.c.position, playlist_tracks.c.track_id)
     )
 
-    def to_dict(self):
+    def touch(self):
+        """Mark the playlist changed, e.g. when only its track list moved"""
+        self.updated_at = datetime.utcnow()
+
+    # Track membership and order. Each method costs a few index lookups and
+    # writes only the rows it changes, whatever the playlist's length, and
+    # leaves loading .tracks to callers that want the whole list.
+
+    def _entries(self):
+        return playlist_tracks.c.playlist_id == self.id
+
+    def has_track(self, track_id):
+        return db.session.query(
+            exists().where(self._entries(), playlist_tracks.c.track_id == track_id)
+        ).scalar()
+
+    def track_ids_present(self, track_ids):
+        """Which of track_ids are in the playlist"""
+        if not track_ids:
+            return set()
+        return set(db.session.scalars(
+            select(playlist_tracks.c.track_id)
+            .where(self._entries(), playlist_tracks.c.track_id.in_(track_ids))
+        ))
+
+    def position_of(self, track_id):
+        return db.session.scalar(
+            select(playlist_tracks.c.position)
+            .where(self._entries(), playlist_tracks.c.track_id == track_id)
+        )
+
+    def renumber(self):
+        """Respace every position POSITION_GAP apart, keeping the order"""
+        track_ids = db.session.scalars(
+            select(playlist_tracks.c.track_id).where(self._entries())
+            .order_by(playlist_tracks.c.position, playlist_tracks.c.track_id)
+        ).all()
+        if track_ids:
+            db.session.execute(
+                update(playlist_tracks)
+                .where(self._entries(), playlist_tracks.c.track_id == bindparam('entry_track_id'))
+                .values(position=bindparam('entry_position')),
+                [{'entry_track_id': track_id, 'entry_position': (i + 1) * self.POSITION_GAP}
+                 for i, track_id in enumerate(track_ids)]
+            )
+        self.renumbered = True
+
+    def _slots(self, after, count):
+        # `count` free positions, in order, right after track `after` (at the
+        # front if None). Renumbers when the neighbours are too close.
+        for _ in range(2):
+            if after is None:
+                upper = db.session.scalar(select(func.min(playlist_tracks.c.position)).where(self._entries()))
+                if upper is None:
+                    return [(i + 1) * self.POSITION_GAP for i in range(count)]
+                lower = upper - (count + 1) * self.POSITION_GAP
+            else:
+                lower = self.position_of(after)
+                upper = db.session.scalar(
+                    select(func.min(playlist_tracks.c.position))
+                    .where(self._entries(), playlist_tracks.c.position > lower)
+                )
+                if upper is None:
+                    return [lower + (i + 1) * self.POSITION_GAP for i in range(count)]
+            step = (upper - lower) // (count + 1)
+            if step >= 1:
+                return [lower + (i + 1) * step for i in range(count)]
+            self.renumber()
+        raise RuntimeError(f"No room for {count} tracks in playlist {self.id}")
+
+    def add_tracks(self, track_ids, after=None, at_end=True):
+        """
+        Insert tracks, in the given order, after track `after`; with no
+        `after`, at the end (or the front if at_end is False). The tracks
+        must exist and not be in the playlist yet.
+        """
+        if not track_ids:
+            return []
+        if after is None and at_end:
+            last = db.session.scalar(select(func.max(playlist_tracks.c.position)).where(self._entries()))
+            start = last if last is not None else 0
+            positions = [start + (i + 1) * self.POSITION_GAP for i in range(len(track_ids))]
+        else:
+            positions = self._slots(after, len(track_ids))
+        entries = [{'playlist_id': self.id, 'track_id': track_id, 'position': position}
+                   for track_id, position in zip(track_ids, positions)]
+        db.session.execute(insert(playlist_tracks), entries)
+        self._changed()
+        return entries
+
+    def remove_tracks(self, track_ids):
+        """Remove tracks from the playlist; returns how many were in it"""
+        if not track_ids:
+            return 0
+        removed = db.session.execute(
+            delete(playlist_tracks)
+            .where(self._entries(), playlist_tracks.c.track_id.in_(track_ids))
+        ).rowcount
+        self._changed()
+        return removed
+
+    def move_track(self, track_id, after=None):
+        """Move a track to just after track `after` (to the front if None)"""
+        position = self._slots(after, 1)[0]
+        db.session.execute(
+            update(playlist_tracks)
+            .where(self._entries(), playlist_tracks.c.track_id == track_id)
+            .values(position=position)
+        )
+        self._changed()
+        return position
+
+    def _changed(self):
+        # The writes above bypass the collection; drop any loaded copy
+        if 'tracks' in self.__dict__:
+            db.session.expire(self, ['tracks'])
+        self.touch()
+
+    def to_dict(self, tracks=None):
+        if tracks is None:
+            tracks = self.tracks
         return {
             'id': self.id,
             'name': self.name,
             'user_id': self.user_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'tracks': [track.to_dict() for track in self.tracks]
+            'tracks': [track.to_dict() for track in tracks]
         }
+
+
+# A user's playlists
+db.Index('ix_playlists_user_id', Playlist.user_id)
@@ -0,0 +1,58 @@
+from datetime import datetime
+from .db import db, environment, SCHEMA
+from sqlalchemy.sql import func
+
+class StorageDeletion(db.Model):
+    """
+    A stored file waiting to be deleted. Rows are written in the same
+    transaction that stops referencing the file, then drained in batches
+    off the request path; the row keeps the outcome.
+    """
+    __tablename__ = 'storage_deletions'
+
+    if environment == "production":
+        __table_args__ = {'schema': SCHEMA}
+
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default=PENDING, server_default=PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.TIMESTAMP, server_default=func.now())
+    completed_at = db.Column(db.DateTime)
+
+    @classmethod
+    def enqueue(cls, url):
+        """Queue a file for deletion; the caller's commit makes it durable"""
+        deletion = cls(url=url, status=cls.PENDING, attempts=0, next_attempt_at=datetime.utcnow())
+        db.session.add(deletion)
+        return deletion
+
+    @classmethod
+    def due(cls, limit, now=None):
+        """Pending deletions whose next attempt is due, oldest first"""
+        return cls.query.filter(cls.status == cls.PENDING,
+                                cls.next_attempt_at <= (now or datetime.utcnow()))\
+                        .order_by(cls.next_attempt_at, cls.id)\
+                        .limit(limit)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'url': self.url,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+
+# The drainer's scan: due pending rows in attempt order
+db.Index('ix_storage_deletions_status_next_attempt', StorageDeletion.status, StorageDeletion.next_attempt_at)
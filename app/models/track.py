@@ -1,4 +1,7 @@
+import hashlib
+from datetime import datetime
 from .db import db, environment, SCHEMA, add_prefix_for_prod
+from sqlalchemy import event, select, update
 from sqlalchemy.sql import func
 from .associations import playlist_tracks
 
@@ -16,25 +19,110 @@ class Track(db.Model):
     genre = db.Column(db.String(255))
     artist_name = db.Column(db.String(255))
     created_at = db.Column(db.TIMESTAMP, server_default=func.now())
+    # Set on every UPDATE of the row, including like count changes; drives
+    # the ETag and Last-Modified of track payloads
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Denormalized count of rows in `likes`, maintained by the like routes
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Denormalized count of rows in `comments`, maintained by the comment routes
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Read from the file's container headers after upload; duration is
+    # overwritten with the measured value when one is found
+    bitrate = db.Column(db.Integer)
+    sample_rate = db.Column(db.Integer)
+    channels = db.Column(db.SmallInteger)
+    codec = db.Column(db.String(32))
+    metadata_extracted_at = db.Column(db.DateTime)
+    # Stored waveform peaks file, generated with the metadata
+    peaks_url = db.Column(db.Text)
+    # Stored low-bitrate preview rendition, when one was worth making
+    preview_url = db.Column(db.Text)
 
     # Add these relationship declarations
     user = db.relationship('User', back_populates='tracks')
     comments = db.relationship('Comment', back_populates='track')
     likes = db.relationship('Like', back_populates='track')
+    ranking = db.relationship('TrackRanking', back_populates='track', uselist=False,
+                              cascade='all, delete-orphan')
     playlists = db.relationship(
         'Playlist',
         secondary=playlist_tracks,
         back_populates='tracks'
     )
 
-    def to_dict(self):
-        from sqlalchemy import func
+    @classmethod
+    def refresh_like_counts(cls, track_ids=None):
+        """Recompute the stored like_count from the likes table"""
         from app.models import Like
-        
-        # Query the like count
-        like_count = db.session.query(func.count(Like.track_id))\
-                            .filter(Like.track_id == self.id).scalar()
-        
+
+        count = select(func.count(Like.user_id))\
+                    .where(Like.track_id == cls.id).scalar_subquery()
+        stmt = update(cls).values(like_count=count)
+        if track_ids is not None:
+            stmt = stmt.where(cls.id.in_(track_ids))
+        return db.session.execute(stmt.execution_options(synchronize_session=False)).rowcount
+
+    @classmethod
+    def adjust_like_count(cls, track_id, delta):
+        """Apply a like/unlike to the stored counters inside the current transaction"""
+        from app.models import TrackRanking
+
+        TrackRanking.adjust_like_count(track_id, delta)
+        return cls.query.filter(cls.id == track_id)\
+                        .update({cls.like_count: cls.like_count + delta},
+                                synchronize_session=False)
+
+    @classmethod
+    def refresh_comment_counts(cls, track_ids=None):
+        """Recompute the stored comment_count from the comments table"""
+        from app.models import Comment
+
+        count = select(func.count(Comment.id))\
+                    .where(Comment.track_id == cls.id).scalar_subquery()
+        stmt = update(cls).values(comment_count=count, updated_at=cls.updated_at)
+        if track_ids is not None:
+            stmt = stmt.where(cls.id.in_(track_ids))
+        return db.session.execute(stmt.execution_options(synchronize_session=False)).rowcount
+
+    @classmethod
+    def adjust_comment_count(cls, track_id, delta):
+        """Apply a new or deleted comment to the stored counter inside the current transaction"""
+        # comment_count isn't part of track payloads, so it leaves updated_at
+        # (and with it the track's validators) alone
+        return cls.query.filter(cls.id == track_id)\
+                        .update({cls.comment_count: cls.comment_count + delta,
+                                 cls.updated_at: cls.updated_at},
+                                synchronize_session=False)
+
+    @classmethod
+    def refresh_track_count(cls):
+        """Recompute the stored catalog size (Counter 'tracks')"""
+        from app.models import Counter
+
+        count = db.session.query(func.count(cls.id)).scalar()
+        Counter.put('tracks', count)
+        return count
+
+    def stored_files(self):
+        """Every stored file belonging to the track: audio, peaks and preview"""
+        return [url for url in (self.audio_url, self.peaks_url, self.preview_url) if url]
+
+    @property
+    def peaks_version(self):
+        """Changes whenever the peaks file does, for cache-busting URLs"""
+        if not self.peaks_url:
+            return None
+        return hashlib.sha1(self.peaks_url.encode('utf-8')).hexdigest()[:12]
+
+    @property
+    def waveform_url(self):
+        return f"/api/tracks/{self.id}/peaks?v={self.peaks_version}" if self.peaks_url else None
+
+    @property
+    def preview_stream_url(self):
+        return f"/api/tracks/{self.id}/stream?rendition=preview" if self.preview_url else None
+
+    def to_dict(self):
         return {
             'id': self.id,
             'title': self.title,
@@ -44,5 +132,33 @@ class Track(db.Model):
             'genre': self.genre,
             'artist_name': self.artist_name,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'like_count': like_count
-        }
\ No newline at end of file
+            'like_count': self.like_count or 0,
+            'bitrate': self.bitrate,
+            'sample_rate': self.sample_rate,
+            'channels': self.channels,
+            'codec': self.codec,
+            'waveform_url': self.waveform_url,
+            'preview_url': self.preview_stream_url
+        }
+
+
+# The catalog size behind the ultimate playlist's validators, counted as
+# rows are flushed so no listing has to COUNT(*) the table
+@event.listens_for(Track, 'after_insert')
+def _count_inserted_track(mapper, connection, target):
+    from app.models import Counter
+    Counter.adjust(connection, 'tracks', 1)
+
+@event.listens_for(Track, 'after_delete')
+def _count_deleted_track(mapper, connection, target):
+    from app.models import Counter
+    Counter.adjust(connection, 'tracks', -1)
+
+
+# Covers the ultimate playlist's newest-first order so keyset pages are
+# index seeks; the by-likes order is served from track_rankings
+db.Index('ix_tracks_created_at_id', Track.created_at, Track.id)
+# A user's tracks, newest first
+db.Index('ix_tracks_user_id_created_at', Track.user_id, Track.created_at)
+# The newest change to any track, for the listing validators
+db.Index('ix_tracks_updated_at', Track.updated_at)
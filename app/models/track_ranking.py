@@ -0,0 +1,58 @@
+from .db import db, environment, SCHEMA, add_prefix_for_prod
+from sqlalchemy import insert, select
+from sqlalchemy.sql import func
+
+class TrackRanking(db.Model):
+    """
+    Precomputed like ranking for the ultimate playlist, one row per track.
+    Kept current by the like routes and track create/update/delete so that
+    sorting by likes (optionally within a genre) is an index range scan.
+    """
+    __tablename__ = 'track_rankings'
+
+    if environment == "production":
+        __table_args__ = {'schema': SCHEMA}
+
+    track_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('tracks.id')), primary_key=True)
+    # Lowercased, trimmed genre so each genre is one contiguous index slice
+    genre_key = db.Column(db.String(255), nullable=False, default='', server_default='')
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    track = db.relationship('Track', back_populates='ranking')
+
+    @staticmethod
+    def normalize_genre(genre):
+        return (genre or '').strip().lower()
+
+    @classmethod
+    def sync_track(cls, track):
+        """Create or refresh the ranking row of a new or edited track"""
+        if track.ranking is None:
+            track.ranking = cls(like_count=track.like_count or 0)
+        track.ranking.genre_key = cls.normalize_genre(track.genre)
+        return track.ranking
+
+    @classmethod
+    def adjust_like_count(cls, track_id, delta):
+        return cls.query.filter(cls.track_id == track_id)\
+                        .update({cls.like_count: cls.like_count + delta},
+                                synchronize_session=False)
+
+    @classmethod
+    def rebuild(cls):
+        """Regenerate every ranking row from the tracks table"""
+        from app.models import Track
+
+        db.session.query(cls).delete(synchronize_session=False)
+        db.session.execute(insert(cls).from_select(
+            ['track_id', 'genre_key', 'like_count'],
+            select(Track.id,
+                   func.lower(func.trim(func.coalesce(Track.genre, ''))),
+                   Track.like_count)
+        ))
+
+
+# Pre-sorted slices: the whole catalog, and each genre on its own
+db.Index('ix_track_rankings_like_count', TrackRanking.like_count, TrackRanking.track_id)
+db.Index('ix_track_rankings_genre_like_count', TrackRanking.genre_key,
+         TrackRanking.like_count, TrackRanking.track_id)
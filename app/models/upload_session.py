@@ -0,0 +1,49 @@
+from .db import db, environment, SCHEMA, add_prefix_for_prod
+from sqlalchemy.sql import func
+
+class UploadSession(db.Model):
+    """
+    A resumable track upload in progress. The bytes received so far are
+    staged on disk; the row records how many, so an upload survives worker
+    restarts and can be resumed from upload_offset.
+    """
+    __tablename__ = 'upload_sessions'
+
+    if environment == "production":
+        __table_args__ = {'schema': SCHEMA}
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('users.id')), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(255))
+    upload_length = db.Column(db.BigInteger, nullable=False)
+    upload_offset = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+    # Track fields (title, genre, duration, artist_name) applied on finalize
+    fields = db.Column(db.JSON, nullable=False, default=dict)
+    created_at = db.Column(db.TIMESTAMP, server_default=func.now())
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    # 'open', or the step that holds the session: 'writing' a chunk or
+    # 'finalizing'. A request claims the session (with a conditional
+    # UPDATE) before touching the staged file, and only the holder of
+    # claim_token may release it.
+    state = db.Column(db.String(16), nullable=False, default='open', server_default='open')
+    claim_token = db.Column(db.String(32))
+    claimed_at = db.Column(db.DateTime)
+
+    user = db.relationship('User')
+
+    @property
+    def is_complete(self):
+        return self.upload_offset >= self.upload_length
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'upload_length': self.upload_length,
+            'upload_offset': self.upload_offset,
+            'state': self.state,
+            'fields': self.fields,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
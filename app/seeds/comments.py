@@ -1,4 +1,4 @@
-from app.models import db, Comment, environment, SCHEMA
+from app.models import db, Comment, Track, environment, SCHEMA
 from sqlalchemy.sql import text
 
 def seed_comments():
@@ -36,6 +36,9 @@ def seed_comments():
     )
 
     db.session.add_all([comment1, comment2, comment3, comment4, comment5, comment6])
+    db.session.flush()
+    # Seeds insert comments directly, so sync the stored counters
+    Track.refresh_comment_counts()
     db.session.commit()
 
 def undo_comments():
@@ -1,4 +1,4 @@
-from app.models import db, Like, environment, SCHEMA
+from app.models import db, Like, Track, TrackRanking, environment, SCHEMA
 from sqlalchemy.sql import text
 
 def seed_likes():
@@ -11,6 +11,10 @@ def seed_likes():
     like6 = Like(user_id=3, track_id=2)
     
     db.session.add_all([like1, like2, like3, like4, like5, like6])
+    db.session.flush()
+    # Seeds insert likes directly, so sync the stored counters and ranking
+    Track.refresh_like_counts()
+    TrackRanking.rebuild()
     db.session.commit()
 
 def undo_likes():
@@ -14,22 +14,13 @@ def seed_playlists():
     marnie_tracks = [2, 5, 8]
     bobbie_tracks = [3, 6, 9]
 
-    for tid in demo_tracks:
-        track = Track.query.get(tid)
-        if track:
-            playlist1.tracks.append(track)
-
-    for tid in marnie_tracks:
-        track = Track.query.get(tid)
-        if track:
-            playlist2.tracks.append(track)
-
-    for tid in bobbie_tracks:
-        track = Track.query.get(tid)
-        if track:
-            playlist3.tracks.append(track)
-
     db.session.add_all([playlist1, playlist2, playlist3])
+    db.session.flush()
+
+    # Entries carry a position, so they go through add_tracks
+    for playlist, track_ids in ((playlist1, demo_tracks), (playlist2, marnie_tracks), (playlist3, bobbie_tracks)):
+        existing = [track_id for track_id, in db.session.query(Track.id).filter(Track.id.in_(track_ids))]
+        playlist.add_tracks([track_id for track_id in track_ids if track_id in existing])
     db.session.commit()
 
 def undo_playlists():
@@ -1,4 +1,5 @@
 from app.models import db, Track, environment, SCHEMA
+from app.utils.search import rebuild_index
 from sqlalchemy.sql import text
 
 def seed_tracks():
@@ -71,6 +72,9 @@ def seed_tracks():
     ]
 
     db.session.add_all(tracks)
+    db.session.flush()
+    # Seeds bypass the track routes, so index the new rows here
+    rebuild_index()
     db.session.commit()
 
 def undo_tracks():
@@ -78,5 +82,10 @@ def undo_tracks():
         db.session.execute(f"TRUNCATE table {SCHEMA}.tracks RESTART IDENTITY CASCADE;")
     else:
         from sqlalchemy.sql import text
+        db.session.execute(text("DELETE FROM track_rankings"))
         db.session.execute(text("DELETE FROM tracks"))
+        # Empties the search index where the dialect keeps one (SQLite)
+        rebuild_index()
+    # The rows went without the ORM's delete events
+    Track.refresh_track_count()
     db.session.commit()
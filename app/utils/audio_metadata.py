@@ -0,0 +1,391 @@
+# app/utils/audio_metadata.py
+
+import struct
+from app.utils.uploads import sniff_audio_format
+
+
+# Container header parsers for the formats we accept. Each reads only the
+# few headers it needs (through seek/read, so remote objects are fetched
+# as small ranges) and returns a dict with duration (seconds), bitrate
+# (bits/s), sample_rate, channels and codec; missing values are None.
+# Every function here is plain Python with no app state, so it can run in
+# worker processes.
+
+PROBE_SIZE = 64 * 1024
+# How far from the end to look for the last Ogg page
+OGG_TAIL_SIZE = 64 * 1024
+# ADTS has no length header; frames counted before extrapolating
+ADTS_MAX_FRAMES = 20000
+
+MPEG_BITRATES = {
+    # (version_is_mpeg1, layer): kbps by index 1-14
+    (True, 1): (32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MPEG_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+WAV_CODECS = {1: 'pcm', 2: 'adpcm', 3: 'pcm_float', 6: 'alaw', 7: 'mulaw', 0x11: 'ima_adpcm', 0x55: 'mp3'}
+
+
+def _result(duration=None, bitrate=None, sample_rate=None, channels=None, codec=None):
+    return {
+        'duration': duration,
+        'bitrate': int(bitrate) if bitrate else None,
+        'sample_rate': sample_rate or None,
+        'channels': channels or None,
+        'codec': codec
+    }
+
+def _size(f):
+    f.seek(0, 2)
+    return f.tell()
+
+def _read_at(f, offset, length):
+    f.seek(offset)
+    return f.read(length)
+
+def _average_bitrate(byte_count, duration):
+    return byte_count * 8 / duration if duration else None
+
+
+def iff_chunks(f, size, big_endian=False):
+    """Yield (chunk_id, payload_offset, payload_size) for RIFF/AIFF chunks"""
+    header = struct.Struct('>4sI' if big_endian else '<4sI')
+    pos = 12
+    while pos + 8 <= size:
+        chunk_id, chunk_size = header.unpack(_read_at(f, pos, 8))
+        yield chunk_id, pos + 8, chunk_size
+        pos += 8 + chunk_size + (chunk_size & 1)
+
+def wav_format(f, size):
+    """(format_tag, channels, sample_rate, byte_rate, block_align, bits, data_offset, data_size)"""
+    fmt = None
+    for chunk_id, offset, chunk_size in iff_chunks(f, size):
+        if chunk_id == b'fmt ':
+            fmt = struct.unpack('<HHIIHH', _read_at(f, offset, 16))
+            if fmt[0] == 0xFFFE and chunk_size >= 40:
+                # WAVE_FORMAT_EXTENSIBLE: the real format leads the subformat GUID
+                fmt = (struct.unpack('<H', _read_at(f, offset + 24, 2))[0],) + fmt[1:]
+        elif chunk_id == b'data' and fmt:
+            # Streamed writers leave the size unset
+            return fmt + (offset, min(chunk_size, size - offset))
+    return None
+
+def parse_wav(f, size):
+    fmt = wav_format(f, size)
+    if fmt is None:
+        return None
+    format_tag, channels, sample_rate, byte_rate = fmt[:4]
+    data_size = fmt[7]
+    duration = data_size / byte_rate if byte_rate else None
+    return _result(duration, byte_rate * 8, sample_rate, channels, WAV_CODECS.get(format_tag, f'wav_{format_tag:#x}'))
+
+def _extended_float(data):
+    # 80-bit IEEE 754 extended precision, as used for AIFF sample rates
+    exponent, mantissa = struct.unpack('>HQ', data)
+    if exponent == 0 and mantissa == 0:
+        return 0
+    sign = -1 if exponent & 0x8000 else 1
+    return sign * mantissa * 2.0 ** ((exponent & 0x7FFF) - 16383 - 63)
+
+def aiff_format(f, size):
+    """(channels, frames, bits, sample_rate, compression, data_offset, data_size)"""
+    comm = None
+    for chunk_id, offset, chunk_size in iff_chunks(f, size, big_endian=True):
+        if chunk_id == b'COMM':
+            data = _read_at(f, offset, min(chunk_size, 22))
+            channels, frames, bits = struct.unpack('>HIH', data[:8])
+            compression = b'NONE'
+            if len(data) >= 22 and _read_at(f, 8, 4) == b'AIFC':
+                compression = data[18:22]
+            comm = (channels, frames, bits, int(_extended_float(data[8:18])), compression)
+        elif chunk_id == b'SSND' and comm:
+            # The sound data is preceded by offset and block size fields
+            data_offset = struct.unpack('>I', _read_at(f, offset, 4))[0]
+            return comm + (offset + 8 + data_offset, min(chunk_size - 8 - data_offset, size - offset - 8))
+    return comm and comm + (None, 0)
+
+def parse_aiff(f, size):
+    fmt = aiff_format(f, size)
+    if fmt is None:
+        return None
+    channels, frames, _, sample_rate, compression = fmt[:5]
+    codec = 'pcm' if compression in (b'NONE', b'sowt', b'twos') else compression.decode('latin-1').strip().lower()
+    duration = frames / sample_rate if sample_rate else None
+    return _result(duration, _average_bitrate(size, duration), sample_rate, channels, codec)
+
+def parse_flac_streaminfo(info):
+    """(duration, sample_rate, channels) from a raw STREAMINFO block"""
+    if len(info) < 18:
+        return None
+    # 20 bits rate, 3 bits channels-1, 5 bits bps-1, 36 bits samples
+    packed = int.from_bytes(info[10:18], 'big')
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    duration = total_samples / sample_rate if sample_rate and total_samples else None
+    return duration, sample_rate, channels
+
+def parse_flac(f, size):
+    pos = 4
+    while pos + 4 <= size:
+        header = _read_at(f, pos, 4)
+        is_last, block_type = header[0] & 0x80, header[0] & 0x7F
+        length = int.from_bytes(header[1:4], 'big')
+        if block_type == 0:
+            info = parse_flac_streaminfo(_read_at(f, pos + 4, 18))
+            if info is None:
+                return None
+            duration, sample_rate, channels = info
+            return _result(duration, _average_bitrate(size, duration), sample_rate, channels, 'flac')
+        if is_last:
+            break
+        pos += 4 + length
+    return None
+
+def _id3_size(head):
+    if head[:3] != b'ID3' or len(head) < 10:
+        return 0
+    size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+    footer = 10 if head[5] & 0x10 else 0
+    return 10 + size + footer
+
+def _mpeg_header(data, i):
+    """Decode the MPEG audio frame header at data[i:i + 4], or None"""
+    b1, b2, b3 = data[i + 1], data[i + 2], data[i + 3]
+    if data[i] != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+    version_bits, layer_bits = (b1 >> 3) & 0x3, (b1 >> 1) & 0x3
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 0x3
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version_bits == 3
+    layer = 4 - layer_bits
+    bitrate = MPEG_BITRATES[(mpeg1, layer)][bitrate_index - 1] * 1000
+    sample_rate = MPEG_SAMPLE_RATES[version_bits][rate_index]
+    padding = (b2 >> 1) & 0x1
+    channels = 1 if b3 >> 6 == 3 else 2
+    if layer == 1:
+        samples, frame_length = 384, (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if mpeg1 or layer == 2 else 576
+        frame_length = samples // 8 * bitrate // sample_rate + padding
+    return {'mpeg1': mpeg1, 'layer': layer, 'bitrate': bitrate, 'sample_rate': sample_rate,
+            'channels': channels, 'samples': samples, 'frame_length': frame_length}
+
+def parse_mp3(f, size):
+    head = _read_at(f, 0, 10)
+    start = _id3_size(head)
+    data = _read_at(f, start, PROBE_SIZE)
+    frame = None
+    for i in range(len(data) - 4):
+        frame = _mpeg_header(data, i)
+        # Require the next frame to line up too, so stray 0xFF bytes in
+        # the payload aren't taken for a header
+        if frame and (i + frame['frame_length'] + 4 > len(data) or
+                      _mpeg_header(data, i + frame['frame_length'])):
+            break
+        frame = None
+    if frame is None:
+        return None
+
+    codec = {1: 'mp1', 2: 'mp2', 3: 'mp3'}[frame['layer']]
+    audio_start = start + i
+    audio_bytes = size - audio_start
+    if size >= 128 and _read_at(f, size - 128, 3) == b'TAG':
+        audio_bytes -= 128
+
+    # A Xing/Info or VBRI header in the first frame gives the exact length
+    side_info = (32 if frame['channels'] == 2 else 17) if frame['mpeg1'] else (17 if frame['channels'] == 2 else 9)
+    xing = data[i + 4 + side_info:i + 4 + side_info + 16]
+    frames = None
+    if xing[:4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', xing[4:8])[0]
+        if flags & 0x1:
+            frames = struct.unpack('>I', xing[8:12])[0]
+        if flags & 0x2:
+            audio_bytes = struct.unpack('>I', xing[12:16] if flags & 0x1 else xing[8:12])[0]
+    elif data[i + 36:i + 40] == b'VBRI':
+        audio_bytes, frames = struct.unpack('>II', data[i + 46:i + 54])
+
+    if frames:
+        duration = frames * frame['samples'] / frame['sample_rate']
+        bitrate = _average_bitrate(audio_bytes, duration)
+    else:
+        # Constant bitrate: the first frame's rate holds for the file
+        bitrate = frame['bitrate']
+        duration = audio_bytes * 8 / bitrate
+    return _result(duration, bitrate, frame['sample_rate'], frame['channels'], codec)
+
+def parse_adts(f, size):
+    data = _read_at(f, 0, 7)
+    if len(data) < 7 or data[0] != 0xFF or data[1] & 0xF6 != 0xF0:
+        return None
+    rates = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+    rate_index = (data[2] >> 2) & 0xF
+    sample_rate = rates[rate_index] if rate_index < len(rates) else None
+    channels = ((data[2] & 0x1) << 2) | (data[3] >> 6)
+    # Walk frame headers to count frames (1024 samples each); past the cap,
+    # extrapolate from the average frame size so far
+    frames, pos = 0, 0
+    while pos + 7 <= size and frames < ADTS_MAX_FRAMES:
+        header = _read_at(f, pos, 7)
+        if len(header) < 7 or header[0] != 0xFF or header[1] & 0xF6 != 0xF0:
+            break
+        frame_length = ((header[3] & 0x3) << 11) | (header[4] << 3) | (header[5] >> 5)
+        if frame_length < 7:
+            break
+        frames += 1
+        pos += frame_length
+    if frames == ADTS_MAX_FRAMES and pos < size:
+        frames = frames * size / pos
+        pos = size
+    duration = frames * 1024 / sample_rate if sample_rate and frames else None
+    return _result(duration, _average_bitrate(pos, duration), sample_rate, channels, 'aac')
+
+def _ogg_page(data, i):
+    """(granule, serial, header_length, body_length) for the page at data[i]"""
+    granule, serial = struct.unpack('<qI', data[i + 6:i + 18])
+    segments = data[i + 26]
+    lacing = data[i + 27:i + 27 + segments]
+    return granule, serial, 27 + segments, sum(lacing)
+
+def parse_ogg(f, size):
+    head = _read_at(f, 0, PROBE_SIZE)
+    _, serial, header_length, _ = _ogg_page(head, 0)
+    packet = head[header_length:header_length + 64]
+    if packet[:7] == b'\x01vorbis':
+        channels, sample_rate = struct.unpack('<BI', packet[11:16])
+        granule_rate, pre_skip, codec = sample_rate, 0, 'vorbis'
+    elif packet[:8] == b'OpusHead':
+        channels, pre_skip, sample_rate = struct.unpack('<BHI', packet[9:16])
+        # Opus granule positions always count 48kHz samples
+        granule_rate, codec = 48000, 'opus'
+    elif packet[:5] == b'\x7fFLAC':
+        # Mapping header, native 'fLaC' marker, then the STREAMINFO block
+        info = parse_flac_streaminfo(packet[17:35])
+        return info and _result(info[0], _average_bitrate(size, info[0]), info[1], info[2], 'flac')
+    else:
+        return None
+
+    # The last page's granule position is the stream's length in samples
+    tail_start = max(0, size - OGG_TAIL_SIZE)
+    tail = _read_at(f, tail_start, OGG_TAIL_SIZE)
+    granule = None
+    i = tail.rfind(b'OggS')
+    while i >= 0:
+        if i + 27 <= len(tail):
+            page_granule, page_serial, _, _ = _ogg_page(tail, i)
+            if page_serial == serial and page_granule > 0:
+                granule = page_granule
+                break
+        i = tail.rfind(b'OggS', 0, i)
+    duration = (granule - pre_skip) / granule_rate if granule and granule_rate else None
+    return _result(duration, _average_bitrate(size, duration), sample_rate, channels, codec)
+
+def _mp4_boxes(f, start, end):
+    """Yield (type, payload_offset, payload_end) for the boxes in a range"""
+    pos = start
+    while pos + 8 <= end:
+        header = _read_at(f, pos, 16)
+        if len(header) < 8:
+            return
+        box_size, box_type = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if box_size == 1:
+            box_size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif box_size == 0:
+            box_size = end - pos
+        if box_size < header_size:
+            return
+        yield box_type, pos + header_size, min(pos + box_size, end)
+        pos += box_size
+
+def _mp4_find(f, start, end, path):
+    for box_type, payload, box_end in _mp4_boxes(f, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return payload, box_end
+            found = _mp4_find(f, payload, box_end, path[1:])
+            if found:
+                return found
+    return None
+
+def _mp4_timing(f, payload):
+    """(timescale, duration) from an mvhd or mdhd payload"""
+    version = _read_at(f, payload, 1)[0]
+    if version == 1:
+        timescale, duration = struct.unpack('>IQ', _read_at(f, payload + 20, 12))
+    else:
+        timescale, duration = struct.unpack('>II', _read_at(f, payload + 12, 8))
+    return timescale, duration
+
+def parse_mp4(f, size):
+    moov = _mp4_find(f, 0, size, [b'moov'])
+    if not moov:
+        return None
+    duration = None
+    mvhd = _mp4_find(f, moov[0], moov[1], [b'mvhd'])
+    if mvhd:
+        timescale, length = _mp4_timing(f, mvhd[0])
+        duration = length / timescale if timescale else None
+
+    for box_type, payload, box_end in _mp4_boxes(f, moov[0], moov[1]):
+        if box_type != b'trak':
+            continue
+        mdia = _mp4_find(f, payload, box_end, [b'mdia'])
+        hdlr = mdia and _mp4_find(f, mdia[0], mdia[1], [b'hdlr'])
+        if not hdlr or _read_at(f, hdlr[0] + 8, 4) != b'soun':
+            continue
+        mdhd = _mp4_find(f, mdia[0], mdia[1], [b'mdhd'])
+        if mdhd:
+            timescale, length = _mp4_timing(f, mdhd[0])
+            if timescale:
+                duration = length / timescale
+        stsd = _mp4_find(f, mdia[0], mdia[1], [b'minf', b'stbl', b'stsd'])
+        channels = sample_rate = codec = None
+        if stsd:
+            # Full box header + entry count, then the first sample entry
+            entry = _read_at(f, stsd[0] + 8, 36)
+            if len(entry) == 36:
+                fourcc = entry[4:8]
+                channels = struct.unpack('>H', entry[24:26])[0]
+                sample_rate = struct.unpack('>I', entry[32:36])[0] >> 16
+                codec = {b'mp4a': 'aac', b'alac': 'alac', b'fLaC': 'flac', b'Opus': 'opus',
+                         b'ac-3': 'ac3', b'ec-3': 'eac3'}.get(fourcc, fourcc.decode('latin-1').strip().lower())
+        return _result(duration, _average_bitrate(size, duration), sample_rate, channels, codec)
+    return _result(duration, _average_bitrate(size, duration))
+
+PARSERS = {
+    'wav': parse_wav,
+    'aiff': parse_aiff,
+    'flac': parse_flac,
+    'mp3': parse_mp3,
+    'aac': lambda f, size: parse_adts(f, size) if _read_at(f, 0, 4) != b'ADIF' else None,
+    'ogg': parse_ogg,
+    'mp4': parse_mp4
+}
+
+
+def read_metadata(f):
+    """
+    Parse a seekable binary file's container headers. Returns the metadata
+    dict, or None for unsupported or unreadable files.
+    """
+    size = _size(f)
+    container = sniff_audio_format(_read_at(f, 0, 16))
+    parser = PARSERS.get(container)
+    if parser is None:
+        return None
+    try:
+        metadata = parser(f, size)
+    except (struct.error, IndexError, ValueError, ZeroDivisionError, KeyError):
+        return None
+    if metadata and metadata['duration'] is not None and metadata['duration'] <= 0:
+        metadata['duration'] = None
+    return metadata
@@ -0,0 +1,174 @@
+# app/utils/deletion_queue.py
+
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models import db, StorageDeletion
+from app.utils.storage import get_storage, S3_DELETE_BATCH
+
+
+# Deleting a stored file is queued in the database alongside the change
+# that orphans it, and happens later in batches (one DeleteObjects call per
+# 1000 files on S3). Requests never wait on storage round-trips, a failed
+# delete is retried with exponential backoff instead of leaking, and a
+# rolled-back request deletes nothing.
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+
+
+def queue_deletion(url):
+    """Delete a stored file once the current transaction commits"""
+    if not get_storage().owns(url):
+        # e.g. a seeded or external URL; there is nothing of ours to delete
+        current_app.logger.info(f"Not queueing deletion of foreign URL {url}")
+        return None
+    deletion = StorageDeletion.enqueue(url)
+    db.session.info['storage_deletions_queued'] = True
+    return deletion
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, so failed batches spread out"""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+def drain_deletions(batch_size=S3_DELETE_BATCH, max_batches=None):
+    """
+    Delete due files in batches, recording each outcome. Rows are claimed
+    with SKIP LOCKED where supported, so several drainers can run at once.
+    Returns (deleted, failed) counts.
+    """
+    storage = get_storage()
+    deleted = failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        now = datetime.utcnow()
+        batch = StorageDeletion.due(batch_size, now).with_for_update(skip_locked=True).all()
+        if not batch:
+            db.session.rollback()
+            break
+
+        errors = storage.delete_many([deletion.url for deletion in batch])
+        for deletion in batch:
+            deletion.attempts += 1
+            error = errors.get(deletion.url)
+            if error is None:
+                deletion.status = StorageDeletion.DONE
+                deletion.completed_at = now
+                deletion.last_error = None
+                deleted += 1
+                continue
+            deletion.last_error = error
+            failed += 1
+            if deletion.attempts >= MAX_ATTEMPTS:
+                deletion.status = StorageDeletion.FAILED
+                deletion.completed_at = now
+                current_app.logger.error(f"Giving up deleting {deletion.url}: {error}")
+            else:
+                deletion.next_attempt_at = now + retry_delay(deletion.attempts)
+        db.session.commit()
+
+        batches += 1
+        if len(batch) < batch_size:
+            break
+    return deleted, failed
+
+def retry_failed_deletions():
+    """Put deletions that exhausted their attempts back in the queue"""
+    count = StorageDeletion.query.filter_by(status=StorageDeletion.FAILED)\
+                                 .update({StorageDeletion.status: StorageDeletion.PENDING,
+                                          StorageDeletion.attempts: 0,
+                                          StorageDeletion.completed_at: None,
+                                          StorageDeletion.next_attempt_at: datetime.utcnow()},
+                                         synchronize_session=False)
+    db.session.commit()
+    return count
+
+def prune_deletions(days):
+    """Forget successful deletions older than the given number of days"""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    count = StorageDeletion.query.filter(StorageDeletion.status == StorageDeletion.DONE,
+                                         StorageDeletion.completed_at < cutoff)\
+                                 .delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+class DeletionWorker:
+    """
+    Drains the queue on a daemon thread in each app process. The thread
+    starts with the process's first request and drains straight away, so
+    deletions left pending or backed off by a previous process are picked
+    up after a restart. Then it wakes right after a commit that queued
+    deletions and otherwise every interval seconds, which is also when
+    backed-off retries come due.
+    """
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def wake(self):
+        self.ensure_running()
+        self._wakeup.set()
+
+    def ensure_running(self):
+        # Started lazily, and again in a forked worker, whose copy of the
+        # parent's thread object is not actually running
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='storage-deletions', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    drain_deletions()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Storage deletion drain failed")
+                finally:
+                    db.session.remove()
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+
+def _wake_after_commit(session):
+    if session.info.pop('storage_deletions_queued', False) and has_app_context():
+        worker = current_app.extensions.get('deletion_worker')
+        if worker is not None:
+            worker.wake()
+
+def _forget_after_rollback(session):
+    session.info.pop('storage_deletions_queued', None)
+
+def init_deletion_worker(app):
+    """
+    Drain queued deletions in-process after the commits that queue them.
+    Set STORAGE_DELETION_WORKER=off when a dedicated
+    `flask maintenance drain-deletions --watch` process does it instead.
+    """
+    if not event.contains(Session, 'after_commit', _wake_after_commit):
+        event.listen(Session, 'after_commit', _wake_after_commit)
+        event.listen(Session, 'after_rollback', _forget_after_rollback)
+    if app.config.get('STORAGE_DELETION_WORKER', 'thread') == 'thread':
+        worker = app.extensions['deletion_worker'] = DeletionWorker(
+            app, app.config.get('STORAGE_DELETION_INTERVAL', 60)
+        )
+        # Not at import time: CLI commands (flask db upgrade, ...) shouldn't
+        # drain, and a preloading gunicorn master's thread wouldn't survive
+        # the fork
+        app.before_request(worker.ensure_running)
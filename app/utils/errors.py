@@ -1,6 +1,8 @@
 # app/utils/errors.py
 
-from flask import jsonify, current_app
+import hashlib
+from datetime import timezone
+from flask import jsonify, current_app, request, g, stream_with_context
 
 # Standard API response formats
 def api_error(message, status_code=400, errors=None):
@@ -38,7 +40,71 @@ def api_success(data=None, message=None, status_code=200):
     if message is not None:
         response['message'] = message
         
-    return jsonify(response), status_code
+    response = jsonify(response)
+    validators = g.get('validators')
+    if validators is not None and status_code == 200:
+        apply_validators(response, *validators)
+    return response, status_code
+
+def api_success_stream(name, items, extra=None, message=None):
+    """
+    The same body as api_success(data={name: items, **extra}), sent as a
+    chunked response: the array is encoded as items is consumed, so with a
+    generator over the rows peak memory doesn't grow with their number
+    """
+    provider = current_app.json
+    data = dict(extra or {})
+
+    def generate():
+        # Keys in sorted order, as the JSON provider writes them
+        yield '{"data":{'
+        for i, key in enumerate(sorted([*data, name])):
+            yield (',' if i else '') + provider.dumps(key) + ':'
+            if key == name:
+                yield from provider.iter_array(items)
+            else:
+                yield provider.dumps(data[key], separators=(',', ':'))
+        yield '}'
+        if message is not None:
+            yield ',"message":' + provider.dumps(message)
+        yield ',"success":true}\n'
+
+    response = current_app.response_class(stream_with_context(generate()), mimetype=provider.mimetype)
+    validators = g.get('validators')
+    if validators is not None:
+        apply_validators(response, *validators)
+    return response, 200
+
+# Conditional GETs
+def compute_etag(*parts):
+    """An ETag from cheap version inputs (ids, timestamps, counts), not the body"""
+    raw = ':'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+def apply_validators(response, etag=None, last_modified=None, private=False):
+    if etag:
+        response.set_etag(etag)
+    if last_modified:
+        # Stored timestamps are naive UTC
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc) \
+            if last_modified.tzinfo is None else last_modified
+    # Cacheable, but always revalidated
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+
+def check_not_modified(etag=None, last_modified=None, private=False):
+    """
+    Compare the request's If-None-Match / If-Modified-Since with the given
+    validators. Returns a 304 response to send as is, or None; then the
+    validators are added to the api_success response that follows. Call it
+    before loading or serializing the payload.
+    """
+    g.validators = (etag, last_modified, private)
+    response = current_app.response_class()
+    apply_validators(response, etag, last_modified, private)
+    response.make_conditional(request)
+    return response if response.status_code == 304 else None
 
 # Custom exception classes
 class APIError(Exception):
@@ -64,6 +130,11 @@ class ResourceNotFoundError(APIError):
     def __init__(self, resource_type="Resource"):
         super().__init__(f"{resource_type} not found", status_code=404)
 
+class ConflictError(APIError):
+    """Raised when a request conflicts with the resource's current state"""
+    def __init__(self, message="Conflict", errors=None):
+        super().__init__(message, status_code=409, errors=errors)
+
 class FileUploadError(APIError):
     """Raised when file upload operations fail"""
     def __init__(self, message="File upload failed", errors=None):
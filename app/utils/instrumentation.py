@@ -0,0 +1,122 @@
+# app/utils/instrumentation.py
+
+import re
+import time
+from collections import Counter
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Per-request SQL accounting: statement count, time spent in the database
+# and how often each statement shape ran. A shape repeating
+# SQL_REPEAT_THRESHOLD times in one request is flagged as a likely N+1 (a
+# lazy load or a query per row). In debug mode the numbers go out as
+# response headers; requests over SQL_QUERY_BUDGET statements or
+# SQL_TIME_BUDGET_MS milliseconds, or with N+1 shapes, are logged with their
+# most repeated statements. This replaces echoing every statement.
+#
+# Streamed responses keep querying after the headers are sent, so logging
+# happens at teardown, once the body is done.
+
+# Bind parameters in the forms the dialects render them
+_PARAM = r"(?:\?|%s|%\(\w+\)s|:\w+|\$\d+|\[POSTCOMPILE_\w+\])"
+_PARAM_LIST = re.compile(rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})*\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_SPACE = re.compile(r"\s+")
+# Repeated shapes reported per request
+REPORTED_SHAPES = 3
+
+
+def statement_shape(statement):
+    """A statement with its literals and IN-lists folded, to group repeats"""
+    shape = _LITERAL.sub('?', statement)
+    shape = _PARAM_LIST.sub('(?)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+class QueryStats:
+    __slots__ = ('count', 'seconds', 'shapes')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # statement text -> executions; texts are folded into shapes only
+        # when reported, keeping the per-statement cost to a dict update
+        self.shapes = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement] += 1
+
+    def repeated(self, threshold):
+        """[(shape, executions)] run at least threshold times, most first"""
+        folded = Counter()
+        for statement, executions in self.shapes.items():
+            folded[statement_shape(statement)] += executions
+        return [(shape, n) for shape, n in folded.most_common() if n >= threshold]
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        started = conn.info.get('query_started')
+        if not started:
+            return
+        stats = g.get('query_stats')
+        if stats is None:
+            stats = g.query_stats = QueryStats()
+        stats.record(statement, time.perf_counter() - started.pop())
+
+def _execute_failed(context):
+    # after_cursor_execute doesn't fire for a failed statement
+    started = context.connection.info.get('query_started') if context.connection else None
+    if started and has_request_context():
+        started.pop()
+
+def current_query_stats():
+    """The current request's QueryStats (empty if it hasn't queried)"""
+    return g.get('query_stats') or QueryStats()
+
+def init_query_counter(app):
+    """
+    Track the SQL each request issues. In debug mode, report it in
+    X-Query-Count, X-Query-Time-Ms, X-Query-Repeats and Server-Timing
+    headers; log requests over budget or with repeated statements.
+    """
+    if not event.contains(Engine, 'before_cursor_execute', _before_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_execute)
+        event.listen(Engine, 'handle_error', _execute_failed)
+
+    @app.after_request
+    def add_query_headers(response):
+        if app.debug:
+            stats = current_query_stats()
+            milliseconds = stats.seconds * 1000
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['X-Query-Time-Ms'] = f"{milliseconds:.1f}"
+            response.headers['X-Query-Repeats'] = str(
+                len(stats.repeated(app.config.get('SQL_REPEAT_THRESHOLD', 10)))
+            )
+            response.headers.add('Server-Timing', f'db;dur={milliseconds:.1f};desc="{stats.count} queries"')
+        return response
+
+    @app.teardown_request
+    def log_query_budget(exc):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return
+        repeated = stats.repeated(app.config.get('SQL_REPEAT_THRESHOLD', 10))
+        over_budget = stats.count > app.config.get('SQL_QUERY_BUDGET', 25) or \
+            stats.seconds * 1000 > app.config.get('SQL_TIME_BUDGET_MS', 250)
+        if not (repeated or over_budget):
+            return
+        lines = [f"{request.method} {request.path} ({request.endpoint}): {stats.count} queries "
+                 f"in {stats.seconds * 1000:.1f}ms"]
+        lines += [f"  N+1? {n}x {shape}" for shape, n in repeated[:REPORTED_SHAPES]]
+        app.logger.warning('\n'.join(lines))
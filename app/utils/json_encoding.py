@@ -0,0 +1,167 @@
+# app/utils/json_encoding.py
+
+import json
+from json.encoder import encode_basestring_ascii
+from flask.json.provider import DefaultJSONProvider
+from app.models import Track, Playlist, Comment, Like
+
+
+# JSON for API responses. Models can be passed to api_success as they are:
+# the 'fast' provider encodes Track, Playlist, Comment and Like with
+# encoders compiled once from a field list, writing each row straight to
+# JSON text instead of building a to_dict() per row and walking it again.
+# Output matches to_dict() as the default provider would encode it (sorted
+# keys, ASCII, compact), so clients can't tell the providers apart.
+# JSON_PROVIDER=default keeps the stock encoder, calling to_dict() on models.
+
+# Items per chunk when streaming an array
+STREAM_CHUNK_ITEMS = 100
+
+MODEL_ENCODERS = {}
+
+# How each kind of field value is written; {v} is the value. Ints and
+# strings take the fast path only for exact types (e.g. an unsaved form
+# value may still be a str in an Integer column).
+VALUE_TEMPLATES = {
+    'int': "'null' if {v} is None else _int({v}) if {v}.__class__ is int else _value({v})",
+    'float': "'null' if {v} is None else _float({v}) if {v}.__class__ is float else _value({v})",
+    'str': "'null' if {v} is None else _str({v}) if {v}.__class__ is str else _value({v})",
+    'datetime': "'null' if {v} is None else '\"' + {v}.isoformat() + '\"'",
+    'list': "'null' if {v} is None else _list({v})",
+    'value': "_value({v})",
+}
+
+
+def compile_encoder(model, fields):
+    """
+    Build encode(obj) -> JSON text for a model. fields is a list of
+    (key, kind, source): kind is a VALUE_TEMPLATES key and source an
+    attribute name or a function of the object.
+    """
+    namespace = {'_int': int.__repr__, '_float': float.__repr__, '_str': encode_basestring_ascii,
+                 '_value': _encode_value, '_list': _encode_list}
+    lines = [f"def encode_{model.__name__.lower()}(obj):"]
+    parts = []
+    for i, (key, kind, source) in enumerate(sorted(fields, key=lambda field: field[0])):
+        if callable(source):
+            namespace[f'_get{i}'] = source
+            lines.append(f"    v{i} = _get{i}(obj)")
+        else:
+            lines.append(f"    v{i} = obj.{source}")
+        parts.append(repr(('{' if i == 0 else ',') + encode_basestring_ascii(key) + ':'))
+        parts.append(f"({VALUE_TEMPLATES[kind].format(v=f'v{i}')})")
+    parts.append("'}'")
+    lines.append(f"    return ''.join(({', '.join(parts)}))")
+    exec(compile('\n'.join(lines), f'<json encoder for {model.__name__}>', 'exec'), namespace)
+    return namespace[f"encode_{model.__name__.lower()}"]
+
+def register_encoder(model, fields):
+    MODEL_ENCODERS[model] = compile_encoder(model, fields)
+
+def _default(o):
+    if hasattr(o, 'to_dict'):
+        return o.to_dict()
+    return DefaultJSONProvider.default(o)
+
+# The stdlib encoder for everything without a compiled encoder; dates and
+# other extras are handled like Flask's default provider does
+_leaf_encoder = json.JSONEncoder(ensure_ascii=True, sort_keys=True, separators=(',', ':'),
+                                 default=_default)
+
+def _encode_list(items):
+    return '[' + ','.join(map(_encode_value, items)) + ']'
+
+def _encode_value(value):
+    encoder = MODEL_ENCODERS.get(value.__class__)
+    if encoder is not None:
+        return encoder(value)
+    if isinstance(value, dict) and all(key.__class__ is str for key in value):
+        return '{' + ','.join(encode_basestring_ascii(key) + ':' + _encode_value(item)
+                              for key, item in sorted(value.items())) + '}'
+    if isinstance(value, (list, tuple)):
+        return _encode_list(value)
+    return _leaf_encoder.encode(value)
+
+
+class ModelJSONProvider(DefaultJSONProvider):
+    """The stock provider, plus models (via to_dict) and streamed arrays"""
+
+    default = staticmethod(_default)
+
+    def encode_item(self, item):
+        return self.dumps(item, separators=(',', ':'))
+
+    def iter_array(self, items):
+        """Yield a JSON array in chunks as the items iterable is consumed"""
+        yield '['
+        chunk = []
+        first = True
+        for item in items:
+            chunk.append(self.encode_item(item))
+            if len(chunk) >= STREAM_CHUNK_ITEMS:
+                yield ('' if first else ',') + ','.join(chunk)
+                chunk, first = [], False
+        if chunk:
+            yield ('' if first else ',') + ','.join(chunk)
+        yield ']'
+
+
+class FastJSONProvider(ModelJSONProvider):
+    """Compiled model encoders; pretty-printed (debug) output falls back to stock"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.get('indent') is not None or kwargs.get('cls') is not None:
+            return super().dumps(obj, **kwargs)
+        return _encode_value(obj)
+
+    def encode_item(self, item):
+        return _encode_value(item)
+
+
+JSON_PROVIDERS = {'fast': FastJSONProvider, 'default': ModelJSONProvider}
+
+def init_json(app):
+    """Install the JSON provider named by JSON_PROVIDER"""
+    app.json = JSON_PROVIDERS[app.config.get('JSON_PROVIDER', 'fast')](app)
+
+
+# Keep these in step with the models' to_dict();
+# tests/test_json_encoding.py fails when they drift apart
+register_encoder(Track, [
+    ('id', 'int', 'id'),
+    ('title', 'str', 'title'),
+    ('audio_url', 'str', 'audio_url'),
+    ('user_id', 'int', 'user_id'),
+    ('duration', 'int', 'duration'),
+    ('genre', 'str', 'genre'),
+    ('artist_name', 'str', 'artist_name'),
+    ('created_at', 'datetime', 'created_at'),
+    ('like_count', 'int', lambda track: track.like_count or 0),
+    ('bitrate', 'int', 'bitrate'),
+    ('sample_rate', 'int', 'sample_rate'),
+    ('channels', 'int', 'channels'),
+    ('codec', 'str', 'codec'),
+    ('waveform_url', 'str', 'waveform_url'),
+    ('preview_url', 'str', 'preview_stream_url'),
+])
+register_encoder(Playlist, [
+    ('id', 'int', 'id'),
+    ('name', 'str', 'name'),
+    ('user_id', 'int', 'user_id'),
+    ('created_at', 'datetime', 'created_at'),
+    ('tracks', 'list', 'tracks'),
+])
+register_encoder(Comment, [
+    ('id', 'int', 'id'),
+    ('text', 'str', 'text'),
+    ('user_id', 'int', 'user_id'),
+    ('track_id', 'int', 'track_id'),
+    ('user_username', 'str', lambda comment: comment.user.username if comment.user else "Anonymous"),
+    ('created_at', 'datetime', 'created_at'),
+])
+register_encoder(Like, [
+    ('id', 'str', lambda like: f"{like.user_id}_{like.track_id}"),
+    ('user_id', 'int', 'user_id'),
+    ('track_id', 'int', 'track_id'),
+    ('created_at', 'datetime', 'created_at'),
+])
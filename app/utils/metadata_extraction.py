@@ -0,0 +1,228 @@
+# app/utils/metadata_extraction.py
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from flask import current_app
+from app.models import db, Track
+from app.utils.audio_metadata import read_metadata
+from app.utils.storage import create_storage, get_storage
+from app.utils.deletion_queue import queue_deletion
+from app.utils.waveform import build_peaks, peaks_available, peaks_key
+from app.utils.renditions import build_preview, preview_key, PREVIEW_CONTENT_TYPES
+from app.utils.response_cache import invalidate_cache, track_tags
+
+
+# Audio metadata, waveform peaks and the preview rendition are computed
+# from the stored file after upload, in a pool of worker processes:
+# header parsing and decoding are CPU-bound, so they stay off the request
+# thread and the app process's GIL. Workers are spawned rather than
+# forked (the app process runs background threads) and each builds its
+# own storage backend from the app's storage settings.
+
+STORAGE_CONFIG_KEYS = (
+    'STORAGE_BACKEND', 'USE_S3', 'UPLOAD_FOLDER', 'S3_BUCKET', 'S3_KEY', 'S3_SECRET',
+    'S3_REGION', 'S3_MAX_CONCURRENCY', 'S3_PART_SIZE', 'S3_MAX_POOL_CONNECTIONS'
+)
+
+_worker_storage = None
+
+
+def _init_worker(storage):
+    global _worker_storage
+    _worker_storage = create_storage(storage) if isinstance(storage, dict) else storage
+
+def extract_file_metadata(audio_url):
+    """Runs in a worker: returns (metadata or None, error or None)"""
+    if not _worker_storage.owns(audio_url):
+        return None, "Not in storage"
+    try:
+        with _worker_storage.open(audio_url) as f:
+            metadata = read_metadata(f)
+    except Exception as e:
+        return None, str(e)
+    return metadata, None if metadata else "Unrecognised audio headers"
+
+def build_file_peaks(audio_url):
+    """Runs in a worker: stores the file's peaks next to it; (peaks_url, error)"""
+    if not peaks_available():
+        return None, "NumPy is not installed"
+    key = _worker_storage.key_for(audio_url)
+    if key is None:
+        return None, "Not in storage"
+    try:
+        peaks = build_peaks(_worker_storage, audio_url)
+        if peaks is None:
+            return None, "No decoder for this format"
+        writer = _worker_storage.open_writer(peaks_key(key), 'application/octet-stream')
+        try:
+            writer.write(peaks)
+            return writer.commit(), None
+        except Exception:
+            writer.abort()
+            raise
+    except Exception as e:
+        return None, str(e)
+
+def build_file_preview(audio_url):
+    """Runs in a worker: stores the file's preview rendition; (preview_url, error)"""
+    key = _worker_storage.key_for(audio_url)
+    if key is None:
+        return None, "Not in storage"
+    try:
+        preview = build_preview(_worker_storage, audio_url)
+    except Exception as e:
+        return None, str(e)
+    if preview is None:
+        # Not an error: no encoder for the format, or nothing to gain
+        return None, None
+    path, ext = preview
+    try:
+        return _worker_storage.save_file(path, preview_key(key, ext), PREVIEW_CONTENT_TYPES[ext],
+                                         move=True), None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+def process_track_file(audio_url):
+    """Runs in a worker: all processing of a newly stored file; (values, errors)"""
+    metadata, metadata_error = extract_file_metadata(audio_url)
+    peaks_url, peaks_error = build_file_peaks(audio_url)
+    preview_url, preview_error = build_file_preview(audio_url)
+    values = metadata_values(metadata)
+    if peaks_url:
+        values['peaks_url'] = peaks_url
+    if preview_url:
+        values['preview_url'] = preview_url
+    return values, [error for error in (metadata_error, peaks_error, preview_error) if error]
+
+def create_extraction_pool(app, workers):
+    storage = get_storage()
+    if storage.name == 'memory':
+        # Other processes can't see in-memory objects; parse on a thread
+        return ThreadPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(storage,))
+    storage_config = {key: app.config.get(key) for key in STORAGE_CONFIG_KEYS}
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_worker, initargs=(storage_config,))
+
+def metadata_values(metadata):
+    """Track column values for an extraction result (None: nothing found)"""
+    values = {'metadata_extracted_at': datetime.utcnow()}
+    if metadata:
+        values.update({
+            'bitrate': metadata['bitrate'],
+            'sample_rate': metadata['sample_rate'],
+            'channels': metadata['channels'],
+            'codec': metadata['codec']
+        })
+        if metadata['duration']:
+            values['duration'] = max(1, round(metadata['duration']))
+    return values
+
+
+class MetadataExtractor:
+    """Per-process pool that extracts metadata for newly stored files"""
+
+    def __init__(self, app, workers):
+        self.app = app
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+
+    def _get_pool(self, renew=False):
+        with self._lock:
+            # A forked app worker must not reuse its parent's pool
+            if renew or self._pool is None or self._pid != os.getpid():
+                self._pool = create_extraction_pool(self.app, self.workers)
+                self._pid = os.getpid()
+            return self._pool
+
+    def submit(self, track_id, audio_url):
+        try:
+            future = self._get_pool().submit(process_track_file, audio_url)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool
+            future = self._get_pool(renew=True).submit(process_track_file, audio_url)
+        future.add_done_callback(lambda done: self._record(track_id, audio_url, done))
+        return future
+
+    def _record(self, track_id, audio_url, future):
+        try:
+            values, errors = future.result()
+        except Exception as e:
+            values, errors = metadata_values(None), [str(e)]
+        with self.app.app_context():
+            try:
+                # Skip results for a file that has since been replaced
+                updated = Track.query.filter_by(id=track_id, audio_url=audio_url)\
+                                     .update(values, synchronize_session=False)
+                if updated:
+                    invalidate_cache(*track_tags(track_id))
+                else:
+                    # Nothing will point at the files the worker stored
+                    for url in filter(None, (values.get('peaks_url'), values.get('preview_url'))):
+                        queue_deletion(url)
+                db.session.commit()
+                if updated and errors:
+                    self.app.logger.warning(f"Processing track {track_id}: {'; '.join(errors)}")
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception(f"Recording metadata for track {track_id} failed")
+            finally:
+                db.session.remove()
+
+
+def schedule_metadata_extraction(track):
+    """Queue a committed track's file for metadata extraction"""
+    extractor = current_app.extensions.get('metadata_extractor')
+    if extractor is not None:
+        extractor.submit(track.id, track.audio_url)
+
+def extract_backlog(batch_size=200, workers=None, reprocess=False, missing_peaks=False):
+    """
+    Process stored tracks in bulk: batches of tracks are mapped across the
+    pool and written back with one bulk UPDATE each. Picks tracks never
+    processed, those without peaks, or everything with reprocess=True.
+    Returns (processed, with_metadata, with_peaks, with_preview) counts.
+    """
+    workers = workers or current_app.config.get('METADATA_WORKERS', 2)
+    query = Track.query.with_entities(Track.id, Track.audio_url)
+    if missing_peaks:
+        query = query.filter(Track.peaks_url.is_(None))
+    elif not reprocess:
+        query = query.filter(Track.metadata_extracted_at.is_(None))
+
+    processed = with_metadata = with_peaks = with_preview = 0
+    last_id = 0
+    with create_extraction_pool(current_app, workers) as pool:
+        while True:
+            rows = query.filter(Track.id > last_id).order_by(Track.id).limit(batch_size).all()
+            if not rows:
+                break
+            results = pool.map(process_track_file, [audio_url for _, audio_url in rows],
+                               chunksize=max(1, len(rows) // (workers * 4)))
+            mappings = []
+            for (track_id, _), (values, _errors) in zip(rows, results):
+                mappings.append({'id': track_id, **values})
+                with_metadata += values.get('codec') is not None
+                with_peaks += 'peaks_url' in values
+                with_preview += 'preview_url' in values
+            db.session.bulk_update_mappings(Track, mappings)
+            invalidate_cache(*track_tags(*(track_id for track_id, _ in rows)))
+            db.session.commit()
+            processed += len(rows)
+            last_id = rows[-1][0]
+    return processed, with_metadata, with_peaks, with_preview
+
+def init_metadata_extractor(app):
+    """Process new uploads in the pool unless METADATA_EXTRACTION is 'off'"""
+    if app.config.get('METADATA_EXTRACTION', 'pool') == 'pool':
+        app.extensions['metadata_extractor'] = MetadataExtractor(
+            app, app.config.get('METADATA_WORKERS', 2)
+        )
@@ -0,0 +1,76 @@
+# app/utils/pagination.py
+
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import String, literal, tuple_
+from app.models import db
+from app.utils.errors import ValidationError
+
+
+# Keyset ("cursor") pagination. A page is fetched by seeking past the sort
+# key of the last row of the previous page instead of using OFFSET, so the
+# cost of a page doesn't grow with its depth, and no COUNT(*) is needed.
+
+def encode_cursor(sort, values):
+    """Encode the sort key of a row into an opaque, URL-safe cursor"""
+    values = [value.isoformat() if isinstance(value, datetime) else value
+              for value in values]
+    raw = json.dumps({'s': sort, 'k': values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, sort, types):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor (str): Cursor from a previous response
+        sort (str): Sort mode the cursor must have been created for
+        types (list): Python type of each key column (datetime or int)
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload['k']
+        if payload['s'] != sort or len(values) != len(types):
+            raise ValueError("cursor does not match this sort order")
+        return [datetime.fromisoformat(value) if type_ is datetime else type_(value)
+                for value, type_ in zip(values, types)]
+    except (ValueError, TypeError, KeyError):
+        raise ValidationError("Invalid cursor", errors={"cursor": "Malformed or expired cursor"})
+
+def _seek_value(value, dialect):
+    # SQLite keeps timestamps as text, and CURRENT_TIMESTAMP defaults have no
+    # fractional part while SQLAlchemy binds datetimes with one, so they'd
+    # never compare equal. isoformat() matches whichever form was stored.
+    if dialect == 'sqlite' and isinstance(value, datetime):
+        return literal(value.isoformat(sep=' '), String())
+    return value
+
+def keyset_paginate(query, columns, sort, cursor, per_page, descending=True):
+    """
+    Fetch one page of `query` ordered by `columns`, descending unless
+    descending=False
+
+    The last column must be unique (normally the primary key) so the
+    ordering is total. Returns (items, next_cursor); next_cursor is None on
+    the last page.
+    """
+    if cursor:
+        types = [column.type.python_type for column in columns]
+        values = decode_cursor(cursor, sort, types)
+        dialect = db.session.get_bind().dialect.name
+        key = tuple_(*columns)
+        seek = tuple_(*[_seek_value(value, dialect) for value in values])
+        query = query.filter(key < seek if descending else key > seek)
+
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+    # Fetch one extra row to learn whether another page exists
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(sort, [getattr(last, column.key) for column in columns])
+    return items, next_cursor
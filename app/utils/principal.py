@@ -0,0 +1,95 @@
+# app/utils/principal.py
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.models import db, User
+from app.utils.response_cache import create_cache_backend
+
+
+# The logged-in user, without a users query per request. The user loader
+# returns a Principal built from a cached copy of the user's public fields
+# (to_dict()); endpoints that only need current_user.id or to_dict() never
+# touch the ORM. Any other attribute (relationships, check_password, ...)
+# loads the User row on first use and reads it from there.
+#
+# Entries live for PRINCIPAL_CACHE_TTL seconds in PRINCIPAL_CACHE_BACKEND:
+# a per-process LRU by default, or redis to share them across workers.
+# Committed updates to a user, and deletions, evict their entry; other
+# processes' LRU entries run out within the TTL.
+
+
+class Principal(UserMixin):
+    """current_user for an authenticated request, from the principal cache"""
+
+    def __init__(self, data):
+        self._data = data
+        self._user = None
+        self.id = data['id']
+        self.username = data['username']
+        self.email = data['email']
+
+    @property
+    def user(self):
+        """The full User row, loaded on first use"""
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+        return self._user
+
+    def __getattr__(self, name):
+        # Only reached for attributes the cached fields don't cover
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+def _cache():
+    return current_app.extensions.get('principal_cache')
+
+def _key(user_id):
+    return f"principal:{user_id}"
+
+def load_principal(user_id):
+    """A Principal for user_id, or None if there's no such user"""
+    cache = _cache()
+    data = cache.get(_key(user_id)) if cache is not None else None
+    if data is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        data = user.to_dict()
+        if cache is not None:
+            cache.set(_key(user_id), data, ttl=current_app.config.get('PRINCIPAL_CACHE_TTL', 60))
+    return Principal(data)
+
+
+def _user_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('principal_ids', set()).add(target.id)
+
+def _evict_after_commit(session):
+    user_ids = session.info.pop('principal_ids', None)
+    if user_ids and has_app_context():
+        cache = _cache()
+        if cache is not None:
+            for user_id in user_ids:
+                cache.delete(_key(user_id))
+
+def _forget_after_rollback(session):
+    session.info.pop('principal_ids', None)
+
+def init_principal_cache(app):
+    """Cache principals in PRINCIPAL_CACHE_BACKEND ('off' to disable)"""
+    if not event.contains(User, 'after_update', _user_changed):
+        event.listen(User, 'after_update', _user_changed)
+        event.listen(User, 'after_delete', _user_changed)
+        event.listen(Session, 'after_commit', _evict_after_commit)
+        event.listen(Session, 'after_rollback', _forget_after_rollback)
+    backend = create_cache_backend(app.config, prefix='PRINCIPAL_CACHE')
+    if backend is not None:
+        app.extensions['principal_cache'] = backend
@@ -0,0 +1,148 @@
+# app/utils/renditions.py
+
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+from app.utils.waveform import pcm_layout, decode_pcm, PCM_DTYPES
+
+try:
+    import numpy as np
+except ImportError:  # only ffmpeg previews without NumPy
+    np = None
+
+
+# Preview renditions: a compact copy of each upload for mobile and preview
+# playback, so a 100MB WAV isn't what a phone downloads. With ffmpeg
+# installed the preview is mono MP3 at PREVIEW_BITRATE; without it, PCM
+# uploads (WAV/AIFF) are resampled with NumPy to mono 16-bit WAV at
+# PREVIEW_SAMPLE_RATE. Previews that wouldn't be meaningfully smaller than
+# the original are dropped.
+
+PREVIEW_SAMPLE_RATE = 22050
+PREVIEW_BITRATE = '64k'
+# Keep a preview only if it's at most this fraction of the original
+PREVIEW_MAX_RATIO = 0.75
+# Low-pass filter length for resampling (odd, so it's symmetric)
+RESAMPLE_TAPS = 63
+# Input frames per block
+BLOCK_FRAMES = 1024 * 1024
+
+PREVIEW_CONTENT_TYPES = {'mp3': 'audio/mpeg', 'wav': 'audio/wav'}
+
+
+def preview_key(audio_key, ext):
+    return f"{os.path.splitext(audio_key)[0]}.preview.{ext}"
+
+def _lowpass(src_rate, dst_rate):
+    # Windowed sinc cutting off a little below the target's Nyquist
+    cutoff = 0.45 * dst_rate / src_rate
+    n = np.arange(RESAMPLE_TAPS) - (RESAMPLE_TAPS - 1) / 2
+    taps = np.sinc(2 * cutoff * n) * np.hamming(RESAMPLE_TAPS)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+class Resampler:
+    """Streaming low-pass + linear interpolation resampler for mono float blocks"""
+
+    def __init__(self, src_rate, dst_rate):
+        self.step = src_rate / dst_rate
+        self.taps = _lowpass(src_rate, dst_rate) if dst_rate < src_rate else None
+        self.history = np.zeros(RESAMPLE_TAPS - 1, dtype=np.float32)
+        self.carry = np.zeros(0, dtype=np.float32)
+        self.position = 0.0
+
+    def process(self, block):
+        if self.taps is not None:
+            padded = np.concatenate((self.history, block))
+            self.history = padded[len(padded) - (RESAMPLE_TAPS - 1):]
+            block = np.convolve(padded, self.taps, mode='valid').astype(np.float32)
+        # Interpolate at fractional positions, carrying the last sample so
+        # positions continue across block boundaries
+        buffer = np.concatenate((self.carry, block))
+        if len(buffer) < 2:
+            self.carry = buffer
+            return buffer[:0]
+        positions = np.arange(self.position, len(buffer) - 1, self.step)
+        out = np.interp(positions, np.arange(len(buffer)), buffer).astype(np.float32)
+        next_position = positions[-1] + self.step if len(positions) else self.position
+        self.position = next_position - (len(buffer) - 1)
+        self.carry = buffer[-1:]
+        return out
+
+
+def _wav_header(sample_rate, frames):
+    data_size = frames * 2
+    return b'RIFF' + struct.pack('<I', 36 + data_size) + b'WAVEfmt ' + \
+        struct.pack('<IHHIIHH', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16) + \
+        b'data' + struct.pack('<I', data_size)
+
+def _preview_pcm(f, layout, out):
+    """Resample a PCM upload into out as mono 16-bit WAV; False if unsupported"""
+    offset, data_size, channels, sample_rate, byte_order, bits, is_float = layout
+    if not channels or not sample_rate or ((byte_order, bits, is_float) not in PCM_DTYPES and bits != 24):
+        return False
+    dst_rate = min(sample_rate, PREVIEW_SAMPLE_RATE)
+    resampler = Resampler(sample_rate, dst_rate)
+    frame_bytes = channels * bits // 8
+    # Header sizes are patched once the frame count is known
+    out.write(_wav_header(dst_rate, 0))
+    frames = 0
+    f.seek(offset)
+    remaining = data_size
+    while remaining > 0:
+        raw = f.read(min(BLOCK_FRAMES * frame_bytes, remaining))
+        if not raw:
+            break
+        remaining -= len(raw)
+        samples, bias, scale = decode_pcm(raw, byte_order, bits, is_float)
+        usable = len(samples) // channels * channels
+        mono = samples[:usable].reshape(-1, channels).astype(np.float32).mean(axis=1)
+        mono = (mono - bias) / scale
+        resampled = resampler.process(mono)
+        out.write(np.clip(np.round(resampled * 32767), -32768, 32767).astype('<i2').tobytes())
+        frames += len(resampled)
+    out.seek(0)
+    out.write(_wav_header(dst_rate, frames))
+    return True
+
+def _preview_ffmpeg(path, out_path):
+    result = subprocess.run(
+        ['ffmpeg', '-v', 'error', '-nostdin', '-y', '-i', path, '-vn', '-ac', '1',
+         '-ar', str(PREVIEW_SAMPLE_RATE), '-c:a', 'libmp3lame', '-b:a', PREVIEW_BITRATE,
+         '-f', 'mp3', out_path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return result.returncode == 0 and os.path.getsize(out_path) > 0
+
+def build_preview(storage, audio_url):
+    """
+    Encode a stored file's preview into a temp file. Returns (path, ext),
+    the caller taking ownership of the file, or None when there's no
+    encoder for the format or the preview wouldn't save enough.
+    """
+    original_size = None
+    fd, out_path = tempfile.mkstemp(suffix='.preview')
+    os.close(fd)
+    ext = None
+    try:
+        if shutil.which('ffmpeg'):
+            with storage.local_copy(audio_url) as path:
+                original_size = os.path.getsize(path)
+                if _preview_ffmpeg(path, out_path):
+                    ext = 'mp3'
+        if ext is None and np is not None:
+            with storage.open(audio_url) as f, open(out_path, 'wb') as out:
+                layout = pcm_layout(f)
+                f.seek(0, 2)
+                original_size = f.tell()
+                if layout and _preview_pcm(f, layout, out):
+                    ext = 'wav'
+        if ext is None or os.path.getsize(out_path) > original_size * PREVIEW_MAX_RATIO:
+            os.remove(out_path)
+            return None
+        return out_path, ext
+    except Exception:
+        os.remove(out_path)
+        raise
@@ -0,0 +1,153 @@
+# app/utils/replicas.py
+
+import time
+import random
+import threading
+from flask import current_app, request, session as flask_session, has_request_context
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+
+# Read/write split. Replica URLs (DATABASE_REPLICA_URLS) become the binds
+# replica_0, replica_1, ...; a GET/HEAD request's reads go to one healthy
+# replica, picked once per request. Everything else stays on the primary:
+# other methods, anything outside a request (CLI, background threads),
+# views marked @use_primary, response cache fills (an entry would keep a
+# lagging replica's rows until its tags next change), any session that has
+# written, and, for REPLICA_READ_YOUR_WRITES_SECONDS after a request's
+# writes commit, that client's requests (a timestamp in its session
+# cookie), so a user sees their own like or comment straight away.
+#
+# Replicas are probed at most every REPLICA_CHECK_SECONDS per process. One
+# that errors, or (on PostgreSQL) lags the primary by more than
+# REPLICA_MAX_LAG_SECONDS, is skipped until a later probe passes; with
+# none healthy, reads fall back to the primary.
+
+REPLICA_BIND_PREFIX = 'replica_'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_UNTIL_KEY = '_db_primary_until'
+
+# Seconds a standby is behind; 0 when it has replayed everything received
+# (an idle primary doesn't make a caught-up replica look stale)
+LAG_QUERIES = {
+    'postgresql': text(
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() IS NULL "
+        "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    )
+}
+
+
+class ReplicaSet:
+    """The replica engines of an app and their last probed health"""
+
+    def __init__(self, engines, max_lag, check_interval):
+        self.engines = engines
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._healthy = list(engines)
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def lag(self, engine):
+        """Seconds behind the primary, as far as the dialect can tell"""
+        with engine.connect() as conn:
+            query = LAG_QUERIES.get(engine.dialect.name)
+            if query is None:
+                conn.execute(text("SELECT 1"))
+                return 0.0
+            return float(conn.execute(query).scalar() or 0)
+
+    def check(self):
+        healthy = []
+        for engine in self.engines:
+            try:
+                lag = self.lag(engine)
+            except Exception:
+                current_app.logger.warning(f"Read replica {engine.url!r} is unreachable", exc_info=True)
+                continue
+            if lag > self.max_lag:
+                current_app.logger.warning(f"Read replica {engine.url!r} is {lag:.1f}s behind")
+                continue
+            healthy.append(engine)
+        self._healthy = healthy
+
+    def healthy(self):
+        # One request probes when the results are due; the others carry on
+        # with the previous ones
+        if time.monotonic() - self._checked_at >= self.check_interval and self._lock.acquire(blocking=False):
+            try:
+                self.check()
+                self._checked_at = time.monotonic()
+            finally:
+                self._lock.release()
+        return self._healthy
+
+    def choose(self):
+        healthy = self.healthy()
+        return random.choice(healthy) if healthy else None
+
+
+def use_primary(view):
+    """Mark a read-only view that must see the primary's latest data"""
+    view.use_primary = True
+    return view
+
+def read_from_primary(session):
+    """Send the rest of a session's reads to the primary"""
+    session.info['db_replica'] = False
+
+def _replica_for_request():
+    if not has_request_context() or request.method not in SAFE_METHODS:
+        return None
+    replicas = current_app.extensions.get('read_replicas')
+    if replicas is None:
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    if getattr(view, 'use_primary', False):
+        return None
+    if flask_session.get(PRIMARY_UNTIL_KEY, 0) > time.time():
+        return None
+    return replicas.choose()
+
+
+class RoutingSession(FlaskSession):
+    """Sends a request's reads to a read replica where that's safe"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or engine is not self._db.engine:
+            return engine
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info['db_wrote'] = True
+            self.info['db_replica'] = False
+            return engine
+        replica = self.info.get('db_replica')
+        if replica is None:
+            replica = self.info['db_replica'] = _replica_for_request() or False
+        return replica or engine
+
+
+def _remember_writes(session):
+    # A committed write keeps this client on the primary for a while
+    if session.info.pop('db_wrote', False) and has_request_context():
+        window = current_app.config.get('REPLICA_READ_YOUR_WRITES_SECONDS', 10)
+        flask_session[PRIMARY_UNTIL_KEY] = time.time() + window
+
+def _forget_writes(session):
+    session.info.pop('db_wrote', None)
+
+def init_read_replicas(app, db):
+    """Route reads to the replica binds, if DATABASE_REPLICA_URLS set any"""
+    if not event.contains(Session, 'after_commit', _remember_writes):
+        event.listen(Session, 'after_commit', _remember_writes)
+        event.listen(Session, 'after_rollback', _forget_writes)
+    with app.app_context():
+        engines = [engine for key, engine in sorted(db.engines.items(), key=lambda item: str(item[0]))
+                   if key and key.startswith(REPLICA_BIND_PREFIX)]
+    if engines:
+        app.extensions['read_replicas'] = ReplicaSet(
+            engines, app.config.get('REPLICA_MAX_LAG_SECONDS', 5), app.config.get('REPLICA_CHECK_SECONDS', 5)
+        )
@@ -0,0 +1,357 @@
+# app/utils/response_cache.py
+
+import time
+import pickle
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, request, make_response, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models import db
+from app.utils.replicas import read_from_primary
+
+try:
+    import redis
+except ImportError:  # only needed for CACHE_BACKEND=redis
+    redis = None
+
+
+# Server-side cache for public, read-heavy GET endpoints. Entries are keyed
+# by endpoint, path and query string plus the current version of each tag
+# the response depends on ('tracks', 'track:<id>', 'comments:<track_id>').
+# Writes bump tag versions after they commit, which makes every dependent
+# entry unreachable at once; nothing has to enumerate keys.
+#
+# A fresh entry is served as is. Past CACHE_TTL it is still served for up
+# to CACHE_STALE_TTL while one request rebuilds it in the background. On a
+# miss, concurrent requests for the same key wait for the first one rather
+# than all querying the database (single-flight), across processes too
+# when the backend is shared.
+#
+# Cached responses keep their ETag and Last-Modified, so a hit can still
+# answer a conditional request with 304.
+#
+# Backends: 'lru' (per process, the default), 'redis' (shared by all
+# gunicorn workers) and 'memory', an in-process stand-in with redis's
+# semantics for development. 'off' disables caching.
+
+# How long a rebuild may hold a key's lock before others stop waiting
+FILL_LOCK_SECONDS = 5
+FILL_POLL_SECONDS = 0.05
+# Response headers stored with an entry
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+
+class LRUCache:
+    """In-process cache bounded to max_entries, least recently used out first"""
+
+    name = 'lru'
+    shared = False
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _encode(self, value):
+        return value
+
+    def _decode(self, value):
+        return value
+
+    def _get(self, key, now):
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return self._decode(value)
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key, time.monotonic())
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            return [self._get(key, now) for key in keys]
+
+    def _set(self, key, value, ttl):
+        self._entries[key] = (self._encode(value), time.monotonic() + ttl if ttl else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        """Set only if absent; True if this call set it"""
+        with self._lock:
+            if self._get(key, time.monotonic()) is not None:
+                return False
+            self._set(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class MemoryCache(LRUCache):
+    """
+    Local stand-in for the redis backend: values are pickled as they would
+    be on the wire, so anything that can't be shared fails here too
+    """
+
+    name = 'memory'
+    shared = True
+
+    def _encode(self, value):
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _decode(self, value):
+        return pickle.loads(value)
+
+
+class RedisCache:
+    """Shared cache on redis. Errors are logged and treated as misses."""
+
+    name = 'redis'
+    shared = True
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package")
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def _failed(self, operation):
+        current_app.logger.warning(f"Response cache {operation} failed", exc_info=True)
+
+    def get(self, key):
+        try:
+            value = self.client.get(key)
+        except redis.RedisError:
+            self._failed('get')
+            return None
+        return pickle.loads(value) if value is not None else None
+
+    def get_many(self, keys):
+        try:
+            values = self.client.mget(keys)
+        except redis.RedisError:
+            self._failed('get')
+            return [None] * len(keys)
+        return [pickle.loads(value) if value is not None else None for value in values]
+
+    def set(self, key, value, ttl=None):
+        try:
+            self.client.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=ttl)
+        except redis.RedisError:
+            self._failed('set')
+
+    def add(self, key, value, ttl=None):
+        try:
+            return bool(self.client.set(key, pickle.dumps(value), ex=ttl, nx=True))
+        except redis.RedisError:
+            # Act as the lock holder rather than make everyone wait
+            self._failed('add')
+            return True
+
+    def delete(self, key):
+        try:
+            self.client.delete(key)
+        except redis.RedisError:
+            self._failed('delete')
+
+
+def create_cache_backend(config, prefix='CACHE'):
+    """The backend named by <prefix>_BACKEND, sized by <prefix>_MAX_ENTRIES"""
+    backend = (config.get(f'{prefix}_BACKEND') or 'lru').lower()
+    max_entries = config.get(f'{prefix}_MAX_ENTRIES', 1024)
+    if backend == 'off':
+        return None
+    if backend == 'redis':
+        return RedisCache(config.get('CACHE_REDIS_URL') or 'redis://localhost:6379/0')
+    if backend == 'memory':
+        return MemoryCache(max_entries)
+    if backend == 'lru':
+        return LRUCache(max_entries)
+    raise ValueError(f"Unknown {prefix}_BACKEND: {backend}")
+
+
+class ResponseCache:
+    def __init__(self, app, backend, ttl, stale_ttl):
+        self.app = app
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._fill_locks = {}
+        self._fill_locks_lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresh')
+
+    # Tag versions are random tokens rather than counters: a version lost
+    # to eviction comes back as a new token, never as one already used
+    def tag_versions(self, tags):
+        keys = [f"tag:{tag}" for tag in tags]
+        versions = self.backend.get_many(keys)
+        for i, version in enumerate(versions):
+            if version is None:
+                self.backend.add(keys[i], uuid.uuid4().hex[:12])
+                versions[i] = self.backend.get(keys[i]) or 'none'
+        return versions
+
+    def bump(self, tags):
+        for tag in tags:
+            self.backend.set(f"tag:{tag}", uuid.uuid4().hex[:12])
+
+    def key_for(self, tags):
+        query = urlencode(sorted(request.args.items(multi=True)))
+        versions = ','.join(self.tag_versions(tags))
+        raw = f"{request.endpoint}:{request.path}?{query}:{versions}"
+        return f"resp:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+    def serve(self, view, kwargs, tags):
+        key = self.key_for(tags)
+        entry = self.backend.get(key)
+        if entry is not None:
+            if time.time() < entry['fresh_until']:
+                return self._respond(entry, 'HIT')
+            self._revalidate(key, view, kwargs)
+            return self._respond(entry, 'STALE')
+        return self._fill(key, view, kwargs)
+
+    def _respond(self, entry, status):
+        response = current_app.response_class(entry['body'], status=entry['status'],
+                                              mimetype=entry['mimetype'])
+        response.headers.extend(entry['headers'])
+        response.headers['X-Cache'] = status
+        return response.make_conditional(request)
+
+    def _build(self, key, view, kwargs):
+        read_from_primary(db.session)
+        response = make_response(view(**kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            now = time.time()
+            self.backend.set(key, {
+                'body': response.get_data(),
+                'status': response.status_code,
+                'mimetype': response.mimetype,
+                'headers': {name: response.headers[name] for name in CACHED_HEADERS
+                            if name in response.headers},
+                'fresh_until': now + self.ttl
+            }, ttl=self.ttl + self.stale_ttl)
+        return response
+
+    def _fill(self, key, view, kwargs):
+        # Requests in this process queue on a per-key lock; across
+        # processes, a shared backend holds the lock key. The lock stays in
+        # the map while anyone holds or waits on it, so a late arrival
+        # queues on the same lock instead of building alongside.
+        with self._fill_locks_lock:
+            holder = self._fill_locks.setdefault(key, [threading.Lock(), 0])
+            holder[1] += 1
+        try:
+            with holder[0]:
+                entry = self.backend.get(key)
+                if entry is not None:
+                    return self._respond(entry, 'HIT')
+                if self.backend.shared and not self.backend.add(f"lock:{key}", 1, ttl=FILL_LOCK_SECONDS):
+                    entry = self._wait_for(key)
+                    if entry is not None:
+                        return self._respond(entry, 'HIT')
+                try:
+                    response = self._build(key, view, kwargs)
+                finally:
+                    if self.backend.shared:
+                        self.backend.delete(f"lock:{key}")
+                response.headers['X-Cache'] = 'MISS'
+                return response
+        finally:
+            with self._fill_locks_lock:
+                holder[1] -= 1
+                if not holder[1]:
+                    del self._fill_locks[key]
+
+    def _wait_for(self, key):
+        deadline = time.monotonic() + FILL_LOCK_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(FILL_POLL_SECONDS)
+            entry = self.backend.get(key)
+            if entry is not None:
+                return entry
+        return None
+
+    def _revalidate(self, key, view, kwargs):
+        # One rebuild per stale key, on a background thread. It gets a plain
+        # request for the same URL: the client's conditional headers would
+        # turn the rebuild into a 304.
+        if not self.backend.add(f"refresh:{key}", 1, ttl=FILL_LOCK_SECONDS):
+            return
+        path, query_string = request.path, request.query_string
+
+        def refresh():
+            with self.app.test_request_context(path, query_string=query_string):
+                try:
+                    self._build(key, view, kwargs)
+                except Exception:
+                    current_app.logger.exception(f"Refreshing cached {path} failed")
+                finally:
+                    self.backend.delete(f"refresh:{key}")
+
+        self._refresher.submit(refresh)
+
+
+def cached_response(tags):
+    """
+    Cache a public GET view's 200 responses. tags(**view_args) names what
+    the response depends on; invalidate_cache() on those tags evicts it.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            cache = current_app.extensions.get('response_cache')
+            if cache is None or request.method != 'GET':
+                return view(**kwargs)
+            return cache.serve(view, kwargs, tags(**kwargs))
+        return wrapper
+    return decorator
+
+def invalidate_cache(*tags):
+    """Bump the given tags once the current transaction commits"""
+    db.session.info.setdefault('cache_tags', set()).update(tags)
+
+def track_tags(*track_ids):
+    """Tags covering track payloads and the track listings"""
+    return ('tracks', *(f"track:{track_id}" for track_id in track_ids))
+
+
+def _bump_after_commit(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags and has_app_context():
+        cache = current_app.extensions.get('response_cache')
+        if cache is not None:
+            cache.bump(tags)
+
+def _forget_after_rollback(session):
+    session.info.pop('cache_tags', None)
+
+def init_response_cache(app):
+    """Set up the response cache from CACHE_BACKEND ('off' to disable)"""
+    if not event.contains(Session, 'after_commit', _bump_after_commit):
+        event.listen(Session, 'after_commit', _bump_after_commit)
+        event.listen(Session, 'after_rollback', _forget_after_rollback)
+    backend = create_cache_backend(app.config)
+    if backend is not None:
+        app.extensions['response_cache'] = ResponseCache(
+            app, backend, app.config.get('CACHE_TTL', 30), app.config.get('CACHE_STALE_TTL', 300)
+        )
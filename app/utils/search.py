@@ -0,0 +1,119 @@
+# app/utils/search.py
+
+import re
+from sqlalchemy import Float, Integer, func, literal_column, select, text
+from app.models import db, Track
+from app.utils.errors import ValidationError
+
+
+# Full-text search over track title, artist and genre.
+#
+# Postgres keeps a weighted `tracks.search_vector` tsvector in a generated
+# column with a GIN index, so it needs no upkeep from the app. SQLite uses
+# the `track_search` FTS5 table (rowid = track id), which the track routes
+# keep current through index_track/remove_track inside their transaction.
+# Both are created by the search migration; other dialects fall back to
+# ILIKE matching.
+
+SEARCH_TABLE = 'track_search'
+SEARCH_VECTOR = 'search_vector'
+
+# Weights for title, artist_name and genre matches in bm25()
+FTS5_WEIGHTS = (10.0, 5.0, 1.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+def tokenize(q):
+    """Split a search string into lowercase word tokens"""
+    return [token.lower() for token in _TOKEN_RE.findall(q or '')]
+
+def index_track(track):
+    """Add or refresh a track in the search index (flush first for its id)"""
+    if _dialect() != 'sqlite':
+        return
+    remove_track(track.id)
+    db.session.execute(
+        text(f"INSERT INTO {SEARCH_TABLE} (rowid, title, artist_name, genre) "
+             "VALUES (:id, :title, :artist_name, :genre)"),
+        {'id': track.id, 'title': track.title or '',
+         'artist_name': track.artist_name or '', 'genre': track.genre or ''}
+    )
+
+def remove_track(track_id):
+    """Drop a track from the search index"""
+    if _dialect() != 'sqlite':
+        return
+    db.session.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"), {'id': track_id})
+
+def rebuild_index():
+    """Regenerate the SQLite search index from the tracks table"""
+    if _dialect() != 'sqlite':
+        return
+    db.session.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    db.session.execute(text(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, title, artist_name, genre) "
+        "SELECT id, COALESCE(title, ''), COALESCE(artist_name, ''), COALESCE(genre, '') "
+        "FROM tracks"
+    ))
+
+def _matches(tokens):
+    """
+    Subquery of (track_id, rank) for tracks matching every token as a
+    prefix. A lower rank is a better match.
+    """
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        # Quote each token so user input can't inject FTS5 query syntax
+        expression = ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+        weights = ', '.join(str(weight) for weight in FTS5_WEIGHTS)
+        return text(
+            f"SELECT rowid AS track_id, bm25({SEARCH_TABLE}, {weights}) AS rank "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :expression"
+        ).columns(track_id=Integer, rank=Float)\
+         .bindparams(expression=expression)\
+         .subquery('matches')
+
+    if dialect == 'postgresql':
+        vector = literal_column(f'tracks.{SEARCH_VECTOR}')
+        query = func.to_tsquery('simple', ' & '.join(f'{token}:*' for token in tokens))
+        return select(Track.id.label('track_id'),
+                      (-func.ts_rank_cd(vector, query)).label('rank'))\
+               .where(vector.op('@@')(query))\
+               .subquery('matches')
+
+    # No index available: every token must appear in one of the fields
+    clauses = [
+        Track.title.ilike(f'%{token}%') | Track.artist_name.ilike(f'%{token}%')
+        | Track.genre.ilike(f'%{token}%')
+        for token in tokens
+    ]
+    return select(Track.id.label('track_id'), literal_column('0').label('rank'))\
+           .where(*clauses).subquery('matches')
+
+def search_tracks(q, genre=None, sort_by='relevance'):
+    """
+    Build a query of matching tracks
+
+    Args:
+        q (str): Free text; every word must prefix-match title, artist or genre
+        genre (str, optional): Substring filter on genre
+        sort_by (str): 'relevance', 'created_at' or 'likes'
+    """
+    tokens = tokenize(q)
+    if not tokens:
+        raise ValidationError("Search query is required", errors={"q": "Required field"})
+
+    matches = _matches(tokens)
+    query = Track.query.join(matches, matches.c.track_id == Track.id)
+    if genre:
+        query = query.filter(Track.genre.ilike(f"%{genre}%"))
+
+    if sort_by == 'likes':
+        return query.order_by(Track.like_count.desc(), matches.c.rank, Track.id.desc())
+    if sort_by == 'created_at':
+        return query.order_by(Track.created_at.desc(), Track.id.desc())
+    return query.order_by(matches.c.rank, Track.like_count.desc(), Track.id.desc())
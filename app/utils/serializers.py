@@ -0,0 +1,101 @@
+# app/utils/serializers.py
+
+from collections import defaultdict
+from sqlalchemy import case, func, select
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models import db, Playlist, Track, User, playlist_tracks
+
+
+# Collection-level serializers. Each one prepares a whole page of rows for
+# the JSON provider with a fixed number of queries, instead of letting
+# encoding trigger a lazy load (or an aggregate query) for every row.
+# They return the models themselves; the provider encodes them.
+
+def serialize_tracks(tracks):
+    """A page of tracks (like counts are stored on the row)"""
+    return list(tracks)
+
+def load_playlist_tracks(playlist_ids):
+    """Load the tracks of many playlists in one query, keyed by playlist id"""
+    tracks_by_playlist = defaultdict(list)
+    if not playlist_ids:
+        return tracks_by_playlist
+
+    rows = db.session.query(playlist_tracks.c.playlist_id, Track)\
+                     .join(Track, Track.id == playlist_tracks.c.track_id)\
+                     .filter(playlist_tracks.c.playlist_id.in_(playlist_ids))\
+                     .order_by(playlist_tracks.c.playlist_id, playlist_tracks.c.position, playlist_tracks.c.track_id)\
+                     .all()
+    for playlist_id, track in rows:
+        tracks_by_playlist[playlist_id].append(track)
+    return tracks_by_playlist
+
+def serialize_playlists(playlists):
+    """Playlists with all of their tracks loaded in one query"""
+    tracks_by_playlist = load_playlist_tracks([playlist.id for playlist in playlists])
+    for playlist in playlists:
+        # Populate the relationship as if it had been loaded, so encoding
+        # reads it without SQL
+        set_committed_value(playlist, 'tracks', tracks_by_playlist[playlist.id])
+    return playlists
+
+def iter_playlists(query, batch_size=100):
+    """
+    Stream playlists from a query with their tracks, loading one batch of
+    rows (and one query of tracks) at a time
+    """
+    batch = []
+    for playlist in query.yield_per(batch_size):
+        batch.append(playlist)
+        if len(batch) == batch_size:
+            yield from serialize_playlists(batch)
+            batch = []
+    if batch:
+        yield from serialize_playlists(batch)
+
+def summarize_playlists(user_id, covers=4):
+    """
+    One row per playlist of the user's, without its tracks: track count,
+    total duration and the first `covers` track ids, in one grouped query
+    """
+    # Number each entry within its playlist, in playlist order
+    entries = select(
+        playlist_tracks.c.playlist_id,
+        playlist_tracks.c.track_id,
+        Track.duration,
+        func.row_number().over(
+            partition_by=playlist_tracks.c.playlist_id,
+            order_by=(playlist_tracks.c.position, playlist_tracks.c.track_id)
+        ).label('number')
+    ).join(Track, Track.id == playlist_tracks.c.track_id)\
+     .join(Playlist, Playlist.id == playlist_tracks.c.playlist_id)\
+     .where(Playlist.user_id == user_id).subquery()
+
+    cover_columns = [func.max(case((entries.c.number == n, entries.c.track_id))) for n in range(1, covers + 1)]
+    rows = db.session.query(
+        Playlist.id, Playlist.name, Playlist.user_id, Playlist.created_at, Playlist.updated_at,
+        func.count(entries.c.track_id), func.coalesce(func.sum(entries.c.duration), 0), *cover_columns
+    ).outerjoin(entries, entries.c.playlist_id == Playlist.id)\
+     .filter(Playlist.user_id == user_id)\
+     .group_by(Playlist.id, Playlist.name, Playlist.user_id, Playlist.created_at, Playlist.updated_at)\
+     .order_by(Playlist.id).all()
+
+    return [{
+        'id': playlist_id,
+        'name': name,
+        'user_id': owner_id,
+        'created_at': created_at.isoformat() if created_at else None,
+        'updated_at': updated_at.isoformat() if updated_at else None,
+        'track_count': track_count,
+        'total_duration': int(total_duration),
+        'cover_track_ids': [track_id for track_id in cover_ids if track_id is not None]
+    } for playlist_id, name, owner_id, created_at, updated_at, track_count, total_duration, *cover_ids in rows]
+
+def serialize_comments(comments):
+    """Comments with their authors loaded in one query"""
+    user_ids = {comment.user_id for comment in comments}
+    authors = User.query.filter(User.id.in_(user_ids)).all() if user_ids else []
+    authors_by_id = {user.id: user for user in authors}
+    for comment in comments:
+        set_committed_value(comment, 'user', authors_by_id.get(comment.user_id))
+    return comments
@@ -0,0 +1,156 @@
+# app/utils/static_assets.py
+
+import os
+import re
+import mimetypes
+import threading
+from flask import current_app, request
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_accept_header
+from werkzeug.utils import send_file
+
+
+# Static files from the React build (react-vite/dist) are answered by a WSGI
+# middleware in front of Flask, so a JS bundle or the favicon no longer goes
+# through request hooks, the session or the CSRF cookie. Files are served
+# from a manifest of the build directory, with a precompressed .br / .gz
+# next to a file (see `flask maintenance compress-static`) sent to clients
+# that accept it. Vite's hashed output under assets/ never changes under its
+# name and is cached for a year as immutable; everything else revalidates.
+#
+# index.html and client-side routes still go through Flask: the page needs
+# its CSRF cookie. Plain-http requests in production also fall through, so
+# https_redirect still applies.
+
+HASHED_ASSET = re.compile(r'^assets/.+-[\w-]{8,}\.\w+$')
+IMMUTABLE_MAX_AGE = 31536000
+# Preferred first; the extension is the precompressed file's suffix
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# Served by Flask, with the request hooks
+FLASK_PAGES = ('index.html',)
+
+
+class StaticAsset:
+    __slots__ = ('path', 'mimetype', 'immutable', 'variants')
+
+    def __init__(self, path, mimetype, immutable, variants):
+        self.path = path
+        self.mimetype = mimetype
+        self.immutable = immutable
+        # [(encoding, path)], in ENCODINGS order
+        self.variants = variants
+
+
+def scan_assets(root):
+    """Map each file under root (by URL path) to a StaticAsset"""
+    manifest = {}
+    for directory, _, files in os.walk(root):
+        present = set(files)
+        for name in files:
+            if name.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+                continue
+            path = os.path.join(directory, name)
+            url_path = os.path.relpath(path, root).replace(os.sep, '/')
+            if url_path in FLASK_PAGES:
+                continue
+            manifest['/' + url_path] = StaticAsset(
+                path,
+                mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                bool(HASHED_ASSET.match(url_path)),
+                [(encoding, path + suffix) for encoding, suffix in ENCODINGS
+                 if name + suffix in present]
+            )
+    return manifest
+
+def choose_encoding(asset, accept_encoding):
+    """The best precompressed (encoding, path) the client accepts, or None"""
+    if not asset.variants or not accept_encoding:
+        return None
+    accepted = parse_accept_header(accept_encoding)
+    for encoding, path in asset.variants:
+        if accepted[encoding] > 0:
+            return encoding, path
+    return None
+
+
+class StaticAssetMiddleware:
+    """Serves the build directory's files before Flask sees the request"""
+
+    def __init__(self, wsgi_app, root, redirect_http=False):
+        self.wsgi_app = wsgi_app
+        self.root = os.path.abspath(root)
+        self.redirect_http = redirect_http
+        self._lock = threading.Lock()
+        self._scanned_mtime = None
+        self.manifest = {}
+        self.refresh()
+
+    def refresh(self):
+        """Rescan the build directory if it changed (e.g. a rebuild)"""
+        try:
+            mtime = os.stat(self.root).st_mtime
+        except OSError:
+            mtime = None
+        with self._lock:
+            if mtime != self._scanned_mtime:
+                self.manifest = scan_assets(self.root) if mtime is not None else {}
+                self._scanned_mtime = mtime
+
+    def lookup(self, path):
+        asset = self.manifest.get(path)
+        if asset is None and not path.startswith('/api/'):
+            # Rebuilds replace the directory's entries, which bumps its mtime
+            self.refresh()
+            asset = self.manifest.get(path)
+        return asset
+
+    def __call__(self, environ, start_response):
+        if environ['REQUEST_METHOD'] in ('GET', 'HEAD') and not (
+                self.redirect_http and environ.get('HTTP_X_FORWARDED_PROTO') == 'http'):
+            asset = self.lookup(environ.get('PATH_INFO', ''))
+            if asset is not None:
+                return self.serve(asset, environ)(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+    def serve(self, asset, environ):
+        variant = choose_encoding(asset, environ.get('HTTP_ACCEPT_ENCODING'))
+        path = variant[1] if variant else asset.path
+        try:
+            # send_file answers conditionals and ranges, and hands the file
+            # to wsgi.file_wrapper. Each variant has its own ETag.
+            response = send_file(path, environ, mimetype=asset.mimetype, conditional=True, etag=True,
+                                 max_age=IMMUTABLE_MAX_AGE if asset.immutable else None)
+        except HTTPException as e:
+            return e
+        except OSError:
+            # Removed since the scan; Flask answers as it would for any miss
+            self.refresh()
+            return self.wsgi_app
+        if asset.immutable:
+            response.cache_control.immutable = True
+        if variant:
+            response.headers['Content-Encoding'] = variant[0]
+        if asset.variants:
+            response.vary.add('Accept-Encoding')
+        return response
+
+
+def lean_response(view):
+    """Mark a media view: its responses skip the API-only after_request work"""
+    view.lean_response = True
+    return view
+
+def is_lean_request():
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'lean_response', False)
+
+def init_static_assets(app):
+    """
+    Serve app.static_folder ahead of Flask unless STATIC_ASSETS is 'flask'
+    (Flask's static route, hooks and all, as before)
+    """
+    if app.static_folder and app.config.get('STATIC_ASSETS', 'middleware') == 'middleware':
+        app.wsgi_app = StaticAssetMiddleware(
+            app.wsgi_app, app.static_folder,
+            redirect_http=os.environ.get('FLASK_ENV') == 'production'
+        )
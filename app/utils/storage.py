@@ -0,0 +1,534 @@
+# app/utils/storage.py
+
+import os
+import io
+import shutil
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError
+from flask import current_app
+from app.utils.errors import FileUploadError, ResourceNotFoundError
+
+
+# One storage backend per app, chosen by STORAGE_BACKEND (local, s3 or
+# memory). Backends are built once and own their long-lived clients, so
+# routes never pay for a boto3 session, credential lookup or connection
+# pool per request. audio_url values stay in their historical formats:
+# a path under UPLOAD_FOLDER locally, the bucket URL on S3.
+
+# S3 rejects parts under 5MB (except the last)
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+# DeleteObjects takes at most this many keys per call
+S3_DELETE_BATCH = 1000
+# Each ranged GET behind S3Storage.open() fetches at least this much
+S3_READ_BUFFER = 64 * 1024
+
+
+class StorageBackend(ABC):
+    """Interface shared by every backend"""
+
+    name = None
+
+    @abstractmethod
+    def url_for(self, key):
+        """The URL stored for an object saved under key"""
+
+    @abstractmethod
+    def key_for(self, url):
+        """The key a URL refers to, or None if this backend doesn't own it"""
+
+    @abstractmethod
+    def open_writer(self, key, content_type=None):
+        """A writer with write(data), commit() -> url, and abort()"""
+
+    @abstractmethod
+    def save_fileobj(self, fileobj, key, content_type=None):
+        """Store the contents of a binary file object; returns the URL"""
+
+    @abstractmethod
+    def save_file(self, path, key, content_type=None, move=False):
+        """Store a local file; with move=True the source may be consumed"""
+
+    @abstractmethod
+    def read_range(self, url, start=0, length=None):
+        """Return length bytes from start (to the end when length is None)"""
+
+    def local_path(self, url):
+        """A filesystem path for the object, if it lives on local disk"""
+        return None
+
+    def open(self, url):
+        """A binary file object over the whole object"""
+        return io.BytesIO(self.read_range(url))
+
+    @contextmanager
+    def local_copy(self, url):
+        """A filesystem path for the object, downloaded to a temp file if need be"""
+        path = self.local_path(url)
+        if path:
+            yield path
+            return
+        with tempfile.NamedTemporaryFile(suffix=os.path.splitext(url)[1]) as tmp:
+            with self.open(url) as f:
+                shutil.copyfileobj(f, tmp, 1024 * 1024)
+            tmp.flush()
+            yield tmp.name
+
+    @abstractmethod
+    def delete_many(self, urls):
+        """
+        Delete objects in as few calls as possible. Returns {url: error}
+        for the ones that could not be deleted; missing objects count as
+        deleted.
+        """
+
+    def delete(self, url):
+        return not self.delete_many([url])
+
+    def owns(self, url):
+        return bool(url) and self.key_for(url) is not None
+
+
+class LocalFileWriter:
+    """Writes into a .part file and renames it into place on commit"""
+
+    def __init__(self, storage, key):
+        self.storage = storage
+        self.path = storage.path_for(key)
+        self._partial_path = f"{self.path}.part"
+        self._file = open(self._partial_path, 'wb')
+
+    def write(self, data):
+        self._file.write(data)
+
+    def commit(self):
+        self._file.close()
+        os.replace(self._partial_path, self.path)
+        return self.path
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._partial_path):
+            os.remove(self._partial_path)
+
+
+class LocalStorage(StorageBackend):
+    """Files under UPLOAD_FOLDER; audio_url is the file's path"""
+
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._real_root = os.path.realpath(root)
+
+    def path_for(self, key):
+        return os.path.join(self.root, key)
+
+    def url_for(self, key):
+        return self.path_for(key)
+
+    def key_for(self, url):
+        if not url or url.startswith(('http://', 'https://', 'memory://')):
+            return None
+        path = os.path.realpath(url)
+        # Never touch anything outside the upload folder
+        if not path.startswith(self._real_root + os.sep):
+            return None
+        return os.path.relpath(path, self._real_root)
+
+    def open_writer(self, key, content_type=None):
+        return LocalFileWriter(self, key)
+
+    def save_fileobj(self, fileobj, key, content_type=None):
+        writer = self.open_writer(key, content_type)
+        try:
+            for chunk in iter(lambda: fileobj.read(1024 * 1024), b''):
+                writer.write(chunk)
+            return writer.commit()
+        except Exception:
+            writer.abort()
+            raise
+
+    def save_file(self, path, key, content_type=None, move=False):
+        if not move:
+            with open(path, 'rb') as f:
+                return self.save_fileobj(f, key, content_type)
+        # A rename, no copy, when the source is on the same filesystem
+        target = self.path_for(key)
+        shutil.move(path, target)
+        return target
+
+    def local_path(self, url):
+        key = self.key_for(url)
+        if key is None:
+            return None
+        path = os.path.join(self._real_root, key)
+        return path if os.path.isfile(path) else None
+
+    def read_range(self, url, start=0, length=None):
+        path = self.local_path(url)
+        if path is None:
+            raise ResourceNotFoundError("Audio file")
+        with open(path, 'rb') as f:
+            f.seek(start)
+            return f.read() if length is None else f.read(length)
+
+    def open(self, url):
+        path = self.local_path(url)
+        if path is None:
+            raise ResourceNotFoundError("Audio file")
+        return open(path, 'rb')
+
+    def delete_many(self, urls):
+        failed = {}
+        for url in urls:
+            key = self.key_for(url)
+            if key is None:
+                failed[url] = "Not in the upload folder"
+                continue
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                current_app.logger.error(f"Local delete error for {url}: {str(e)}")
+                failed[url] = str(e)
+        return failed
+
+
+class S3MultipartWriter:
+    """
+    Streams an upload to S3 as a multipart upload. Parts go up on the
+    backend's thread pool while the next part is still being received, with
+    at most max_in_flight parts buffered.
+    """
+
+    def __init__(self, storage, key, content_type=None):
+        self.storage = storage
+        self.client = storage.client
+        self.bucket = storage.bucket
+        self.key = key
+        self.content_type = content_type or 'application/octet-stream'
+        self.part_size = storage.part_size
+        self._buffer = bytearray()
+        self._parts = []
+        self._pending = deque()
+        self._upload_id = None
+
+    def _start(self):
+        self._upload_id = self.client.create_multipart_upload(
+            Bucket=self.bucket, Key=self.key,
+            ACL='public-read', ContentType=self.content_type
+        )['UploadId']
+
+    def _upload_part(self, part_number, body):
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+            PartNumber=part_number, Body=body
+        )
+        return {'ETag': response['ETag'], 'PartNumber': part_number}
+
+    def _submit(self, body):
+        if self._upload_id is None:
+            self._start()
+        part_number = len(self._parts) + len(self._pending) + 1
+        self._pending.append(self.storage.executor.submit(self._upload_part, part_number, bytes(body)))
+        while len(self._pending) >= self.storage.max_in_flight:
+            self._parts.append(self._pending.popleft().result())
+
+    def write(self, data):
+        self._buffer.extend(data)
+        while len(self._buffer) >= self.part_size:
+            self._submit(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+
+    def commit(self):
+        try:
+            if self._upload_id is None:
+                # Small enough for a single request
+                self.client.put_object(
+                    Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer),
+                    ACL='public-read', ContentType=self.content_type
+                )
+            else:
+                if self._buffer:
+                    self._submit(self._buffer)
+                while self._pending:
+                    self._parts.append(self._pending.popleft().result())
+                self.client.complete_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                    MultipartUpload={'Parts': self._parts}
+                )
+        except Exception as e:
+            self.abort()
+            current_app.logger.error(f"S3 upload error: {str(e)}")
+            raise FileUploadError(f"Failed to upload file to S3: {str(e)}")
+        return self.storage.url_for(self.key)
+
+    def abort(self):
+        self._buffer.clear()
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        if self._upload_id is not None:
+            try:
+                self.client.abort_multipart_upload(
+                    Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+                )
+            except Exception as e:
+                current_app.logger.error(f"S3 abort error: {str(e)}")
+
+
+class S3RangeReader(io.RawIOBase):
+    """A seekable, read-only view of an S3 object made of ranged GETs"""
+
+    def __init__(self, storage, url, size):
+        self.storage = storage
+        self.url = url
+        self.size = size
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self.size}[whence]
+        if base + offset < 0:
+            raise ValueError("Negative seek position")
+        self._pos = base + offset
+        return self._pos
+
+    def readinto(self, buffer):
+        length = min(len(buffer), self.size - self._pos)
+        if length <= 0:
+            return 0
+        data = self.storage.read_range(self.url, self._pos, length)
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+class S3Storage(StorageBackend):
+    """An S3 bucket behind one shared, thread-safe client"""
+
+    name = 's3'
+
+    def __init__(self, bucket, key=None, secret=None, region=None, max_concurrency=8,
+                 part_size=8 * 1024 * 1024, max_pool_connections=32, max_in_flight=2):
+        self.bucket = bucket
+        self.part_size = max(part_size, S3_MIN_PART_SIZE)
+        self.max_in_flight = max(max_in_flight, 1)
+        # Clients are thread-safe (sessions are not); the pool must cover
+        # concurrent transfers across all request threads
+        session = boto3.session.Session(
+            aws_access_key_id=key, aws_secret_access_key=secret, region_name=region
+        )
+        self.client = session.client('s3', config=BotoConfig(
+            max_pool_connections=max_pool_connections,
+            retries={'max_attempts': 5, 'mode': 'standard'},
+            tcp_keepalive=True
+        ))
+        self.transfer_config = TransferConfig(
+            multipart_threshold=self.part_size,
+            multipart_chunksize=self.part_size,
+            max_concurrency=max_concurrency,
+            use_threads=True
+        )
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='s3-parts')
+        self._prefix = f"https://{bucket}.s3.amazonaws.com/"
+
+    def url_for(self, key):
+        return f"{self._prefix}{key}"
+
+    def key_for(self, url):
+        if url and url.startswith(self._prefix):
+            return url[len(self._prefix):]
+        return None
+
+    def open_writer(self, key, content_type=None):
+        return S3MultipartWriter(self, key, content_type)
+
+    def _extra_args(self, content_type):
+        return {'ACL': 'public-read', 'ContentType': content_type or 'application/octet-stream'}
+
+    def save_fileobj(self, fileobj, key, content_type=None):
+        try:
+            self.client.upload_fileobj(fileobj, self.bucket, key,
+                                       ExtraArgs=self._extra_args(content_type),
+                                       Config=self.transfer_config)
+        except Exception as e:
+            current_app.logger.error(f"S3 upload error: {str(e)}")
+            raise FileUploadError(f"Failed to upload file to S3: {str(e)}")
+        return self.url_for(key)
+
+    def save_file(self, path, key, content_type=None, move=False):
+        # upload_file sends the parts of a seekable file concurrently
+        try:
+            self.client.upload_file(path, self.bucket, key,
+                                    ExtraArgs=self._extra_args(content_type),
+                                    Config=self.transfer_config)
+        except Exception as e:
+            current_app.logger.error(f"S3 upload error: {str(e)}")
+            raise FileUploadError(f"Failed to upload file to S3: {str(e)}")
+        if move:
+            os.remove(path)
+        return self.url_for(key)
+
+    def read_range(self, url, start=0, length=None):
+        key = self.key_for(url)
+        if key is None:
+            raise ResourceNotFoundError("Audio file")
+        byte_range = f"bytes={start}-" if length is None else f"bytes={start}-{start + length - 1}"
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key, Range=byte_range)['Body'].read()
+        except self.client.exceptions.NoSuchKey:
+            raise ResourceNotFoundError("Audio file")
+
+    def open(self, url):
+        # Ranged reads rather than a whole download: header parsers only
+        # touch a few kilobytes of each file
+        key = self.key_for(url)
+        if key is None:
+            raise ResourceNotFoundError("Audio file")
+        try:
+            size = self.client.head_object(Bucket=self.bucket, Key=key)['ContentLength']
+        except ClientError:
+            raise ResourceNotFoundError("Audio file")
+        return io.BufferedReader(S3RangeReader(self, url, size), buffer_size=S3_READ_BUFFER)
+
+    def delete_many(self, urls):
+        failed, keys = {}, []
+        for url in urls:
+            key = self.key_for(url)
+            if key is None:
+                failed[url] = "Not in this bucket"
+            else:
+                keys.append(key)
+        for i in range(0, len(keys), S3_DELETE_BATCH):
+            batch = keys[i:i + S3_DELETE_BATCH]
+            try:
+                response = self.client.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+                for error in response.get('Errors', []):
+                    failed[self.url_for(error['Key'])] = f"{error.get('Code')}: {error.get('Message')}"
+            except Exception as e:
+                current_app.logger.error(f"S3 delete error: {str(e)}")
+                failed.update((self.url_for(key), str(e)) for key in batch)
+        return failed
+
+
+class MemoryWriter:
+
+    def __init__(self, storage, key):
+        self.storage = storage
+        self.key = key
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer.extend(data)
+
+    def commit(self):
+        with self.storage.lock:
+            self.storage.objects[self.key] = bytes(self._buffer)
+        return self.storage.url_for(self.key)
+
+    def abort(self):
+        self._buffer.clear()
+
+
+class MemoryStorage(StorageBackend):
+    """In-process stand-in for tests and local experiments"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self.objects = {}
+        self.lock = threading.Lock()
+
+    def url_for(self, key):
+        return f"memory://{key}"
+
+    def key_for(self, url):
+        if url and url.startswith('memory://'):
+            return url[len('memory://'):]
+        return None
+
+    def open_writer(self, key, content_type=None):
+        return MemoryWriter(self, key)
+
+    def save_fileobj(self, fileobj, key, content_type=None):
+        writer = self.open_writer(key, content_type)
+        writer.write(fileobj.read())
+        return writer.commit()
+
+    def save_file(self, path, key, content_type=None, move=False):
+        with open(path, 'rb') as f:
+            url = self.save_fileobj(f, key, content_type)
+        if move:
+            os.remove(path)
+        return url
+
+    def read_range(self, url, start=0, length=None):
+        data = self.objects.get(self.key_for(url))
+        if data is None:
+            raise ResourceNotFoundError("Audio file")
+        return data[start:] if length is None else data[start:start + length]
+
+    def delete_many(self, urls):
+        failed = {}
+        with self.lock:
+            for url in urls:
+                key = self.key_for(url)
+                if key is None:
+                    failed[url] = "Not a memory:// URL"
+                else:
+                    self.objects.pop(key, None)
+        return failed
+
+
+_storage_lock = threading.Lock()
+
+def create_storage(config):
+    backend = config.get('STORAGE_BACKEND') or ('s3' if config.get('USE_S3') else 'local')
+    if backend == 's3':
+        return S3Storage(
+            config.get('S3_BUCKET'),
+            key=config.get('S3_KEY'),
+            secret=config.get('S3_SECRET'),
+            region=config.get('S3_REGION'),
+            max_concurrency=config.get('S3_MAX_CONCURRENCY', 8),
+            part_size=config.get('S3_PART_SIZE', 8 * 1024 * 1024),
+            max_pool_connections=config.get('S3_MAX_POOL_CONNECTIONS', 32)
+        )
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'local':
+        return LocalStorage(config.get('UPLOAD_FOLDER', 'uploads'))
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+def get_storage():
+    """The current app's storage backend, built on first use"""
+    app = current_app._get_current_object()
+    storage = app.extensions.get('storage')
+    if storage is None:
+        with _storage_lock:
+            storage = app.extensions.get('storage')
+            if storage is None:
+                storage = app.extensions['storage'] = create_storage(app.config)
+    return storage
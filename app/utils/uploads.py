@@ -0,0 +1,203 @@
+# app/utils/uploads.py
+
+import os
+from flask import request
+from werkzeug.sansio.multipart import MultipartDecoder, Field, File, Data, Epilogue, NeedData
+from werkzeug.utils import secure_filename
+from app.utils.errors import ValidationError, validate_file_extension
+from app.utils.storage import get_storage
+
+
+# Streaming ingestion of multipart uploads. The request body is read in
+# chunks and each chunk of the audio part goes straight to the storage
+# backend's writer (a local file or an S3 multipart upload), so an upload never
+# sits whole in memory or in a temporary file, and the size limit and file
+# type are enforced while the bytes arrive.
+
+CHUNK_SIZE = 64 * 1024
+# Plain form fields (title, genre...) are small; anything bigger is abuse
+MAX_FIELD_SIZE = 64 * 1024
+# Bytes needed to recognise every supported container
+SNIFF_SIZE = 16
+
+# Container formats accepted for each allowed extension
+EXTENSION_FORMATS = {
+    'mp3': {'mp3'},
+    'wav': {'wav'},
+    'ogg': {'ogg'},
+    'flac': {'flac'},
+    'm4a': {'mp4'},
+    'aac': {'aac', 'mp4'},
+    '3gp': {'mp4'},
+    'wma': {'asf'},
+    'aiff': {'aiff'},
+    'alac': {'mp4'},
+    'mp4': {'mp4'},
+    'webm': {'webm'},
+    'caf': {'caf'}
+}
+
+
+def sniff_audio_format(head):
+    """Identify an audio container from its first bytes, or return None"""
+    if head[:3] == b'ID3':
+        return 'mp3'
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        # MPEG frame sync; layer bits 00 mean an AAC ADTS stream
+        return 'aac' if head[1] & 0x06 == 0 else 'mp3'
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[:4] == b'OggS':
+        return 'ogg'
+    if head[:4] == b'fLaC':
+        return 'flac'
+    if head[4:8] == b'ftyp':
+        return 'mp4'
+    if head[:4] == b'FORM' and head[8:12] in (b'AIFF', b'AIFC'):
+        return 'aiff'
+    if head[:4] == b'\x1aE\xdf\xa3':
+        return 'webm'
+    if head[:8] == b'\x30\x26\xb2\x75\x8e\x66\xcf\x11':
+        return 'asf'
+    if head[:4] == b'caff':
+        return 'caf'
+    if head[:4] == b'ADIF':
+        return 'aac'
+    return None
+
+def validate_audio_content(head, filename):
+    """Check that a file's leading bytes match the format its extension claims"""
+    ext = filename.rsplit('.', 1)[1].lower()
+    if sniff_audio_format(bytes(head[:SNIFF_SIZE])) not in EXTENSION_FORMATS.get(ext, ()):
+        raise ValidationError(
+            "File content does not match its type",
+            errors={"file": "Invalid audio file"}
+        )
+    return True
+
+
+class StreamedUpload:
+    """Result of ingest_upload: the form fields and the stored file, if any"""
+
+    def __init__(self):
+        self.fields = {}
+        self.filename = None
+        self.file_url = None
+        self.size = 0
+
+    def discard(self):
+        """Remove the stored file, e.g. when the database write fails"""
+        if self.file_url is not None:
+            get_storage().delete(self.file_url)
+
+
+def ingest_upload(file_field, allowed_extensions, max_size, name_file):
+    """
+    Stream a multipart/form-data request body to storage
+
+    Args:
+        file_field (str): Name of the form part holding the audio file
+        allowed_extensions (set): Accepted file extensions
+        max_size (int): Maximum file size in bytes, enforced while reading
+        name_file (callable): Maps the client's secure filename to the
+            stored filename
+
+    Returns a StreamedUpload; file_url is None if no file part was sent.
+    """
+    if request.mimetype != 'multipart/form-data':
+        raise ValidationError("Expected multipart/form-data", errors={file_field: "Required field"})
+    boundary = request.mimetype_params.get('boundary', '').encode('latin-1')
+    if not boundary:
+        raise ValidationError("Malformed multipart body", errors={file_field: "Missing boundary"})
+    if request.content_length and request.content_length > max_size + MAX_FIELD_SIZE * 8:
+        # Reject bodies that can't fit (file plus a few small fields)
+        # before reading any of them
+        raise ValidationError(
+            f"File too large. Maximum size: {max_size // (1024 * 1024)}MB",
+            errors={"file": "Maximum file size exceeded"}
+        )
+
+    upload = StreamedUpload()
+    decoder = MultipartDecoder(boundary)
+    stream = request.stream
+    part = None          # ('field', name, bytearray) | ('file', sink) | ('skip',)
+    head = bytearray()   # first bytes of the file, held back until sniffed
+    sink = None
+
+    def feed_file(data, final):
+        nonlocal head
+        upload.size += len(data)
+        if upload.size > max_size:
+            raise ValidationError(
+                f"File too large. Maximum size: {max_size // (1024 * 1024)}MB",
+                errors={"file": "Maximum file size exceeded"}
+            )
+        if head is None:
+            sink.write(data)
+            return
+        head.extend(data)
+        if len(head) >= SNIFF_SIZE or final:
+            validate_audio_content(head, upload.filename)
+            sink.write(bytes(head))
+            head = None
+
+    try:
+        while True:
+            try:
+                event = decoder.next_event()
+            except ValueError:
+                # Raised once the body has ended in the middle of a part
+                raise ValidationError("Malformed or incomplete upload", errors={file_field: "Incomplete upload"})
+            if isinstance(event, NeedData):
+                if decoder.complete:
+                    # The body ended before the closing boundary
+                    raise ValidationError("Malformed or incomplete upload", errors={file_field: "Incomplete upload"})
+                chunk = stream.read(CHUNK_SIZE)
+                decoder.receive_data(chunk or None)
+                continue
+            if isinstance(event, Epilogue):
+                break
+            if isinstance(event, File):
+                if event.name == file_field and sink is None and event.filename:
+                    filename = secure_filename(event.filename)
+                    validate_file_extension(filename, allowed_extensions)
+                    upload.filename = filename
+                    sink = get_storage().open_writer(name_file(filename), event.headers.get('Content-Type'))
+                    part = ('file',)
+                else:
+                    part = ('skip',)
+            elif isinstance(event, Field):
+                part = ('field', event.name, bytearray())
+            elif isinstance(event, Data):
+                if part[0] == 'file':
+                    feed_file(event.data, not event.more_data)
+                elif part[0] == 'field':
+                    part[2].extend(event.data)
+                    if len(part[2]) > MAX_FIELD_SIZE:
+                        raise ValidationError("Form field too large", errors={part[1]: "Too large"})
+                    if not event.more_data:
+                        upload.fields[part[1]] = part[2].decode('utf-8', 'replace')
+        if sink is not None:
+            if head is not None:
+                feed_file(b'', True)
+            upload.file_url = sink.commit()
+    except Exception:
+        if sink is not None and upload.file_url is None:
+            sink.abort()
+        raise
+    return upload
+
+
+def store_staged_file(staged_path, filename, stored_filename, content_type=None):
+    """
+    Move a fully received file (e.g. a finished resumable upload) into
+    storage. Returns a StreamedUpload so callers can discard it on failure.
+    """
+    with open(staged_path, 'rb') as f:
+        validate_audio_content(f.read(SNIFF_SIZE), filename)
+
+    upload = StreamedUpload()
+    upload.filename = filename
+    upload.size = os.path.getsize(staged_path)
+    upload.file_url = get_storage().save_file(staged_path, stored_filename, content_type, move=True)
+    return upload
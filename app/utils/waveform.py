@@ -0,0 +1,245 @@
+# app/utils/waveform.py
+
+import os
+import shutil
+import struct
+import subprocess
+from app.utils.audio_metadata import wav_format, aiff_format
+
+try:
+    import numpy as np
+except ImportError:  # peaks are skipped without NumPy
+    np = None
+
+
+# Waveform peaks: each track is decoded once after upload and reduced to
+# min/max pairs at several resolutions, stored as one small binary file
+# next to the audio. Players fetch a single resolution (a few KB) instead
+# of downloading and decoding the whole file.
+#
+# Peaks file layout (little-endian):
+#   magic 'PEAK' | version u8 | bits u8 | level count u16 |
+#   sample_rate u32 | duration_ms u32 | bins u32 per level, largest first |
+#   per level: bins (min, max) pairs of signed 8-bit samples
+
+PEAKS_MAGIC = b'PEAK'
+PEAKS_VERSION = 1
+HEADER = struct.Struct('<4sBBHII')
+# Resolutions stored, in bins per track
+MAX_BINS = 4096
+MIN_BINS = 256
+# Frames per first-pass bin; later levels are reductions of these
+FINE_BIN_FRAMES = 256
+# First-pass bins computed per block read
+BLOCK_BINS = 4096
+# ffmpeg output for formats we can't decode ourselves
+FFMPEG_SAMPLE_RATE = 22050
+
+PCM_DTYPES = {
+    # (byte order, bits, is_float): numpy dtype
+    ('<', 8, False): 'u1', ('<', 16, False): '<i2', ('<', 32, False): '<i4',
+    ('>', 8, False): 'i1', ('>', 16, False): '>i2', ('>', 32, False): '>i4',
+    ('<', 32, True): '<f4', ('<', 64, True): '<f8',
+    ('>', 32, True): '>f4', ('>', 64, True): '>f8',
+}
+
+
+def peaks_available():
+    return np is not None
+
+def decode_pcm(raw, byte_order, bits, is_float):
+    """
+    View interleaved PCM bytes as samples without converting them; returns
+    (samples, bias, scale) where (sample - bias) / scale is in [-1, 1].
+    Bins are reduced on the raw values and only the results are scaled.
+    """
+    if bits == 24:
+        # No 24-bit dtype: widen each sample into the top of an int32
+        data = np.frombuffer(raw[:len(raw) - len(raw) % 3], dtype='u1').reshape(-1, 3)
+        if byte_order == '>':
+            data = data[:, ::-1]
+        widened = np.zeros((len(data), 4), dtype='u1')
+        widened[:, 1:] = data
+        return widened.view('<i4').ravel(), 0, 2.0 ** 31
+    dtype = np.dtype(PCM_DTYPES[(byte_order, bits, is_float)])
+    samples = np.frombuffer(raw[:len(raw) - len(raw) % dtype.itemsize], dtype=dtype)
+    if is_float:
+        return samples, 0, 1.0
+    if dtype.kind == 'u':
+        # 8-bit WAV is unsigned
+        return samples, 128, 128.0
+    return samples, 0, float(2 ** (bits - 1))
+
+def pcm_layout(f):
+    """(data_offset, data_size, channels, sample_rate, byte_order, bits, is_float) or None"""
+    f.seek(0, 2)
+    size = f.tell()
+    f.seek(0)
+    head = f.read(12)
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        fmt = wav_format(f, size)
+        if fmt and fmt[0] in (1, 3):
+            format_tag, channels, sample_rate, _, _, bits, offset, data_size = fmt
+            return offset, data_size, channels, sample_rate, '<', bits, format_tag == 3
+    elif head[:4] == b'FORM' and head[8:12] in (b'AIFF', b'AIFC'):
+        fmt = aiff_format(f, size)
+        if fmt and fmt[5] is not None:
+            channels, _, bits, sample_rate, compression, offset, data_size = fmt
+            layouts = {b'NONE': ('>', False), b'twos': ('>', False), b'sowt': ('<', False),
+                       b'fl32': ('>', True), b'FL32': ('>', True), b'fl64': ('>', True)}
+            if compression in layouts:
+                byte_order, is_float = layouts[compression]
+                return offset, data_size, channels, sample_rate, byte_order, bits, is_float
+    return None
+
+def _fine_peaks_pcm(f, layout):
+    """First-pass (mins, maxs) per FINE_BIN_FRAMES frames, read in blocks"""
+    offset, data_size, channels, sample_rate, byte_order, bits, is_float = layout
+    if (byte_order, bits, is_float) not in PCM_DTYPES and bits != 24:
+        return None
+    frame_bytes = channels * bits // 8
+    block_bytes = FINE_BIN_FRAMES * BLOCK_BINS * frame_bytes
+    mins, maxs = [], []
+    bias, scale = 0, 1.0
+    f.seek(offset)
+    remaining = data_size
+    while remaining > 0:
+        raw = f.read(min(block_bytes, remaining))
+        if not raw:
+            break
+        remaining -= len(raw)
+        samples, bias, scale = decode_pcm(raw, byte_order, bits, is_float)
+        _reduce_block(samples, channels, mins, maxs)
+    frames = data_size // frame_bytes if frame_bytes else 0
+    return _normalize(mins, bias, scale), _normalize(maxs, bias, scale), sample_rate, frames
+
+def _normalize(values, bias, scale):
+    if not values:
+        return values
+    return [(np.concatenate(values).astype(np.float32) - bias) / scale]
+
+def _reduce_block(samples, channels, mins, maxs):
+    # Bins span every channel's samples, so a hard-panned peak still shows
+    frames = len(samples) // channels
+    samples = samples[:frames * channels]
+    bin_samples = FINE_BIN_FRAMES * channels
+    full = len(samples) // bin_samples * bin_samples
+    if full:
+        binned = samples[:full].reshape(-1, bin_samples)
+        mins.append(binned.min(axis=1))
+        maxs.append(binned.max(axis=1))
+    if full < len(samples):
+        tail = samples[full:]
+        mins.append(tail.min(keepdims=True))
+        maxs.append(tail.max(keepdims=True))
+
+def _fine_peaks_ffmpeg(path):
+    """First-pass peaks for compressed formats, decoded by ffmpeg to mono PCM"""
+    process = subprocess.Popen(
+        ['ffmpeg', '-v', 'error', '-nostdin', '-i', path, '-f', 's16le', '-ac', '1',
+         '-ar', str(FFMPEG_SAMPLE_RATE), 'pipe:1'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    mins, maxs = [], []
+    frames = 0
+    block_bytes = FINE_BIN_FRAMES * BLOCK_BINS * 2
+    carry = b''
+    try:
+        while True:
+            raw = process.stdout.read(block_bytes)
+            if not raw:
+                break
+            raw = carry + raw
+            # Keep bins aligned across pipe reads
+            usable = len(raw) // (FINE_BIN_FRAMES * 2) * (FINE_BIN_FRAMES * 2)
+            raw, carry = raw[:usable], raw[usable:]
+            if raw:
+                frames += len(raw) // 2
+                _reduce_block(np.frombuffer(raw, dtype='<i2'), 1, mins, maxs)
+        if carry:
+            frames += len(carry) // 2
+            _reduce_block(np.frombuffer(carry, dtype='<i2'), 1, mins, maxs)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+    if returncode != 0 or not mins:
+        return None
+    return _normalize(mins, 0, 32768.0), _normalize(maxs, 0, 32768.0), FFMPEG_SAMPLE_RATE, frames
+
+def compute_peaks(fine_mins, fine_maxs):
+    """
+    Reduce first-pass bins to power-of-two resolutions from MAX_BINS down
+    to MIN_BINS. Returns [(mins, maxs)] as int8 arrays, largest first.
+    """
+    fine_mins = np.concatenate(fine_mins)
+    fine_maxs = np.concatenate(fine_maxs)
+    count = len(fine_mins)
+    top = 1 << (min(MAX_BINS, count).bit_length() - 1)
+    # Group fine bins into `top` nearly equal runs
+    starts = (np.arange(top) * count) // top
+    level_mins = np.minimum.reduceat(fine_mins, starts)
+    level_maxs = np.maximum.reduceat(fine_maxs, starts)
+    levels = []
+    while True:
+        levels.append((_quantize(level_mins), _quantize(level_maxs)))
+        if len(level_mins) <= MIN_BINS or len(level_mins) < 2:
+            break
+        level_mins = level_mins.reshape(-1, 2).min(axis=1)
+        level_maxs = level_maxs.reshape(-1, 2).max(axis=1)
+    return levels
+
+def _quantize(values):
+    return np.clip(np.round(values * 127), -128, 127).astype(np.int8)
+
+def encode_peaks(levels, sample_rate, duration_ms):
+    header = HEADER.pack(PEAKS_MAGIC, PEAKS_VERSION, 8, len(levels), sample_rate, duration_ms)
+    table = struct.pack(f'<{len(levels)}I', *(len(mins) for mins, _ in levels))
+    body = b''.join(np.column_stack((mins, maxs)).tobytes() for mins, maxs in levels)
+    return header + table + body
+
+def read_peaks_header(data):
+    """(sample_rate, duration_ms, [bins per level]) from a peaks file's head"""
+    if len(data) < HEADER.size:
+        raise ValueError("Not a peaks file")
+    magic, version, bits, level_count, sample_rate, duration_ms = HEADER.unpack(data[:HEADER.size])
+    if magic != PEAKS_MAGIC or version != PEAKS_VERSION or bits != 8:
+        raise ValueError("Not a peaks file")
+    table = data[HEADER.size:HEADER.size + 4 * level_count]
+    if len(table) < 4 * level_count:
+        raise ValueError("Truncated peaks file")
+    bins = struct.unpack(f'<{level_count}I', table)
+    return sample_rate, duration_ms, list(bins)
+
+def peaks_level_range(bins, level):
+    """(offset, length) of one level's pairs within a peaks file"""
+    offset = HEADER.size + 4 * len(bins) + 2 * sum(bins[:level])
+    return offset, 2 * bins[level]
+
+def encode_single_level(sample_rate, duration_ms, pairs):
+    """A one-level peaks file, as served to players"""
+    return HEADER.pack(PEAKS_MAGIC, PEAKS_VERSION, 8, 1, sample_rate, duration_ms) + \
+        struct.pack('<I', len(pairs) // 2) + pairs
+
+def peaks_key(audio_key):
+    return f"{os.path.splitext(audio_key)[0]}.peaks"
+
+def build_peaks(storage, audio_url):
+    """
+    Decode a stored file and compute its peaks file. Returns the encoded
+    bytes, or None when the format can't be decoded here (compressed audio
+    without ffmpeg installed).
+    """
+    with storage.open(audio_url) as f:
+        layout = pcm_layout(f)
+        fine = _fine_peaks_pcm(f, layout) if layout else None
+    if fine is None and shutil.which('ffmpeg'):
+        # ffmpeg wants a seekable input for most containers
+        with storage.local_copy(audio_url) as path:
+            fine = _fine_peaks_ffmpeg(path)
+    if fine is None:
+        return None
+    mins, maxs, sample_rate, frames = fine
+    if not mins:
+        return None
+    duration_ms = int(frames * 1000 / sample_rate) if sample_rate else 0
+    return encode_peaks(compute_peaks(mins, maxs), sample_rate, duration_ms)
@@ -0,0 +1,214 @@
+"""
+Load benchmark: throughput and latency of gunicorn sync vs. gevent workers
+on a listing-heavy and an upload-heavy request mix.
+
+For each worker class it starts gunicorn with gunicorn.conf.py against a
+freshly seeded database, then runs --clients concurrent logged-in clients
+for --seconds per mix and reports requests per second, p50/p95 latency and
+errors. The listing mix reads tracks, comments and playlists; the upload
+mix posts a --upload-kb WAV for two in five requests. Worker classes whose
+package isn't installed are skipped.
+
+Differences only show when requests wait on I/O: point --database-url at
+PostgreSQL and set STORAGE_BACKEND=s3 (with the S3_* settings) to measure
+the deployment setup; SQLite and local disk mostly measure CPU.
+
+Usage (from the repository root):
+    python benchmarks/load_benchmark.py [--workers 2] [--clients 32] [--seconds 15]
+        [--worker-class sync --worker-class gevent] [--database-url URL]
+        [--metadata-extraction pool]
+"""
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='lemonchord-bench-')
+WORKER_PACKAGES = {'sync': None, 'gevent': 'gevent'}
+
+
+def server_env(args):
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': args.database_url or f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}",
+        'SECRET_KEY': env.get('SECRET_KEY', 'benchmark'),
+        'UPLOAD_FOLDER': env.get('UPLOAD_FOLDER', os.path.join(WORKDIR, 'uploads')),
+        'FLASK_APP': 'app',
+        'METADATA_EXTRACTION': args.metadata_extraction,
+        'WEB_CONCURRENCY': str(args.workers),
+    })
+    return env
+
+def prepare_database(env):
+    os.makedirs(env['UPLOAD_FOLDER'], exist_ok=True)
+    for command in (['flask', 'db', 'upgrade'], ['flask', 'seed', 'undo'], ['flask', 'seed', 'all']):
+        subprocess.run(command, cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(worker_class, env, port):
+    env = {**env, 'GUNICORN_WORKER_CLASS': worker_class, 'PORT': str(port)}
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"gunicorn ({worker_class}) didn't start")
+
+
+def wav_body(kb):
+    frames = kb * 1024 // 2
+    samples = bytes(random.getrandbits(8) for _ in range(frames * 2))
+    return (b'RIFF' + struct.pack('<I', 36 + len(samples)) + b'WAVEfmt ' +
+            struct.pack('<IHHIIHH', 16, 1, 1, 22050, 44100, 2, 16) +
+            b'data' + struct.pack('<I', len(samples)) + samples)
+
+
+class Client:
+    """A logged-in user on one keep-alive connection"""
+
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        self.cookies = {}
+        self.request('GET', '/api/auth/')
+        self.request('POST', '/api/auth/login', json.dumps({
+            'email': 'demo@aa.io', 'password': 'password', 'csrf_token': self.cookies.get('csrf_token')
+        }).encode(), 'application/json')
+
+    def request(self, method, path, body=None, content_type=None):
+        headers = {'Cookie': '; '.join(f"{k}={v}" for k, v in self.cookies.items())}
+        if content_type:
+            headers['Content-Type'] = content_type
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        response.read()
+        for cookie in response.msg.get_all('Set-Cookie') or []:
+            name, _, value = cookie.split(';', 1)[0].partition('=')
+            self.cookies[name] = value
+        return response.status
+
+
+def listing_request(client, track_ids, _):
+    path = random.choice([
+        f"/api/tracks/{random.choice(track_ids)}",
+        f"/api/comments/tracks/{random.choice(track_ids)}/comments",
+        "/api/playlist/ultimate_playlist",
+        "/api/myplaylist/",
+        "/api/tracks/user",
+    ])
+    return client.request('GET', path)
+
+def upload_request(client, track_ids, wav):
+    if random.random() >= 0.4:
+        return listing_request(client, track_ids, wav)
+    boundary = 'benchmark-boundary'
+    body = b''.join([
+        f'--{boundary}\r\nContent-Disposition: form-data; name="title"\r\n\r\nLoad test\r\n'.encode(),
+        f'--{boundary}\r\nContent-Disposition: form-data; name="artist_name"\r\n\r\nBench\r\n'.encode(),
+        f'--{boundary}\r\nContent-Disposition: form-data; name="genre"\r\n\r\nAmbient\r\n'.encode(),
+        f'--{boundary}\r\nContent-Disposition: form-data; name="audio_file"; filename="load.wav"\r\n'
+        f'Content-Type: audio/wav\r\n\r\n'.encode(), wav, f'\r\n--{boundary}--\r\n'.encode()
+    ])
+    return client.request('POST', '/api/tracks/', body, f'multipart/form-data; boundary={boundary}')
+
+MIXES = {'listing': listing_request, 'upload': upload_request}
+
+
+def run_mix(port, mix, clients, seconds, wav):
+    track_ids = list(range(1, 11))
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    # Logging in hashes a password per client, so the clock starts once
+    # every client is in
+    ready = threading.Barrier(clients + 1)
+    go = threading.Event()
+    stop_at = [None]
+
+    def worker():
+        client = Client(port)
+        ready.wait()
+        go.wait()
+        local = []
+        while time.monotonic() < stop_at[0]:
+            start = time.perf_counter()
+            try:
+                status = MIXES[mix](client, track_ids, wav)
+            except (OSError, http.client.HTTPException):
+                status = None
+                client.connection.close()
+            local.append(time.perf_counter() - start)
+            if status is None or status >= 500:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    stop_at[0] = time.monotonic() + seconds
+    go.set()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return (len(latencies) / seconds, latencies[len(latencies) // 2] * 1000,
+            latencies[int(len(latencies) * 0.95)] * 1000, errors[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent clients')
+    parser.add_argument('--seconds', type=int, default=15, help='Duration of each mix')
+    parser.add_argument('--upload-kb', type=int, default=512)
+    parser.add_argument('--worker-class', action='append', choices=sorted(WORKER_PACKAGES))
+    parser.add_argument('--database-url', help='Database to seed and load (default: SQLite in a temp dir)')
+    parser.add_argument('--metadata-extraction', choices=['off', 'pool'], default='off',
+                        help='Process uploads in the metadata pool while under load')
+    args = parser.parse_args()
+
+    env = server_env(args)
+    wav = wav_body(args.upload_kb)
+    print(f"{args.workers} workers, {args.clients} clients, {args.seconds}s per mix")
+    print(f"{'workers':<10}{'mix':<10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+    for worker_class in args.worker_class or ['sync', 'gevent']:
+        package = WORKER_PACKAGES[worker_class]
+        if package and importlib.util.find_spec(package) is None:
+            print(f"{worker_class:<10}skipped: {package} is not installed")
+            continue
+        prepare_database(env)
+        port = free_port()
+        server = start_server(worker_class, env, port)
+        try:
+            for mix in MIXES:
+                rate, p50, p95, errors = run_mix(port, mix, args.clients, args.seconds, wav)
+                print(f"{worker_class:<10}{mix:<10}{rate:>9.1f}{p50:>9.1f}{p95:>9.1f}{errors:>8}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Preview rendition benchmark: bytes on the wire for the seeded catalog when
+players stream the original upload vs. ?rendition=preview.
+
+Each seeded track gets a synthetic 44.1kHz 16-bit stereo WAV (the worst
+case the upload limits allow, short of 24-bit) of its seeded duration,
+capped at --max-seconds. The files go through the regular post-upload
+processing, then every track is streamed both ways through
+/api/tracks/<id>/stream. The "catalog" row extrapolates the measured
+per-second sizes to the seeded durations. The preview encoder is ffmpeg
+when installed, otherwise NumPy resampling to WAV.
+
+Usage (from the repository root):
+    python benchmarks/preview_benchmark.py [--max-seconds 60] [--workers 2]
+"""
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKDIR = tempfile.mkdtemp(prefix='lemonchord-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}"
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ['UPLOAD_FOLDER'] = os.path.join(WORKDIR, 'uploads')
+os.environ['STORAGE_BACKEND'] = 'local'
+os.environ['METADATA_EXTRACTION'] = 'off'
+
+import numpy as np  # noqa: E402
+from flask_migrate import upgrade  # noqa: E402
+from app import app  # noqa: E402
+from app.models import db, Track  # noqa: E402
+from app.seeds import seed_users, seed_tracks  # noqa: E402
+from app.utils.metadata_extraction import extract_backlog  # noqa: E402
+
+SAMPLE_RATE = 44100
+
+
+def write_wav(path, seconds, seed):
+    # A few drifting partials plus noise, so nothing compresses trivially
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * SAMPLE_RATE)
+    with open(path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', 36 + frames * 4) + b'WAVEfmt ' +
+                struct.pack('<IHHIIHH', 16, 1, 2, SAMPLE_RATE, SAMPLE_RATE * 4, 4, 16) +
+                b'data' + struct.pack('<I', frames * 4))
+        freqs = rng.uniform(80, 2000, 4)
+        for start in range(0, frames, SAMPLE_RATE):
+            t = np.arange(start, min(start + SAMPLE_RATE, frames)) / SAMPLE_RATE
+            signal = sum(np.sin(2 * np.pi * freq * t * (1 + 0.01 * np.sin(t))) for freq in freqs) / 5
+            left = signal + rng.normal(0, 0.05, len(t))
+            right = signal * 0.8 + rng.normal(0, 0.05, len(t))
+            pcm = np.clip(np.column_stack((left, right)) * 32767, -32768, 32767).astype('<i2')
+            f.write(pcm.tobytes())
+
+
+def drain(client, url):
+    response = client.get(url, buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--max-seconds', type=int, default=60,
+                        help='Cap on synthesized track length (0: full seeded durations)')
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    upload_folder = os.environ['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    with app.app_context():
+        upgrade()
+        db.engine.echo = False
+        seed_users()
+        seed_tracks()
+        tracks = Track.query.order_by(Track.id).all()
+        seeded_seconds = {}
+        for track in tracks:
+            seeded_seconds[track.id] = track.duration or 180
+            seconds = min(seeded_seconds[track.id], args.max_seconds or seeded_seconds[track.id])
+            path = os.path.join(upload_folder, f"seed_{track.id}.wav")
+            write_wav(path, seconds, track.id)
+            track.audio_url = path
+            track.metadata_extracted_at = None
+        db.session.commit()
+
+        start = time.perf_counter()
+        processed, _, _, with_preview = extract_backlog(workers=args.workers)
+        elapsed = time.perf_counter() - start
+        rows = [(t.id, t.title, t.duration, t.preview_url) for t in Track.query.order_by(Track.id)]
+
+    client = app.test_client()
+    print(f"{processed} seeded tracks, {with_preview} previews built in {elapsed:.1f}s "
+          f"with {args.workers} workers")
+    print(f"{'track':<22}{'seconds':>8}{'original KB':>13}{'preview KB':>12}{'saved':>8}")
+    totals = [0, 0]
+    catalog = [0, 0]
+    for track_id, title, seconds, preview_url in rows:
+        original = drain(client, f'/api/tracks/{track_id}/stream')
+        preview = drain(client, f'/api/tracks/{track_id}/stream?rendition=preview')
+        totals[0] += original
+        totals[1] += preview
+        scale = seeded_seconds[track_id] / max(seconds or 1, 1)
+        catalog[0] += original * scale
+        catalog[1] += preview * scale
+        print(f"{title[:21]:<22}{seconds:>8}{original / 1024:>13.0f}{preview / 1024:>12.0f}"
+              f"{1 - preview / original:>8.0%}")
+    for name, (original, preview) in (('measured', totals), ('catalog', catalog)):
+        print(f"{name:<30}{original / 1024:>13.0f}{preview / 1024:>12.0f}{1 - preview / original:>8.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Static asset benchmark: per-request overhead of serving the React build
+through Flask's static route (request hooks, session and CSRF cookie) vs.
+the static middleware with precompressed variants.
+
+For the JS bundle, the stylesheet, the favicon and a revalidation of the
+bundle (If-None-Match), it reports the mean time per request through the
+WSGI app, the bytes sent to a client accepting gzip and brotli, and whether
+the response sets a cookie. The build is copied to a temp directory and
+compressed there, so react-vite/dist is left as it is.
+
+Usage (from the repository root):
+    python benchmarks/static_benchmark.py [--requests 2000]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKDIR = tempfile.mkdtemp(prefix='lemonchord-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}"
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ['STATIC_ASSETS'] = 'flask'
+
+from werkzeug.test import Client  # noqa: E402
+from app import app  # noqa: E402
+from app.commands.static import compress_static_assets  # noqa: E402
+from app.utils.static_assets import StaticAssetMiddleware  # noqa: E402
+
+HEADERS = {'Accept-Encoding': 'gzip, deflate, br'}
+
+
+def measure(client, path, requests, headers):
+    response = client.get(path, headers=headers)
+    size = len(response.get_data())
+    cookie = 'Set-Cookie' in response.headers
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(path, headers=headers).close()
+    return (time.perf_counter() - start) / requests * 1e6, size, cookie
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per case')
+    args = parser.parse_args()
+
+    build = os.path.join(WORKDIR, 'dist')
+    shutil.copytree(app.static_folder, build)
+    with app.app_context():
+        files, variants = compress_static_assets(build)
+    assets = sorted(name for name in os.listdir(os.path.join(build, 'assets'))
+                    if name.endswith(('.js', '.css')))
+
+    flask_client = Client(app.wsgi_app)
+    middleware_client = Client(StaticAssetMiddleware(app.wsgi_app, build))
+    bundle = next(f"/assets/{name}" for name in assets if name.endswith('.js'))
+    etag = middleware_client.get(bundle, headers=HEADERS).headers['ETag']
+    flask_etag = flask_client.get(bundle, headers=HEADERS).headers['ETag']
+    cases = [(f"/assets/{name}", {}) for name in assets] + [('/favicon.ico', {})]
+
+    print(f"{files} files compressed into {variants} variants; {args.requests} requests per case")
+    print(f"{'request':<34}{'flask us':>10}{'KB':>8}{'cookie':>8}"
+          f"{'lean us':>10}{'KB':>8}{'cookie':>8}{'speedup':>9}")
+    rows = [(path, headers, headers) for path, headers in cases]
+    rows.append((f"{bundle} (304)", {'If-None-Match': flask_etag}, {'If-None-Match': etag}))
+    for label, flask_headers, lean_headers in rows:
+        path = label.split(' ')[0]
+        before = measure(flask_client, path, args.requests, {**HEADERS, **flask_headers})
+        after = measure(middleware_client, path, args.requests, {**HEADERS, **lean_headers})
+        print(f"{label[:33]:<34}{before[0]:>10.0f}{before[1] / 1024:>8.1f}{'yes' if before[2] else 'no':>8}"
+              f"{after[0]:>10.0f}{after[1] / 1024:>8.1f}{'yes' if after[2] else 'no':>8}"
+              f"{before[0] / after[0]:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Audio streaming benchmark: /api/tracks/<id>/stream vs. reading the file
+through Python (what serving audio_url from a view would otherwise do).
+
+For a seek (a 64KB Range request in the middle of the file) and a full
+play it reports, per request, how long the view holds the worker before
+handing back its response, how long it takes to drain the body, the peak
+memory Python allocates, and the resulting throughput. Under gunicorn the
+streamed full-file body is drained by sendfile() through
+wsgi.file_wrapper, so only the "hold" column costs the worker.
+
+Usage (from the repository root):
+    python benchmarks/stream_benchmark.py [--size-mb 100] [--runs 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKDIR = tempfile.mkdtemp(prefix='lemonchord-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}"
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ['UPLOAD_FOLDER'] = os.path.join(WORKDIR, 'uploads')
+
+from flask import Response  # noqa: E402
+from flask_migrate import upgrade  # noqa: E402
+from app import app  # noqa: E402
+from app.models import db, Track, User  # noqa: E402
+
+
+@app.route('/bench/read-whole/<int:track_id>')
+def read_whole(track_id):
+    # The pre-streaming behaviour: the whole file goes through Python
+    track = db.session.get(Track, track_id)
+    with open(track.audio_url, 'rb') as f:
+        return Response(f.read(), mimetype='audio/flac')
+
+
+def timed(client, url, headers=None):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, headers=headers or {}, buffered=False)
+    held = time.perf_counter() - start
+    size = sum(len(chunk) for chunk in response.response)
+    total = time.perf_counter() - start
+    response.close()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return held, total, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--size-mb', type=int, default=100)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    upload_folder = os.environ['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+    path = os.path.join(upload_folder, 'bench.flac')
+    with open(path, 'wb') as f:
+        chunk = os.urandom(1024 * 1024)
+        for _ in range(args.size_mb):
+            f.write(chunk)
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    with app.app_context():
+        upgrade()
+        db.engine.echo = False
+        user = User(username='bench', email='bench@example.com', password='bench')
+        db.session.add(user)
+        db.session.flush()
+        track = Track(title='Bench', audio_url=path, user_id=user.id)
+        db.session.add(track)
+        db.session.commit()
+        track_id = track.id
+
+    middle = args.size_mb * 1024 * 1024 // 2
+    seek = {'Range': f'bytes={middle}-{middle + 64 * 1024 - 1}'}
+    cases = [
+        ('seek, whole-file read', f'/bench/read-whole/{track_id}', None),
+        ('seek, range stream', f'/api/tracks/{track_id}/stream', seek),
+        ('play, whole-file read', f'/bench/read-whole/{track_id}', None),
+        ('play, file stream', f'/api/tracks/{track_id}/stream', None),
+    ]
+
+    client = app.test_client()
+    print(f"{args.size_mb}MB file, best of {args.runs} runs")
+    print(f"{'case':<24}{'hold ms':>10}{'total ms':>10}{'bytes':>12}{'peak MB':>10}{'MB/s':>10}")
+    for name, url, headers in cases:
+        held, total, size, peak = min(
+            (timed(client, url, headers) for _ in range(args.runs)), key=lambda r: r[1]
+        )
+        print(f"{name:<24}{held * 1000:>10.1f}{total * 1000:>10.1f}{size:>12}"
+              f"{peak / 2**20:>10.1f}{size / 2**20 / total:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
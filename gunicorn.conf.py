@@ -0,0 +1,35 @@
+# gunicorn.conf.py
+import os
+
+# Worker mode: 'sync' handles one request per process at a time; 'gevent'
+# runs up to worker_connections requests per process cooperatively, each
+# yielding to the others while it waits on the database or S3
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Worker count comes from WEB_CONCURRENCY and the bind address from PORT,
+# which gunicorn reads itself
+
+if worker_class == 'gevent':
+    # Nothing is patched here: this file runs in the master, which has
+    # already imported socket, ssl and threading by now. The gevent worker
+    # monkey-patches each worker process after the fork and before it
+    # imports the app, so the app's sockets, locks and threads (SQLAlchemy's
+    # pool, the S3 client's connection pool and transfer threads, the
+    # background workers) are gevent's. That needs the app loaded in the
+    # workers, so leave preload_app off.
+    import importlib.util
+
+    if importlib.util.find_spec('psycogreen') is None and \
+            (os.environ.get('DATABASE_URL') or '').startswith(('postgres://', 'postgresql://')):
+        raise RuntimeError("gevent workers on PostgreSQL need the psycogreen package")
+
+    def post_fork(server, worker):
+        # psycopg2 blocks in C while a query runs; this makes it wait on
+        # gevent's hub so other requests keep running
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            return
+        patch_psycopg()
@@ -38,6 +38,18 @@ target_metadata = current_app.extensions['migrate'].db.metadata
 # ... etc.
 
 
+# The track search index is managed outside the models (see
+# app/utils/search.py), so keep autogenerate from dropping it
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table' and name.startswith('track_search'):
+        return False
+    if type_ == 'column' and name == 'search_vector':
+        return False
+    if type_ == 'index' and name == 'ix_tracks_search_vector':
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -52,7 +64,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=target_metadata, literal_binds=True
+        url=url, target_metadata=target_metadata, literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +106,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             # Add these parameters for production schema support
             include_schemas=True,
             version_table_schema=SCHEMA if environment == "production" else None,
@@ -0,0 +1,30 @@
+"""add track like_count
+
+Revision ID: 3f1c2a7d9b10
+Revises: 9a687e79627b
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9b10'
+down_revision = '9a687e79627b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tracks', sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+    # Backfill from the existing likes so the counter starts out correct
+    op.execute(
+        "UPDATE tracks SET like_count = "
+        "(SELECT COUNT(*) FROM likes WHERE likes.track_id = tracks.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('tracks') as batch_op:
+        batch_op.drop_column('like_count')
@@ -0,0 +1,26 @@
+"""add track sort indexes
+
+Revision ID: 5b8e0d41c2f7
+Revises: 3f1c2a7d9b10
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e0d41c2f7'
+down_revision = '3f1c2a7d9b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_tracks_created_at_id', 'tracks', ['created_at', 'id'], unique=False)
+    op.create_index('ix_tracks_like_count_id', 'tracks', ['like_count', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_tracks_like_count_id', table_name='tracks')
+    op.drop_index('ix_tracks_created_at_id', table_name='tracks')
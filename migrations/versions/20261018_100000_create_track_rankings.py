@@ -0,0 +1,41 @@
+"""create track_rankings
+
+Revision ID: 8d2f6a9e4c31
+Revises: 5b8e0d41c2f7
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2f6a9e4c31'
+down_revision = '5b8e0d41c2f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('track_rankings',
+    sa.Column('track_id', sa.Integer(), nullable=False),
+    sa.Column('genre_key', sa.String(length=255), server_default='', nullable=False),
+    sa.Column('like_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['track_id'], ['tracks.id'], ),
+    sa.PrimaryKeyConstraint('track_id')
+    )
+    op.create_index('ix_track_rankings_like_count', 'track_rankings', ['like_count', 'track_id'], unique=False)
+    op.create_index('ix_track_rankings_genre_like_count', 'track_rankings', ['genre_key', 'like_count', 'track_id'], unique=False)
+    op.execute(
+        "INSERT INTO track_rankings (track_id, genre_key, like_count) "
+        "SELECT id, LOWER(TRIM(COALESCE(genre, ''))), like_count FROM tracks"
+    )
+    # The by-likes sort now reads track_rankings
+    op.drop_index('ix_tracks_like_count_id', table_name='tracks')
+
+
+def downgrade():
+    op.create_index('ix_tracks_like_count_id', 'tracks', ['like_count', 'id'], unique=False)
+    op.drop_index('ix_track_rankings_genre_like_count', table_name='track_rankings')
+    op.drop_index('ix_track_rankings_like_count', table_name='track_rankings')
+    op.drop_table('track_rankings')
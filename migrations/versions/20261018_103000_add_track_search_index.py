@@ -0,0 +1,49 @@
+"""add track search index
+
+Revision ID: c47a1e5f0b92
+Revises: 8d2f6a9e4c31
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47a1e5f0b92'
+down_revision = '8d2f6a9e4c31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # Maintained by Postgres itself, so no application hooks are needed
+        op.execute(
+            "ALTER TABLE tracks ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', COALESCE(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', COALESCE(artist_name, '')), 'B') || "
+            "setweight(to_tsvector('simple', COALESCE(genre, '')), 'C')"
+            ") STORED"
+        )
+        op.execute("CREATE INDEX ix_tracks_search_vector ON tracks USING GIN (search_vector)")
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE track_search USING fts5("
+            "title, artist_name, genre, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "INSERT INTO track_search (rowid, title, artist_name, genre) "
+            "SELECT id, COALESCE(title, ''), COALESCE(artist_name, ''), COALESCE(genre, '') "
+            "FROM tracks"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_tracks_search_vector")
+        op.execute("ALTER TABLE tracks DROP COLUMN IF EXISTS search_vector")
+    elif dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS track_search")
@@ -0,0 +1,36 @@
+"""create storage_deletions
+
+Revision ID: 1b6d4f8a2e53
+Revises: e5a90c3b7d18
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b6d4f8a2e53'
+down_revision = 'e5a90c3b7d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('storage_deletions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('url', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=16), server_default='pending', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_storage_deletions_status_next_attempt', 'storage_deletions', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_storage_deletions_status_next_attempt', table_name='storage_deletions')
+    op.drop_table('storage_deletions')
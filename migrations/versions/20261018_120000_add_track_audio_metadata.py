@@ -0,0 +1,34 @@
+"""add track audio metadata
+
+Revision ID: 7c3e9b2d5f14
+Revises: 1b6d4f8a2e53
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e9b2d5f14'
+down_revision = '1b6d4f8a2e53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tracks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('bitrate', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('sample_rate', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('channels', sa.SmallInteger(), nullable=True))
+        batch_op.add_column(sa.Column('codec', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('metadata_extracted_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('tracks', schema=None) as batch_op:
+        batch_op.drop_column('metadata_extracted_at')
+        batch_op.drop_column('codec')
+        batch_op.drop_column('channels')
+        batch_op.drop_column('sample_rate')
+        batch_op.drop_column('bitrate')
@@ -0,0 +1,26 @@
+"""add track peaks_url
+
+Revision ID: 4a8f1c6e9d27
+Revises: 7c3e9b2d5f14
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a8f1c6e9d27'
+down_revision = '7c3e9b2d5f14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tracks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('peaks_url', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('tracks', schema=None) as batch_op:
+        batch_op.drop_column('peaks_url')
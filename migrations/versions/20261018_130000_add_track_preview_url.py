@@ -0,0 +1,26 @@
+"""add track preview_url
+
+Revision ID: 2d7b5e8f1a63
+Revises: 4a8f1c6e9d27
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d7b5e8f1a63'
+down_revision = '4a8f1c6e9d27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tracks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('preview_url', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('tracks', schema=None) as batch_op:
+        batch_op.drop_column('preview_url')
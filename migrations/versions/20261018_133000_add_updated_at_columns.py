@@ -0,0 +1,32 @@
+"""add updated_at to tracks, playlists and comments
+
+Revision ID: 6e1f9c3a8b45
+Revises: 2d7b5e8f1a63
+Create Date: 2026-10-18 13:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e1f9c3a8b45'
+down_revision = '2d7b5e8f1a63'
+branch_labels = None
+depends_on = None
+
+TABLES = ('tracks', 'playlists', 'comments')
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        # Existing rows count as last changed when they were created
+        op.execute(f"UPDATE {table} SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)")
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,36 @@
+"""add indexes for foreign keys and hot filters
+
+Revision ID: 9c2d4e6f8a10
+Revises: 6e1f9c3a8b45
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2d4e6f8a10'
+down_revision = '6e1f9c3a8b45'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns)
+INDEXES = (
+    ('ix_likes_track_id', 'likes', ['track_id']),
+    ('ix_comments_track_id_created_at_id', 'comments', ['track_id', 'created_at', 'id']),
+    ('ix_tracks_user_id_created_at', 'tracks', ['user_id', 'created_at']),
+    ('ix_tracks_genre', 'tracks', ['genre']),
+    ('ix_playlist_tracks_track_id', 'playlist_tracks', ['track_id']),
+    ('ix_playlists_user_id', 'playlists', ['user_id']),
+)
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
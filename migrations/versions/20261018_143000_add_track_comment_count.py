@@ -0,0 +1,30 @@
+"""add track comment_count
+
+Revision ID: 4b8e1d2f6a37
+Revises: 9c2d4e6f8a10
+Create Date: 2026-10-18 14:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8e1d2f6a37'
+down_revision = '9c2d4e6f8a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tracks', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    # Backfill from the existing comments so the counter starts out correct
+    op.execute(
+        "UPDATE tracks SET comment_count = "
+        "(SELECT COUNT(*) FROM comments WHERE comments.track_id = tracks.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('tracks') as batch_op:
+        batch_op.drop_column('comment_count')
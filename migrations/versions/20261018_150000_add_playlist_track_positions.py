@@ -0,0 +1,39 @@
+"""add playlist_tracks position
+
+Revision ID: 7d3a9f2c5e81
+Revises: 4b8e1d2f6a37
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3a9f2c5e81'
+down_revision = '4b8e1d2f6a37'
+branch_labels = None
+depends_on = None
+
+# Playlist.POSITION_GAP
+POSITION_GAP = 1024
+
+
+def upgrade():
+    op.add_column('playlist_tracks', sa.Column('position', sa.Integer(), nullable=True))
+    # Existing entries had no defined order; number them by track id
+    op.execute(
+        f"UPDATE playlist_tracks SET position = {POSITION_GAP} * "
+        "(SELECT COUNT(*) FROM playlist_tracks AS earlier "
+        "WHERE earlier.playlist_id = playlist_tracks.playlist_id "
+        "AND earlier.track_id <= playlist_tracks.track_id)"
+    )
+    with op.batch_alter_table('playlist_tracks') as batch_op:
+        batch_op.alter_column('position', existing_type=sa.Integer(), nullable=False)
+    op.create_index('ix_playlist_tracks_playlist_id_position', 'playlist_tracks', ['playlist_id', 'position'])
+
+
+def downgrade():
+    op.drop_index('ix_playlist_tracks_playlist_id_position', table_name='playlist_tracks')
+    with op.batch_alter_table('playlist_tracks') as batch_op:
+        batch_op.drop_column('position')
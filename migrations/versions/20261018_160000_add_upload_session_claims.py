@@ -0,0 +1,30 @@
+"""add upload_sessions claims
+
+Revision ID: 2f6c8e1a4d93
+Revises: 7d3a9f2c5e81
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f6c8e1a4d93'
+down_revision = '7d3a9f2c5e81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('upload_sessions') as batch_op:
+        batch_op.add_column(sa.Column('state', sa.String(length=16), server_default='open', nullable=False))
+        batch_op.add_column(sa.Column('claim_token', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('upload_sessions') as batch_op:
+        batch_op.drop_column('claimed_at')
+        batch_op.drop_column('claim_token')
+        batch_op.drop_column('state')
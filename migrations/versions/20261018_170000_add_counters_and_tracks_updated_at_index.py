@@ -0,0 +1,32 @@
+"""add counters and an index on tracks.updated_at
+
+Revision ID: 8e4b2d7f1c56
+Revises: 2f6c8e1a4d93
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4b2d7f1c56'
+down_revision = '2f6c8e1a4d93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('counters',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.BigInteger(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # Start the catalog size from the existing rows
+    op.execute("INSERT INTO counters (name, value) SELECT 'tracks', COUNT(*) FROM tracks")
+    op.create_index('ix_tracks_updated_at', 'tracks', ['updated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_tracks_updated_at', table_name='tracks')
+    op.drop_table('counters')
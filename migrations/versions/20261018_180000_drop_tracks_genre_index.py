@@ -0,0 +1,26 @@
+"""drop the unused index on tracks.genre
+
+Revision ID: 5a9c3e7b1d24
+Revises: 8e4b2d7f1c56
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9c3e7b1d24'
+down_revision = '8e4b2d7f1c56'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Genre filters go through track_rankings.genre_key, and the substring
+    # match in track search can't use a B-tree index
+    op.drop_index('ix_tracks_genre', table_name='tracks')
+
+
+def downgrade():
+    op.create_index('ix_tracks_genre', 'tracks', ['genre'], unique=False)
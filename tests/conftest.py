@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# The app is configured from the environment when it is imported, so point
+# it at a throwaway database and upload folder first
+WORKDIR = tempfile.mkdtemp(prefix='lemonchord-tests-')
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(WORKDIR, 'test.db')}",
+    'SECRET_KEY': 'test',
+    'UPLOAD_FOLDER': os.path.join(WORKDIR, 'uploads'),
+    'METADATA_EXTRACTION': 'off',
+    'STORAGE_DELETION_WORKER': 'off',
+    'CACHE_BACKEND': 'off',
+})
+os.environ.pop('DATABASE_REPLICA_URLS', None)
+
+from flask_migrate import upgrade  # noqa: E402
+from app import app as flask_app  # noqa: E402
+from app.models import db  # noqa: E402
+from app.seeds import seed_users, seed_tracks, seed_playlists, seed_comments, seed_likes  # noqa: E402
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+@pytest.fixture(scope='session')
+def app():
+    """The app on a migrated, seeded SQLite database"""
+    os.makedirs(flask_app.config['UPLOAD_FOLDER'], exist_ok=True)
+    with flask_app.app_context():
+        upgrade(directory=MIGRATIONS)
+        seed_users()
+        seed_playlists()
+        seed_tracks()
+        seed_comments()
+        seed_likes()
+        db.session.remove()
+    yield flask_app
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+        db.session.rollback()
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as the first seeded user"""
+    app.config['WTF_CSRF_ENABLED'] = False
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+    return client
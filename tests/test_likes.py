@@ -0,0 +1,31 @@
+from app.models import db, Like, Track, TrackRanking
+
+
+def counts(app, track_id):
+    with app.app_context():
+        track = db.session.get(Track, track_id)
+        return track.like_count, db.session.get(TrackRanking, track_id).like_count
+
+
+def test_like_and_unlike_keep_the_counters(app, client):
+    with app.app_context():
+        liked = {like.track_id for like in Like.query.filter_by(user_id=1)}
+        track_id = Track.query.filter(Track.id.notin_(liked)).order_by(Track.id).first().id
+    before = counts(app, track_id)
+
+    assert client.post(f'/api/likes/tracks/{track_id}/like').status_code == 201
+    assert counts(app, track_id) == (before[0] + 1, before[1] + 1)
+    assert client.delete(f'/api/likes/tracks/{track_id}/like').status_code == 200
+    assert counts(app, track_id) == before
+
+
+def test_unliking_twice_decrements_once(app, client):
+    # The second DELETE stands in for a concurrent one that lost the race
+    with app.app_context():
+        track_id = Like.query.filter_by(user_id=1).order_by(Like.track_id).first().track_id
+    before = counts(app, track_id)
+
+    assert client.delete(f'/api/likes/tracks/{track_id}/like').status_code == 200
+    assert client.delete(f'/api/likes/tracks/{track_id}/like').status_code == 404
+    assert counts(app, track_id) == (before[0] - 1, before[1] - 1)
+    assert client.post(f'/api/likes/tracks/{track_id}/like').status_code == 201
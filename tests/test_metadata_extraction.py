@@ -0,0 +1,55 @@
+import os
+from concurrent.futures import Future
+
+import pytest
+
+from app.models import db, Track, StorageDeletion
+from app.utils.metadata_extraction import MetadataExtractor, metadata_values
+from app.utils.storage import get_storage
+
+
+@pytest.fixture
+def extractor(app):
+    return MetadataExtractor(app, workers=1)
+
+
+def stored_url(app, name):
+    with app.app_context():
+        return get_storage().url_for(name)
+
+
+def finished(values):
+    future = Future()
+    future.set_result((values, []))
+    return future
+
+
+def queued_urls(app):
+    with app.app_context():
+        return {deletion.url for deletion in StorageDeletion.query}
+
+
+def test_results_for_a_replaced_file_queue_the_stored_files_for_deletion(app, extractor):
+    peaks_url, preview_url = stored_url(app, 'stale.peaks'), stored_url(app, 'stale.preview.wav')
+    with app.app_context():
+        track_id = Track.query.order_by(Track.id).first().id
+    values = {**metadata_values(None), 'peaks_url': peaks_url, 'preview_url': preview_url}
+
+    extractor._record(track_id, os.path.join(app.config['UPLOAD_FOLDER'], 'replaced.wav'), finished(values))
+    assert {peaks_url, preview_url} <= queued_urls(app)
+    with app.app_context():
+        track = db.session.get(Track, track_id)
+        assert track.peaks_url != peaks_url and track.preview_url != preview_url
+
+
+def test_results_for_the_current_file_are_recorded(app, extractor):
+    peaks_url = stored_url(app, 'current.peaks')
+    with app.app_context():
+        track = Track.query.order_by(Track.id).first()
+        track_id, audio_url = track.id, track.audio_url
+    values = {**metadata_values(None), 'peaks_url': peaks_url}
+
+    extractor._record(track_id, audio_url, finished(values))
+    assert peaks_url not in queued_urls(app)
+    with app.app_context():
+        assert db.session.get(Track, track_id).peaks_url == peaks_url
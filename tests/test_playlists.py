@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.api import user_playlist_routes
+from app.api.user_playlist_routes import MAX_BATCH_TRACKS
+
+
+def track_ids(playlist):
+    return [track['id'] for track in playlist['tracks']]
+
+
+@pytest.fixture
+def playlist_id(client):
+    response = client.post('/api/myplaylist/', json={'name': 'Order test'})
+    assert response.status_code == 201
+    playlist_id = response.get_json()['data']['id']
+    yield playlist_id
+    client.delete(f'/api/myplaylist/{playlist_id}')
+
+
+def test_tracks_come_back_in_playlist_order(client, playlist_id):
+    # Insertion order differs from playlist order from the second step on
+    response = client.patch(f'/api/myplaylist/{playlist_id}/tracks', json={'operations': [
+        {'op': 'add', 'track_ids': [5, 2, 7]},
+        {'op': 'add', 'track_ids': [1], 'after': None},
+        {'op': 'move', 'track_id': 7, 'after': 1},
+    ]})
+    assert response.status_code == 200, response.get_json()
+
+    playlist = client.get(f'/api/myplaylist/{playlist_id}').get_json()['data']
+    assert track_ids(playlist) == [1, 7, 5, 2]
+
+    response = client.post(f'/api/myplaylist/{playlist_id}/tracks?response=full',
+                           json={'track_id': 3, 'after': 5})
+    assert track_ids(response.get_json()['data']) == [1, 7, 5, 3, 2]
+
+    response = client.delete(f'/api/myplaylist/{playlist_id}/tracks/7?response=full')
+    assert track_ids(response.get_json()['data']) == [1, 5, 3, 2]
+
+    playlists = client.get('/api/myplaylist/').get_json()['data']['playlists']
+    assert track_ids(next(p for p in playlists if p['id'] == playlist_id)) == [1, 5, 3, 2]
+
+
+def test_oversized_batches_are_rejected_before_any_lookup(client, playlist_id):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    too_many = list(range(1, MAX_BATCH_TRACKS + 2))
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        response = client.patch(f'/api/myplaylist/{playlist_id}/tracks', json={'operations': [
+            {'op': 'add', 'track_ids': too_many},
+        ]})
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == {'track_ids': 'Too many tracks'}
+    assert not [statement for statement in statements if 'IN (' in statement or 'INSERT' in statement]
+
+
+def test_batch_track_budget_covers_the_whole_request(client, playlist_id, monkeypatch):
+    monkeypatch.setattr(user_playlist_routes, 'MAX_BATCH_TRACKS', 3)
+    response = client.patch(f'/api/myplaylist/{playlist_id}/tracks', json={'operations': [
+        {'op': 'add', 'track_ids': [1, 2]},
+        {'op': 'add', 'track_ids': [3, 4]},
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == {'track_ids': 'Too many tracks'}
+    assert track_ids(client.get(f'/api/myplaylist/{playlist_id}').get_json()['data']) == []
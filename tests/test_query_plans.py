@@ -0,0 +1,32 @@
+import re
+
+from app.commands.indexes import AUDIT_REQUESTS, audit_query_plans, _sqlite_scans
+from app.models import db
+
+
+def run_audit():
+    lines = []
+    findings = audit_query_plans(min_rows=10000, echo=lines.append)
+    return findings, lines
+
+
+def test_hot_requests_use_indexes(app, app_context):
+    findings, lines = run_audit()
+    assert findings == 0, '\n'.join(lines)
+
+
+def test_hot_requests_succeed(app, app_context):
+    # A request that fails part way runs fewer queries than it should,
+    # and would pass the audit on a technicality
+    findings, lines = run_audit()
+    statuses = [int(match.group(1)) for match in map(re.compile(r'^\S+ \(\S+\): (\d+),').match, lines) if match]
+    assert len(statuses) == len(AUDIT_REQUESTS)
+    assert all(status < 500 for status in statuses), '\n'.join(lines)
+
+
+def test_sqlite_explainer_reports_full_scans(app, app_context):
+    with db.engine.connect() as conn:
+        _, scans = _sqlite_scans(conn, 'SELECT id FROM tracks WHERE duration > ?', (60,))
+        assert scans == ['tracks']
+        _, scans = _sqlite_scans(conn, 'SELECT title FROM tracks WHERE id = ?', (1,))
+        assert scans == []
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.models import db
+from app.utils.replicas import ReplicaSet
+from app.utils.response_cache import LRUCache, ResponseCache
+
+
+@pytest.fixture
+def empty_replica(app):
+    # A "replica" with no tables: it passes the health probe, but any read
+    # sent to it fails
+    engine = create_engine('sqlite://')
+    replicas = ReplicaSet([engine], max_lag=5, check_interval=3600)
+    app.extensions['read_replicas'] = replicas
+    yield engine
+    del app.extensions['read_replicas']
+    engine.dispose()
+
+
+@pytest.fixture
+def response_cache(app):
+    app.extensions['response_cache'] = ResponseCache(app, LRUCache(), ttl=30, stale_ttl=300)
+    yield app.extensions['response_cache']
+    del app.extensions['response_cache']
+
+
+def test_get_requests_read_from_a_replica(app, empty_replica):
+    with app.test_request_context('/api/playlist/ultimate_playlist'):
+        assert db.session.get_bind() is empty_replica
+        db.session.remove()
+
+
+def test_cache_fills_read_from_the_primary(app, client, empty_replica, response_cache):
+    response = client.get('/api/playlist/ultimate_playlist')
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'MISS'
+    assert client.get('/api/playlist/ultimate_playlist').headers['X-Cache'] == 'HIT'
+
+
+def test_fills_of_one_key_never_overlap(app, response_cache):
+    # An uncacheable response makes every request build in turn; requests
+    # that arrive while others hold or wait on the key's lock must queue
+    building, overlaps, builds = [0], [], []
+    guard = threading.Lock()
+
+    def view():
+        with guard:
+            building[0] += 1
+            overlaps.append(building[0])
+        time.sleep(0.02)
+        with guard:
+            building[0] -= 1
+            builds.append(1)
+        return 'busy', 503
+
+    def request():
+        with app.test_request_context('/api/playlist/ultimate_playlist'):
+            response_cache.serve(view, {}, ('tracks',))
+
+    threads = []
+    for _ in range(8):
+        threads.append(threading.Thread(target=request))
+        threads[-1].start()
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 8
+    assert max(overlaps) == 1
+    assert response_cache._fill_locks == {}
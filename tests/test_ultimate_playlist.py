@@ -0,0 +1,47 @@
+import pytest
+
+from app.models import db, Track
+
+SORTS = ['created_at', 'likes']
+
+
+def get_tracks(client, **params):
+    response = client.get('/api/playlist/ultimate_playlist', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+@pytest.mark.parametrize('sort_by', SORTS)
+def test_genre_selects_that_genre(app, client, sort_by):
+    with app.app_context():
+        rock = {track.id for track in Track.query.filter_by(genre='Rock')}
+    assert rock
+    for genre in ('Rock', 'rock', ' ROCK '):
+        data = get_tracks(client, sort_by=sort_by, genre=genre)
+        assert {track['id'] for track in data['tracks']} == rock
+        assert data['pagination']['total_items'] == len(rock)
+        data = get_tracks(client, sort_by=sort_by, genre=genre, cursor='')
+        assert {track['id'] for track in data['tracks']} == rock
+
+
+@pytest.mark.parametrize('sort_by', SORTS)
+def test_genre_matches_the_whole_name(client, sort_by):
+    data = get_tracks(client, sort_by=sort_by, genre='ock')
+    assert data['tracks'] == []
+    assert data['pagination']['total_items'] == 0
+
+
+@pytest.mark.parametrize('sort_by', SORTS)
+def test_genre_slice_revalidates(app, client, sort_by):
+    url = f'/api/playlist/ultimate_playlist?sort_by={sort_by}&genre=rock'
+    etag = client.get(url).headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        track = Track.query.filter_by(genre='Rock').first()
+        track.title = f'{track.title} (remastered)'
+        track_id = track.id
+        db.session.commit()
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert track_id in {track['id'] for track in response.get_json()['data']['tracks']}